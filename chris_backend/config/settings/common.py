@@ -59,7 +59,7 @@ INSTALLED_APPS = [
 # Pagination
 REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetLimitOffsetPagination',
     'DEFAULT_RENDERER_CLASSES': (
         'collectionjson.renderers.CollectionJsonRenderer',
         'rest_framework.renderers.JSONRenderer',
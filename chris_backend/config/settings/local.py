@@ -105,6 +105,25 @@ MEDIA_ROOT = None
 S3_BUCKET_NAME = None
 S3_CONNECTION_PARAMS = None
 
+# number of concurrent requests issued by bulk storage operations (copy/move/delete)
+STORAGE_MAX_WORKERS = int(os.getenv('STORAGE_MAX_WORKERS', 16))
+
+# how file downloads are served: 'proxy' streams the data through ChRIS, 'redirect'
+# sends clients to a short-lived S3 presigned URL or Swift temp URL, 'accel' and
+# 'sendfile' let the reverse proxy serve files from a filesystem storage with the
+# X-Accel-Redirect (nginx) and X-Sendfile (apache) headers
+FILE_DOWNLOAD_MODE = os.getenv('FILE_DOWNLOAD_MODE', 'proxy')
+if FILE_DOWNLOAD_MODE not in ('proxy', 'redirect', 'accel', 'sendfile'):
+    raise ImproperlyConfigured(
+        f"Unsupported value '{FILE_DOWNLOAD_MODE}' for FILE_DOWNLOAD_MODE")
+FILE_DOWNLOAD_URL_EXPIRY = int(os.getenv('FILE_DOWNLOAD_URL_EXPIRY', 300))  # seconds
+FILE_DOWNLOAD_ACCEL_PREFIX = os.getenv('FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+SWIFT_TEMP_URL_KEY = os.getenv('SWIFT_TEMP_URL_KEY', '')
+
+# seconds the folder permissions of a user are cached across requests (0 disables the
+# cache, permission changes can then take up to this long to apply)
+PERMISSION_CACHE_TTL = int(os.getenv('PERMISSION_CACHE_TTL', 0))
+
 if STORAGE_ENV in ('fslink', 'filesystem'):
     STORAGES['default'] = {'BACKEND': 'django.core.files.storage.FileSystemStorage'}
     MEDIA_ROOT = '/data'  # local filesystem storage settings
@@ -117,6 +136,8 @@ elif STORAGE_ENV == 's3':
         'secret_key': os.getenv('S3_SECRET_KEY', 'minioadmin'),
         'region_name': os.getenv('S3_REGION', None),
     }
+    # objects larger than this (in bytes) are uploaded and copied in parallel parts
+    S3_MULTIPART_THRESHOLD = int(os.getenv('S3_MULTIPART_THRESHOLD', 64 * 1024 * 1024))
     # django-storages S3 settings (derived from ChRIS S3 config above)
     AWS_STORAGE_BUCKET_NAME = S3_BUCKET_NAME
     AWS_S3_ENDPOINT_URL = S3_CONNECTION_PARAMS['endpoint_url']
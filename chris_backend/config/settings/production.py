@@ -73,6 +73,25 @@ STORAGE_ENV = get_secret('STORAGE_ENV')
 if STORAGE_ENV not in ('swift', 'fslink', 'filesystem', 's3'):
     raise ImproperlyConfigured(f"Unsupported value '{STORAGE_ENV}' for STORAGE_ENV")
 
+# number of concurrent requests issued by bulk storage operations (copy/move/delete)
+STORAGE_MAX_WORKERS = get_secret('STORAGE_MAX_WORKERS', env.int, default=16)
+
+# how file downloads are served: 'proxy' streams the data through ChRIS, 'redirect'
+# sends clients to a short-lived S3 presigned URL or Swift temp URL, 'accel' and
+# 'sendfile' let the reverse proxy serve files from a filesystem storage with the
+# X-Accel-Redirect (nginx) and X-Sendfile (apache) headers
+FILE_DOWNLOAD_MODE = get_secret('FILE_DOWNLOAD_MODE', default='proxy')
+if FILE_DOWNLOAD_MODE not in ('proxy', 'redirect', 'accel', 'sendfile'):
+    raise ImproperlyConfigured(
+        f"Unsupported value '{FILE_DOWNLOAD_MODE}' for FILE_DOWNLOAD_MODE")
+FILE_DOWNLOAD_URL_EXPIRY = get_secret('FILE_DOWNLOAD_URL_EXPIRY', env.int, default=300)
+FILE_DOWNLOAD_ACCEL_PREFIX = get_secret('FILE_DOWNLOAD_ACCEL_PREFIX',
+                                        default='/protected-media/')
+
+# seconds the folder permissions of a user are cached across requests (0 disables the
+# cache, permission changes can then take up to this long to apply)
+PERMISSION_CACHE_TTL = get_secret('PERMISSION_CACHE_TTL', env.int, default=0)
+
 if STORAGE_ENV == 'swift':
     STORAGES['default'] = {'BACKEND': 'swift.storage.SwiftStorage'}
     SWIFT_AUTH_URL = get_secret('SWIFT_AUTH_URL')
@@ -82,6 +101,8 @@ if STORAGE_ENV == 'swift':
     SWIFT_CONNECTION_PARAMS = {'user': SWIFT_USERNAME,
                                'key': SWIFT_KEY,
                                'authurl': SWIFT_AUTH_URL}
+    # account key required by the 'redirect' file download mode
+    SWIFT_TEMP_URL_KEY = get_secret('SWIFT_TEMP_URL_KEY', default='')
     verify_storage = lambda: verify_storage_connection(
         STORAGES=STORAGES,
         SWIFT_CONTAINER_NAME=SWIFT_CONTAINER_NAME,
@@ -96,6 +117,9 @@ elif STORAGE_ENV == 's3':
         'secret_key': get_secret('S3_SECRET_KEY'),
         'region_name': get_secret('S3_REGION', default=''),
     }
+    # objects larger than this (in bytes) are uploaded and copied in parallel parts
+    S3_MULTIPART_THRESHOLD = get_secret('S3_MULTIPART_THRESHOLD', env.int,
+                                        default=64 * 1024 * 1024)
     # django-storages S3 settings (derived from ChRIS S3 config above)
     AWS_STORAGE_BUCKET_NAME = S3_BUCKET_NAME
     AWS_S3_ENDPOINT_URL = S3_CONNECTION_PARAMS['endpoint_url']
@@ -607,6 +607,24 @@ urlpatterns = format_suffix_patterns([
         name='chrisfolder-detail',
     ),
 
+    path(
+        'v1/filebrowser/archive/',
+        filebrowser_views.FileBrowserArchive.as_view(),
+        name='chrisfolder-archive-selection',
+    ),
+
+    path(
+        'v1/filebrowser/<int:pk>/archive/',
+        filebrowser_views.FileBrowserFolderArchive.as_view(),
+        name='chrisfolder-archive',
+    ),
+
+    path(
+        'v1/filebrowser/<int:pk>/manifest/',
+        filebrowser_views.FileBrowserFolderManifest.as_view(),
+        name='chrisfolder-manifest',
+    ),
+
     path(
         'v1/filebrowser/<int:pk>/children/',
         filebrowser_views.FileBrowserFolderChildList.as_view(),
@@ -655,6 +673,12 @@ urlpatterns = format_suffix_patterns([
         name='chrisfolder-file-list',
     ),
 
+    path(
+        'v1/filebrowser/files/search/',
+        filebrowser_views.FileBrowserFilePathSearch.as_view(),
+        name='chrisfile-path-search',
+    ),
+
     path(
         'v1/filebrowser/files/<int:pk>/',
         filebrowser_views.FileBrowserFileDetail.as_view(),
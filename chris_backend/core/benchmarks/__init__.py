@@ -0,0 +1,4 @@
+"""
+Benchmarks of the ChRIS backend internals that run offline against local
+stand-ins of the external services.
+"""
@@ -0,0 +1,156 @@
+"""
+Benchmark of the ``StorageManager`` operations across the storage backends.
+
+Every backend is run against a local stand-in so that the benchmark works offline:
+
+- ``filesystem``: a ``FilesystemManager`` over a temporary directory
+- ``s3``: an ``S3Manager`` connected to an in-process moto server (requires the
+  ``moto[server]`` package)
+- ``swift``: a ``SwiftManager`` connected to ``FakeSwiftServer``
+
+The stand-ins don't reproduce the latency and throughput of real services, the
+results are meant to compare revisions of the storage layer with each other.
+"""
+
+import datetime
+import platform
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence
+
+from core.storage import FilesystemManager, S3Manager, StorageManager, SwiftManager
+from core.benchmarks.swift_server import FakeSwiftServer
+
+
+OPERATIONS = ('upload_obj', 'ls', 'download_obj', 'copy_path', 'move_path',
+              'sanitize_obj_names', 'delete_path')
+"""
+Benchmarked operations, in the order they are run on every data set.
+"""
+
+
+@contextmanager
+def filesystem_backend() -> Iterator[StorageManager]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = FilesystemManager(tmp_dir)
+        manager.create_container()
+        yield manager
+
+
+@contextmanager
+def s3_backend() -> Iterator[StorageManager]:
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        raise RuntimeError("The s3 backend requires the 'moto[server]' package.")
+
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        manager = S3Manager('bench', {'endpoint_url': f'http://{host}:{port}',
+                                      'access_key': 'bench',
+                                      'secret_key': 'bench',
+                                      'region_name': 'us-east-1'})
+        manager.create_container()
+        yield manager
+    finally:
+        server.stop()
+
+
+@contextmanager
+def swift_backend() -> Iterator[StorageManager]:
+    with FakeSwiftServer() as server:
+        manager = SwiftManager('bench', server.conn_params)
+        manager.create_container()
+        yield manager
+
+
+BACKENDS: Dict[str, Callable[[], Iterator[StorageManager]]] = {
+    'filesystem': filesystem_backend,
+    's3': s3_backend,
+    'swift': swift_backend,
+}
+
+
+def run_benchmark(backends: Sequence[str], counts: Sequence[int],
+                  sizes: Sequence[int], repeat: int = 3) -> dict:
+    """
+    Run every operation of ``OPERATIONS`` on every backend for every combination of
+    object count and object size.
+
+    :returns: a JSON-serializable dictionary with the environment the benchmark ran
+              in and one result per backend, operation, count and size
+    """
+    results = []
+    for backend in backends:
+        with BACKENDS[backend]() as manager:
+            for count in counts:
+                for size in sizes:
+                    timings = {op: [] for op in OPERATIONS}
+                    for run in range(repeat):
+                        for op, seconds in _run_operations(manager, count, size, run):
+                            timings[op].append(seconds)
+                    results.extend(_summarize(backend, count, size, op, timings[op])
+                                   for op in OPERATIONS)
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def _run_operations(manager: StorageManager, count: int, size: int,
+                    run: int) -> Iterator[tuple]:
+    """
+    Run the benchmarked operations on a fresh data set of ``count`` objects of
+    ``size`` bytes each and yield the time each of them took. Every other object
+    has a comma in its name so that ``sanitize_obj_names`` has objects to rename.
+    """
+    root = f'bench/{count}x{size}/{run}'
+    src = f'{root}/src'
+    data = b'x' * size
+    obj_paths = [f'{src}/{i // 100:04d}/obj{"," if i % 2 else ""}{i:06d}.dat'
+                 for i in range(count)]
+
+    def upload():
+        for obj_path in obj_paths:
+            manager.upload_obj(obj_path, data)
+
+    def download():
+        for obj_path in obj_paths:
+            manager.download_obj(obj_path)
+
+    steps = (
+        ('upload_obj', upload),
+        ('ls', lambda: manager.ls(src)),
+        ('download_obj', download),
+        ('copy_path', lambda: manager.copy_path(src, f'{root}/copy')),
+        ('move_path', lambda: manager.move_path(f'{root}/copy', f'{root}/moved')),
+        ('sanitize_obj_names', lambda: manager.sanitize_obj_names(src)),
+        ('delete_path', lambda: manager.delete_path(root)),
+    )
+    for op, func in steps:
+        start = time.perf_counter()
+        func()
+        yield op, time.perf_counter() - start
+
+
+def _summarize(backend: str, count: int, size: int, op: str,
+               timings: List[float]) -> dict:
+    median = statistics.median(timings)
+    return {
+        'backend': backend,
+        'operation': op,
+        'count': count,
+        'size': size,
+        'seconds': timings,
+        'median': median,
+        'min': min(timings),
+        'objects_per_second': count / median if median else None,
+        'bytes_per_second': count * size / median if median else None,
+    }
@@ -0,0 +1,261 @@
+"""
+Minimal in-process stand-in of an OpenStack Swift cluster.
+
+Only the subset of the Swift API used by ``SwiftManager`` is implemented: v1
+authentication, the ``/info`` capabilities endpoint, container creation and
+listing, object PUT/GET/HEAD/DELETE/COPY, static large object manifests and the
+bulk-delete middleware. Objects are kept in memory. This is meant for benchmarking
+``SwiftManager`` without a real cluster, it is not a faithful emulation of Swift.
+"""
+
+import datetime
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+ACCOUNT = 'AUTH_bench'
+USER = 'bench:bench'
+KEY = 'bench'
+TOKEN = 'bench-token'
+
+
+class _SwiftObject:
+
+    def __init__(self, data: bytes, content_type: str):
+        self.data = data
+        self.content_type = content_type
+        self.etag = hashlib.md5(data).hexdigest()
+        self.last_modified = datetime.datetime.now(datetime.timezone.utc).replace(
+            tzinfo=None)
+
+
+class _SwiftRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass  # keep the benchmark output clean
+
+    def do_GET(self):
+        path, query = self._parse_path()
+        if path == '/auth/v1.0':
+            if (self.headers.get('X-Auth-User') != USER or
+                    self.headers.get('X-Auth-Key') != KEY):
+                return self._send(401)
+            host, port = self.server.server_address[:2]
+            return self._send(200, headers={
+                'X-Storage-Url': f'http://{host}:{port}/v1/{ACCOUNT}',
+                'X-Auth-Token': TOKEN})
+        if path == '/info':
+            return self._send_json({'swift': {'version': 'bench'},
+                                    'bulk_delete': {'max_deletes_per_request': 10000}})
+        container, obj_name = self._authorize(path)
+        if container is None:
+            return
+        if obj_name:
+            return self._get_object(container, obj_name)
+        self._list_container(container, query)
+
+    def do_HEAD(self):
+        path, _ = self._parse_path()
+        container, obj_name = self._authorize(path)
+        if container is None:
+            return
+        obj = self.server.containers.get(container, {}).get(obj_name)
+        if obj is None:
+            return self._send(404)
+        self._send(200, headers=self._object_headers(obj),
+                   content_length=len(obj.data))
+
+    def do_PUT(self):
+        path, query = self._parse_path()
+        container, obj_name = self._authorize(path)
+        if container is None:
+            return
+        data = self._read_body()
+        if not obj_name:
+            with self.server.lock:
+                self.server.containers.setdefault(container, {})
+            return self._send(201)
+        if container not in self.server.containers:
+            return self._send(404)
+        if 'multipart-manifest' in query:
+            data = self._join_segments(json.loads(data))
+            if data is None:
+                return self._send(400)
+        content_type = self.headers.get('Content-Type', 'application/octet-stream')
+        obj = _SwiftObject(data, content_type)
+        with self.server.lock:
+            self.server.containers[container][obj_name] = obj
+        self._send(201, headers={'Etag': obj.etag})
+
+    def do_COPY(self):
+        path, _ = self._parse_path()
+        container, obj_name = self._authorize(path)
+        if container is None:
+            return
+        self._read_body()
+        obj = self.server.containers.get(container, {}).get(obj_name)
+        dst_container, dst_name = unquote(
+            self.headers['Destination']).lstrip('/').split('/', 1)
+        if obj is None or dst_container not in self.server.containers:
+            return self._send(404)
+        with self.server.lock:
+            self.server.containers[dst_container][dst_name] = obj
+        self._send(201)
+
+    def do_DELETE(self):
+        path, _ = self._parse_path()
+        container, obj_name = self._authorize(path)
+        if container is None:
+            return
+        with self.server.lock:
+            obj = self.server.containers.get(container, {}).pop(obj_name, None)
+        self._send(404 if obj is None else 204)
+
+    def do_POST(self):
+        path, query = self._parse_path()
+        container, _ = self._authorize(path)
+        if container is None:
+            return
+        data = self._read_body()
+        if container or 'bulk-delete' not in query:
+            return self._send(400)
+        deleted = not_found = 0
+        with self.server.lock:
+            for line in data.decode('utf-8').splitlines():
+                obj_container, obj_name = unquote(line).lstrip('/').split('/', 1)
+                if self.server.containers.get(obj_container, {}).pop(obj_name, None):
+                    deleted += 1
+                else:
+                    not_found += 1
+        self._send_json({'Number Deleted': deleted, 'Number Not Found': not_found,
+                         'Response Status': '200 OK', 'Errors': []})
+
+    def _parse_path(self):
+        url = urlsplit(self.path)
+        return unquote(url.path), parse_qs(url.query, keep_blank_values=True)
+
+    def _authorize(self, path):
+        """
+        Check the request's token and split its path into container and object
+        names. The container name is empty for account requests. Returns
+        ``(None, None)`` after sending the error response if the request is invalid.
+        """
+        parts = path.lstrip('/').split('/', 3)
+        if len(parts) < 2 or parts[:2] != ['v1', ACCOUNT]:
+            self._read_body()
+            self._send(404)
+            return None, None
+        if self.headers.get('X-Auth-Token') != TOKEN:
+            self._read_body()
+            self._send(401)
+            return None, None
+        return (parts[2] if len(parts) > 2 else ''), (parts[3] if len(parts) > 3 else '')
+
+    def _read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _join_segments(self, manifest):
+        data = []
+        for segment in manifest:
+            seg_container, seg_name = segment['path'].lstrip('/').split('/', 1)
+            obj = self.server.containers.get(seg_container, {}).get(seg_name)
+            if obj is None:
+                return None
+            data.append(obj.data)
+        return b''.join(data)
+
+    def _get_object(self, container, obj_name):
+        obj = self.server.containers.get(container, {}).get(obj_name)
+        if obj is None:
+            return self._send(404)
+        headers = self._object_headers(obj)
+        range_header = self.headers.get('Range')
+        if range_header:
+            start, _, end = range_header.split('=', 1)[1].partition('-')
+            start = int(start)
+            end = int(end) + 1 if end else len(obj.data)
+            headers['Content-Range'] = f'bytes {start}-{end - 1}/{len(obj.data)}'
+            return self._send(206, obj.data[start:end], headers)
+        self._send(200, obj.data, headers)
+
+    def _list_container(self, container, query):
+        objects = self.server.containers.get(container)
+        if objects is None:
+            return self._send(404)
+        prefix = query.get('prefix', [''])[0]
+        marker = query.get('marker', [''])[0]
+        limit = int(query.get('limit', [10000])[0])
+        with self.server.lock:
+            names = sorted(name for name in objects
+                           if name.startswith(prefix) and name > marker)[:limit]
+            listing = [{'name': name,
+                        'bytes': len(objects[name].data),
+                        'hash': objects[name].etag,
+                        'content_type': objects[name].content_type,
+                        'last_modified': objects[name].last_modified.isoformat()}
+                       for name in names]
+        self._send_json(listing)
+
+    @staticmethod
+    def _object_headers(obj: _SwiftObject):
+        return {'Etag': obj.etag, 'Content-Type': obj.content_type,
+                'Last-Modified': obj.last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT')}
+
+    def _send_json(self, content):
+        self._send(200, json.dumps(content).encode('utf-8'),
+                   {'Content-Type': 'application/json; charset=utf-8'})
+
+    def _send(self, status, body=b'', headers=None, content_length=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length',
+                         str(len(body) if content_length is None else content_length))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+
+class FakeSwiftServer(ThreadingHTTPServer):
+    """
+    Swift stand-in listening on a local port. Use it as a context manager to run it
+    in a background thread, ``conn_params`` are then the ``SwiftManager`` connection
+    parameters for it.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), _SwiftRequestHandler)
+        self.containers = {}
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def conn_params(self) -> dict:
+        host, port = self.server_address[:2]
+        return {'user': USER, 'key': KEY, 'authurl': f'http://{host}:{port}/auth/v1.0'}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        self._thread.join()
+        self.server_close()
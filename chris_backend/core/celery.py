@@ -47,7 +47,9 @@ task_routes = {
     'filebrowser.tasks.delete_folder': {'queue': 'main2'},
     'pacsfiles.tasks.delete_pacs_series': {'queue': 'main2'},
     'pacsfiles.tasks.send_pacs_query': {'queue': 'main2'},
-    'pacsfiles.tasks.register_pacs_series': {'queue': 'main2'}
+    'pacsfiles.tasks.register_pacs_series': {'queue': 'main2'},
+    'core.tasks.delete_storage_garbage': {'queue': 'periodic'},
+    'core.tasks.compact_folder_size_deltas': {'queue': 'periodic'}
 }
 app.conf.update(task_routes=task_routes)
 
@@ -88,6 +90,14 @@ app.conf.beat_schedule = {
         'task': 'plugininstances.tasks.delete_plugin_instances_jobs_from_remote',
         'schedule': 7200.0,
     },
+    'delete-storage-garbage-every-30-seconds': {
+        'task': 'core.tasks.delete_storage_garbage',
+        'schedule': 30.0,
+    },
+    'compact-folder-size-deltas-every-30-seconds': {
+        'task': 'core.tasks.compact_folder_size_deltas',
+        'schedule': 30.0,
+    },
 }
 
 # use logging settings in Django settings
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.models import ChrisFile, ChrisLinkFile, FolderSizeDelta
+from core.storage import connect_storage
+
+
+class Command(BaseCommand):
+    help = ('Populate the size and ETag columns of the existing file and link file '
+            'records that were registered before they were introduced.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='number of records updated per database query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        storage_manager = connect_storage(settings)
+
+        for model in (ChrisFile, ChrisLinkFile):
+            updated = self.backfill(model, storage_manager, batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f'Updated {updated} {model.__name__} record(s)'))
+
+    def backfill(self, model, storage_manager, batch_size):
+        """
+        Fill the ``fsize`` and ``etag`` columns of the records of the given model that
+        are missing any of them from the storage metadata. Only those records are
+        stat'ed in storage and they are processed in primary key order, one batch at a
+        time.
+        """
+        updated = 0
+        last_id = 0
+
+        while True:
+            batch = list(model.objects.filter(
+                Q(fsize__isnull=True) | Q(etag=''), id__gt=last_id).order_by(
+                'id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            objs = []
+            sized_ids = []  # records whose size was unknown
+            for obj in batch:
+                try:
+                    info = storage_manager.obj_info(obj.fname.name)
+                except Exception as e:
+                    self.stderr.write(f'Could not get the metadata of {obj.fname.name}, '
+                                      f'detail: {str(e)}')
+                    continue
+                if info is None:
+                    self.stderr.write(f'Could not find {obj.fname.name} in storage')
+                    continue
+                if obj.fsize is None:
+                    obj.fsize = info.size
+                    sized_ids.append(obj.pk)
+                obj.etag = obj.etag or info.etag
+                objs.append(obj)
+            model.objects.bulk_update(objs, ['fsize', 'etag'])
+            if model is ChrisFile and sized_ids:
+                FolderSizeDelta.record_files(model.objects.filter(pk__in=sized_ids),
+                                             count_files=False)
+            updated += len(objs)
+        return updated
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks.storage import BACKENDS, run_benchmark
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the storage manager operations against local stand-ins of the '
+            'storage backends and output the results as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', default=','.join(BACKENDS),
+                            help='comma-separated list of backends among '
+                                 f'{", ".join(BACKENDS)} (default: all)')
+        parser.add_argument('--counts', type=_int_list, default=[10, 100, 1000],
+                            help='comma-separated list of numbers of objects')
+        parser.add_argument('--sizes', type=_int_list, default=[1024, 1024 * 1024],
+                            help='comma-separated list of object sizes in bytes')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='number of runs of every operation, the median time '
+                                 'is reported')
+        parser.add_argument('--output',
+                            help='file the JSON results are written to instead of '
+                                 'the standard output')
+
+    def handle(self, *args, **options):
+        backends = options['backends'].split(',')
+        unknown = [b for b in backends if b not in BACKENDS]
+        if unknown:
+            raise CommandError(f'Unknown backend(s): {", ".join(unknown)}')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+
+        try:
+            report = run_benchmark(backends, options['counts'], options['sizes'],
+                                   options['repeat'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        output = json.dumps(report, indent=2)
+        if options['output'] is None:
+            self.stdout.write(output)
+            return
+        with open(options['output'], 'w') as f:
+            f.write(output)
+        for r in report['results']:
+            self.stdout.write(f"{r['backend']:<12}{r['operation']:<20}"
+                              f"{r['count']:>8} x {r['size']:<10}"
+                              f"{r['median']:>10.4f} s")
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
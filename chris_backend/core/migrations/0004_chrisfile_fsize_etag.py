@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_chrisfolder_deletion_error_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chrisfile',
+            name='etag',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='chrisfile',
+            name='fsize',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chrislinkfile',
+            name='etag',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='chrislinkfile',
+            name='fsize',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
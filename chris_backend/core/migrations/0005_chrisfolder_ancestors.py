@@ -0,0 +1,41 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:48
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0004_chrisfile_fsize_etag'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chrisfolder',
+            name='ancestors',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None),
+        ),
+        # fill the ancestors of the existing folders walking the tree from the root
+        migrations.RunSQL(
+            sql="""
+            WITH RECURSIVE tree(id, ancestors) AS (
+                SELECT id, ARRAY[]::bigint[] FROM core_chrisfolder WHERE parent_id IS NULL
+                UNION ALL
+                SELECT f.id, tree.ancestors || tree.id
+                FROM core_chrisfolder f JOIN tree ON f.parent_id = tree.id
+            )
+            UPDATE core_chrisfolder SET ancestors = tree.ancestors
+            FROM tree WHERE core_chrisfolder.id = tree.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='chrisfolder',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ancestors'], name='core_chrisfolder_ancestors'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+def _delete_inherited_sql(table, obj_column, grantee, via_parent_folder):
+    """
+    SQL deleting the permission rows of ``table`` that are also granted, with the
+    same grantee and permission, to one of the ancestor folders their object inherits
+    permissions from (the root and top-level folders' permissions aren't inherited).
+    """
+    if via_parent_folder:
+        obj_table = {'file_id': 'core_chrisfile',
+                     'link_file_id': 'core_chrislinkfile'}[obj_column]
+        return f"""
+        DELETE FROM {table} p
+        USING {obj_table} o JOIN core_chrisfolder f ON o.parent_folder_id = f.id
+        WHERE p.{obj_column} = o.id AND EXISTS (
+            SELECT 1 FROM core_folder{grantee}permission a
+            WHERE a.{grantee}_id = p.{grantee}_id AND a.permission = p.permission
+            AND a.folder_id = ANY((f.ancestors || f.id)[3:])
+        );
+        """
+    return f"""
+    DELETE FROM {table} p
+    USING core_chrisfolder f
+    WHERE p.folder_id = f.id AND EXISTS (
+        SELECT 1 FROM core_folder{grantee}permission a
+        WHERE a.{grantee}_id = p.{grantee}_id AND a.permission = p.permission
+        AND a.folder_id = ANY(f.ancestors[3:])
+    );
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_chrisfolder_ancestors'),
+    ]
+
+    # permissions are now inherited from the ancestor folders, drop the rows that
+    # were previously copied to every descendant folder and file
+    operations = [
+        migrations.RunSQL(
+            sql=_delete_inherited_sql(f'core_{obj}{grantee}permission', obj_column,
+                                      grantee, obj != 'folder'),
+            reverse_sql=migrations.RunSQL.noop,
+        )
+        for obj, obj_column in (('folder', 'folder_id'), ('file', 'file_id'),
+                                ('linkfile', 'link_file_id'))
+        for grantee in ('group', 'user')
+    ]
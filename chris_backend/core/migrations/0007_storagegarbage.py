@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_remove_inherited_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageGarbage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('path', models.CharField(max_length=1024)),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.9 on 2026-10-18 21:21
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_storagegarbage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FolderSizeDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('folder_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None)),
+                ('size', models.BigIntegerField(default=0)),
+                ('file_count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddField(
+            model_name='chrisfolder',
+            name='file_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chrisfolder',
+            name='size',
+            field=models.BigIntegerField(default=0),
+        ),
+        # compute the aggregates of the existing folders
+        migrations.RunSQL(
+            """
+            UPDATE core_chrisfolder f
+            SET size = totals.size, file_count = totals.file_count
+            FROM (
+                SELECT folder_id, sum(coalesce(c.fsize, 0)) AS size, count(*) AS file_count
+                FROM core_chrisfile c JOIN core_chrisfolder p ON c.parent_folder_id = p.id,
+                unnest(p.ancestors || p.id) AS folder_id
+                GROUP BY folder_id
+            ) AS totals
+            WHERE f.id = totals.folder_id;
+            """,
+            migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-18 21:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0008_folder_size_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chrisfile',
+            index=models.Index(fields=['parent_folder', 'fname'], name='core_chrisfile_parent_fname'),
+        ),
+        migrations.AddIndex(
+            model_name='chrisfolder',
+            index=models.Index(fields=['parent', 'path'], name='core_chrisfolder_parent_path'),
+        ),
+        migrations.AddIndex(
+            model_name='chrislinkfile',
+            index=models.Index(fields=['parent_folder', 'fname'], name='core_linkfile_parent_fname'),
+        ),
+        migrations.AddIndex(
+            model_name='filegrouppermission',
+            index=models.Index(fields=['group', 'file'], name='core_filegroupperm_group'),
+        ),
+        migrations.AddIndex(
+            model_name='fileuserpermission',
+            index=models.Index(fields=['user', 'file'], name='core_fileuserperm_user'),
+        ),
+        migrations.AddIndex(
+            model_name='foldergrouppermission',
+            index=models.Index(fields=['group', 'folder'], name='core_foldergroupperm_group'),
+        ),
+        migrations.AddIndex(
+            model_name='folderuserpermission',
+            index=models.Index(fields=['user', 'folder'], name='core_folderuserperm_user'),
+        ),
+        migrations.AddIndex(
+            model_name='linkfilegrouppermission',
+            index=models.Index(fields=['group', 'link_file'], name='core_linkfilegroupperm_group'),
+        ),
+        migrations.AddIndex(
+            model_name='linkfileuserpermission',
+            index=models.Index(fields=['user', 'link_file'], name='core_linkfileuserperm_user'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-18 22:26
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # the indexes are built concurrently so that the (large) tables aren't locked
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0009_visibility_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='chrisfile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['fname'], name='core_chrisfile_fname_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='chrisfolder',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['path'], name='core_chrisfolder_path_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='chrislinkfile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['fname'], name='core_linkfile_fname_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
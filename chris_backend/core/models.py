@@ -1,17 +1,23 @@
 
 import logging
 import uuid
-import io
+import hashlib
 import os
 import pathlib
 
-from django.db import models
-from django.db.models.functions import Length
+from django.db import connection, models, router, transaction
+from django.db.models import Count, F, Func, Max, Sum, Value
+from django.db.models.deletion import Collector
+from django.db.models.lookups import PatternLookup
+from django.db.models.functions import Coalesce, Concat, Length, Substr
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db.models.signals import post_delete
 from django.utils import timezone
 from django.dispatch import receiver
 from django.conf import settings
 from django.contrib.auth.models import User, Group
+from django.core.cache import cache
 
 import django_filters
 from django_filters.rest_framework import FilterSet
@@ -37,7 +43,199 @@ def validate_permission(permission):
     return permission
 
 
-def user_can_access_obj(obj, user):
+@models.CharField.register_lookup
+@models.FileField.register_lookup
+class ILikeContains(PatternLookup):
+    """
+    Case-insensitive containment lookup compiled to a plain ILIKE on the column so that
+    it can be served by the pg_trgm indexes on the folders' and files' paths (the
+    builtin 'icontains' lookup compares UPPER() of the column, which they don't cover).
+    """
+    lookup_name = 'ilike_contains'
+    param_pattern = '%%%s%%'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs_sql} ILIKE {rhs_sql}', (*lhs_params, *rhs_params)
+
+
+class PermissionResolver(object):
+    """
+    Resolve the permissions granted to a user to access storage objects (folders,
+    files and link files) answering repeated checks from memory.
+
+    Only the permissions on the checked objects and on the folders of their lineages
+    are loaded, per object id, and the decision for every folder is memoized. Use
+    ``prefetch`` before checking many objects so that their permissions are loaded
+    with a constant number of queries. A resolver doesn't see permission changes made
+    after it loaded them and is meant to be short-lived, typically one per request
+    (see ``for_request``). The user's folder permissions can additionally be shared
+    across requests for ``settings.PERMISSION_CACHE_TTL`` seconds.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._group_ids = None
+        # permissions granted on objects (an empty set if none) by model and object id
+        self._permissions = {ChrisFolder: {}, ChrisFile: {}, ChrisLinkFile: {}}
+        self._contents_folder_ids = {}  # permission folder ids of a folder's contents
+        self._decisions = {}
+
+    @classmethod
+    def for_request(cls, request):
+        """
+        Get the resolver for the user of a (Django or DRF) request, creating it the
+        first time it's needed during the request.
+        """
+        http_request = getattr(request, '_request', request)
+        resolver = getattr(http_request, '_permission_resolver', None)
+        if resolver is None or resolver.user != request.user:
+            resolver = cls(request.user)
+            http_request._permission_resolver = resolver
+        return resolver
+
+    @property
+    def group_ids(self):
+        if self._group_ids is None:
+            self._group_ids = list(self.user.groups.values_list('id', flat=True))
+        return self._group_ids
+
+    def prefetch(self, objs):
+        """
+        Load in bulk the permissions needed to check the given objects, that is the
+        permissions on the files and link files themselves and on the folders of
+        the objects' lineages. Objects the user owns or that are public are skipped.
+        """
+        if self.user.username == 'chris':
+            return
+        objs = [obj for obj in objs if obj.owner_id != self.user.id and not obj.public]
+
+        parent_ids = {obj.parent_folder_id for obj in objs
+                      if not isinstance(obj, ChrisFolder)
+                      and obj.parent_folder_id not in self._contents_folder_ids
+                      and not type(obj).parent_folder.is_cached(obj)}
+        if parent_ids:
+            for folder_id, ancestors in ChrisFolder.objects.filter(
+                    pk__in=parent_ids).values_list('id', 'ancestors'):
+                folder = ChrisFolder(id=folder_id, ancestors=ancestors)
+                self._contents_folder_ids[folder_id] = folder.get_permission_folder_ids(
+                    contents=True)
+
+        obj_ids = {ChrisFolder: set(), ChrisFile: set(), ChrisLinkFile: set()}
+        for obj in objs:
+            if isinstance(obj, ChrisFolder):
+                obj_ids[ChrisFolder].update(obj.get_permission_folder_ids())
+            else:
+                obj_ids[type(obj)._meta.concrete_model].add(obj.id)
+                obj_ids[ChrisFolder].update(self._get_contents_folder_ids(obj))
+
+        for model, ids in obj_ids.items():
+            self._get_permissions(model, ids)
+
+    def has_permission(self, obj, permission=''):
+        """
+        Determine whether the user has been granted a permission to access the object
+        (perhaps through one of their groups), with the same semantics as the object's
+        ``has_user_permission`` method.
+        """
+        if permission:
+            validate_permission(permission)
+
+        if isinstance(obj, ChrisFolder):
+            return self._has_folder_permission(obj.id, obj.get_permission_folder_ids(),
+                                               permission)
+
+        model = type(obj)._meta.concrete_model
+        if self._match(self._get_permissions(model, [obj.id])[obj.id], permission):
+            return True
+        return self._has_folder_permission(
+            ('contents', obj.parent_folder_id),
+            self._get_contents_folder_ids(obj), permission)
+
+    def _has_folder_permission(self, key, folder_ids, permission):
+        key = (key, permission)
+        if key not in self._decisions:
+            folder_perms = self._get_permissions(ChrisFolder, folder_ids)
+            self._decisions[key] = any(self._match(folder_perms[folder_id], permission)
+                                       for folder_id in folder_ids)
+        return self._decisions[key]
+
+    def _get_contents_folder_ids(self, obj):
+        """
+        Get the ids of the folders whose permissions are inherited by a file or link
+        file, loading its parent folder's ancestors only if they are not known yet.
+        """
+        folder_id = obj.parent_folder_id
+        if folder_id not in self._contents_folder_ids:
+            if type(obj).parent_folder.is_cached(obj):
+                folder = obj.parent_folder
+            else:
+                ancestors = ChrisFolder.objects.values_list(
+                    'ancestors', flat=True).get(pk=folder_id)
+                folder = ChrisFolder(id=folder_id, ancestors=ancestors)
+            self._contents_folder_ids[folder_id] = folder.get_permission_folder_ids(
+                contents=True)
+        return self._contents_folder_ids[folder_id]
+
+    def _get_permissions(self, model, obj_ids):
+        """
+        Get a dictionary mapping the ids of the objects of the given model to the set
+        of permissions the user has been granted to them, loading those of the given
+        object ids that are not known yet.
+        """
+        perms = self._permissions[model]
+        missing_ids = set(obj_ids).difference(perms)
+        if not missing_ids:
+            return perms
+
+        ttl = getattr(settings, 'PERMISSION_CACHE_TTL', 0)
+        if model is ChrisFolder and ttl and self.user.is_authenticated:
+            cache_keys = {
+                f'chris_folder_permissions_{self.user.id}_{folder_id}': folder_id
+                for folder_id in missing_ids}
+            for cache_key, granted in cache.get_many(cache_keys).items():
+                perms[cache_keys[cache_key]] = granted
+            missing_ids.difference_update(perms)
+            loaded = self._load_permissions(model, missing_ids)
+            cache.set_many({cache_key: loaded[folder_id]
+                            for cache_key, folder_id in cache_keys.items()
+                            if folder_id in loaded}, ttl)
+        else:
+            loaded = self._load_permissions(model, missing_ids)
+        perms.update(loaded)
+        return perms
+
+    def _load_permissions(self, model, obj_ids):
+        perms = {obj_id: set() for obj_id in obj_ids}
+        if not obj_ids or not self.user.is_authenticated:
+            return perms
+
+        user_perm_model, group_perm_model, obj_field = {
+            ChrisFolder: (FolderUserPermission, FolderGroupPermission, 'folder_id'),
+            ChrisFile: (FileUserPermission, FileGroupPermission, 'file_id'),
+            ChrisLinkFile: (LinkFileUserPermission, LinkFileGroupPermission,
+                            'link_file_id'),
+        }[model]
+        lookup = {f'{obj_field}__in': obj_ids}
+
+        qs = user_perm_model.objects.filter(user=self.user, **lookup).values_list(
+            obj_field, 'permission')
+        if self.group_ids:
+            qs = qs.union(group_perm_model.objects.filter(
+                group_id__in=self.group_ids, **lookup).values_list(obj_field,
+                                                                   'permission'))
+        for obj_id, permission in qs:
+            perms[obj_id].add(permission)
+        return perms
+
+    @staticmethod
+    def _match(granted, permission):
+        return bool(granted) and (not permission or permission in granted)
+
+
+def user_can_access_obj(obj, user, resolver=None):
     """
     Return whether the given user is allowed to read-access the given storage
     object (a ``ChrisFolder``, ``ChrisFile`` or ``ChrisLinkFile``).
@@ -45,10 +243,14 @@ def user_can_access_obj(obj, user):
     This is the canonical owner/superuser/public/permission read-access rule.
     The object is accessible if the user owns it, is the superuser 'chris', the
     object is public, or the user has been granted any permission to it
-    (possibly through one of their groups).
+    (possibly through one of their groups or one of the object's ancestor folders).
+    Permissions are resolved by the ``PermissionResolver`` if one is passed.
     """
-    return (obj.owner == user or user.username == 'chris' or obj.public
-            or obj.has_user_permission(user))
+    if obj.owner_id == user.id or user.username == 'chris' or obj.public:
+        return True
+    if resolver is not None:
+        return resolver.has_permission(obj)
+    return obj.has_user_permission(user)
 
 
 class PathAccessError(Exception):
@@ -60,18 +262,72 @@ class PathAccessError(Exception):
     pass
 
 
-def validate_path_access(user, path):
+def validate_path_access(user, path, resolver=None):
     """
     Check whether the given user is allowed to access the given storage path.
 
     Enforces the structural path rules, the PUBLIC/SHARED link-target restriction
     and the owner/public/permission access rule. This is the single source of
-    truth for path-access authorization.
+    truth for path-access authorization. Use ``validate_paths_access`` to check
+    many paths at once.
 
     Returns the normalized path on success.
     Raises ``PathAccessError`` with a human-readable reason on failure.
     """
-    path = path.strip().strip('/')
+    return validate_paths_access(user, [path], resolver)[0]
+
+
+def validate_paths_access(user, paths, resolver=None):
+    """
+    Batch version of ``validate_path_access`` that checks whether the given user is
+    allowed to access all the given storage paths.
+
+    The paths are resolved to folders, files or link files with a single query and
+    the permissions are evaluated by a ``PermissionResolver`` so the number of
+    queries doesn't depend on the number of paths.
+
+    Returns the list of normalized paths on success.
+    Raises ``PathAccessError`` for the first path (in the given order) the user is
+    not allowed to access.
+    """
+    paths = [path.strip().strip('/') for path in paths]
+
+    errors = {}
+    for path in paths:
+        try:
+            _validate_path_structure(path)
+        except PathAccessError as e:
+            errors[path] = e
+
+    objs = _get_storage_objs_by_path(set(paths).difference(errors))
+
+    if resolver is None and len(objs) > 1:
+        resolver = PermissionResolver(user)
+    if resolver is not None:
+        resolver.prefetch(objs.values())
+
+    for path in paths:
+        if path in errors:
+            raise errors[path]
+
+        obj = objs.get(path)
+
+        if obj is None or (isinstance(obj, ChrisLinkFile) and
+                           obj.path in ('PUBLIC', 'SHARED')):
+            raise PathAccessError(
+                f"This field may not reference an invalid path '{path}'.")
+
+        if not user_can_access_obj(obj, user, resolver):
+            raise PathAccessError(
+                f"User does not have permission to access path '{path}'.")
+    return paths
+
+
+def _validate_path_structure(path):
+    """
+    Internal function to enforce the structural path rules of
+    ``validate_path_access`` on a normalized path.
+    """
     path_parts = pathlib.Path(path).parts
 
     if len(path_parts) < 2:
@@ -91,27 +347,53 @@ def validate_path_access(user, path):
         raise PathAccessError(
             f"This field may not reference a home's feeds folder path '{path}'.")
 
-    try:
-        obj = ChrisFolder.objects.get(path=path)
-    except ChrisFolder.DoesNotExist:  # path is not a folder
-        try:
-            obj = ChrisFile.objects.get(fname=path)
-        except ChrisFile.DoesNotExist:  # path is not a file
-            try:
-                obj = ChrisLinkFile.objects.get(fname=path)
-
-                if obj.path in ('PUBLIC', 'SHARED'):
-                    raise PathAccessError(
-                        f"This field may not reference an invalid path '{path}'.")
 
-            except ChrisLinkFile.DoesNotExist:  # path is not a link file
-                raise PathAccessError(
-                    f"This field may not reference an invalid path '{path}'.")
-
-    if not user_can_access_obj(obj, user):
-        raise PathAccessError(
-            f"User does not have permission to access path '{path}'.")
-    return path
+def _get_storage_objs_by_path(paths):
+    """
+    Internal function to get a dictionary mapping the given paths to the folders,
+    files or link files they point to with a single UNION query. A path that is both
+    a folder and a file resolves to the folder, and a file takes precedence over a
+    link file. The objects only have the fields needed for access checks loaded.
+    """
+    if not paths:
+        return {}
+
+    def values(qs, kind, path_field, folder_prefix, target):
+        return qs.filter(**{f'{path_field}__in': paths}).annotate(
+            r_kind=Value(kind),
+            r_path=F(path_field),
+            r_id=F('id'),
+            r_owner_id=F('owner_id'),
+            r_public=F('public'),
+            r_folder_id=F(f'{folder_prefix}id'),
+            r_ancestors=F(f'{folder_prefix}ancestors'),
+            r_target=target,
+        ).values_list('r_kind', 'r_path', 'r_id', 'r_owner_id', 'r_public',
+                      'r_folder_id', 'r_ancestors', 'r_target')
+
+    qs = values(ChrisFolder.objects.all(), 0, 'path', '',
+                Value('', output_field=models.CharField()))
+    qs = qs.union(
+        values(ChrisFile.objects.all(), 1, 'fname', 'parent_folder__',
+               Value('', output_field=models.CharField())),
+        values(ChrisLinkFile.objects.all(), 2, 'fname', 'parent_folder__', F('path')),
+        all=True)
+
+    objs = {}
+    for kind, path, obj_id, owner_id, public, folder_id, ancestors, target in sorted(
+            qs, key=lambda row: row[0], reverse=True):
+        if kind == 0:
+            obj = ChrisFolder(id=obj_id, path=path, owner_id=owner_id, public=public,
+                              ancestors=ancestors)
+        else:
+            model = ChrisFile if kind == 1 else ChrisLinkFile
+            obj = model(id=obj_id, owner_id=owner_id, public=public,
+                        parent_folder=ChrisFolder(id=folder_id, ancestors=ancestors))
+            obj.fname.name = path
+            if kind == 2:
+                obj.path = target
+        objs[path] = obj  # lower kinds are processed last and take precedence
+    return objs
 
 
 class AsyncDeletableModel(models.Model):
@@ -187,11 +469,18 @@ class ChrisInstance(models.Model):
 
 
 class ChrisFolder(AsyncDeletableModel):
+    DELETE_CHUNK_SIZE = 5000
+
     creation_date = models.DateTimeField(auto_now_add=True)
     path = models.CharField(max_length=1024, unique=True)  # folder's path
     public = models.BooleanField(blank=True, default=False, db_index=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True,
                                related_name='children')
+    # ids of the ancestor folders from the root folder down to the parent folder
+    ancestors = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    # aggregates over all the files in the folder's tree, see FolderSizeDelta
+    size = models.BigIntegerField(default=0)  # size in bytes
+    file_count = models.BigIntegerField(default=0)
     owner = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     shared_groups = models.ManyToManyField(Group, related_name='shared_folders',
                                            through='FolderGroupPermission')
@@ -200,110 +489,221 @@ class ChrisFolder(AsyncDeletableModel):
 
     class Meta:
         ordering = ('-path',)
+        indexes = [GinIndex(fields=['ancestors'], name='core_chrisfolder_ancestors'),
+                   models.Index(fields=['parent', 'path'],
+                                name='core_chrisfolder_parent_path'),
+                   GinIndex(fields=['path'], opclasses=['gin_trgm_ops'],
+                            name='core_chrisfolder_path_trgm')]
 
     def __str__(self):
         return self.path
 
     def save(self, *args, **kwargs):
         """
-        Overriden to recursively create parent folders when first saving the folder
-        to the DB.
+        Overriden to create the missing parent folders when first saving the folder
+        to the DB and to keep the folder's ancestors in sync with its parent.
         """
         if self.path:
             if self.path.startswith('/') or self.path.endswith('/'):
                 raise ValueError('Paths starting or ending with slashes are not allowed.')
 
             parent_path = os.path.dirname(self.path)
-            try:
-                parent = ChrisFolder.objects.get(path=parent_path)
-            except ChrisFolder.DoesNotExist:
-                parent = ChrisFolder(path=parent_path, owner=self.owner)
-                parent.save()  # recursive call
+            parent = ChrisFolder.ensure_folders([parent_path], self.owner)[parent_path]
             self.parent = parent
+            self.ancestors = parent.ancestors + [parent.id]
 
-        if self.path in ('', 'home', 'PUBLIC', 'SHARED') or self.path.startswith(
-                ('PIPELINES', 'SERVICES')):
+        if self._is_owned_by_chris(self.path):
             self.owner = User.objects.get(username='chris')
         super(ChrisFolder, self).save(*args, **kwargs)
 
     def move(self, new_path):
         """
-        Custom method to move the folder's tree to a new path.
+        Custom method to move the folder's tree to a new path. The paths of all the
+        folders, files and link files in the tree are rewritten by a few set-based
+        UPDATE statements run in a single transaction.
         """
         new_path = new_path.strip('/')
         path = str(self.path)
 
         storage_manager = connect_storage(settings)
+        StorageGarbage.release(new_path, storage_manager, prefix=True)
         storage_manager.move_path(path, new_path)
 
-        prefix = path + '/'  # avoid sibling folders with paths that start with path
-
-        folders = [self] + list(ChrisFolder.objects.filter(path__startswith=prefix))
-        for folder in folders:
-            folder.path = folder.path.replace(path, new_path, 1)
-        ChrisFolder.objects.bulk_update(folders, ['path'])
-
-        files = list(ChrisFile.objects.filter(fname__startswith=prefix))
-        for f in files:
-            f.fname.name = f.fname.name.replace(path, new_path, 1)
-        ChrisFile.objects.bulk_update(files, ['fname'])
-
-        link_files = list(ChrisLinkFile.objects.filter(fname__startswith=prefix))
-        for lf in link_files:
-            lf.fname.name = lf.fname.name.replace(path, new_path, 1)
-        ChrisLinkFile.objects.bulk_update(link_files, ['fname'])
+        # replace the old path prefix keeping the rest of each path
+        prefix_len = len(path) + 1
+        folder_updates = {'path': Concat(Value(new_path), Substr('path', prefix_len),
+                                         output_field=models.CharField())}
+        fname_update = Concat(Value(new_path), Substr('fname', prefix_len),
+                              output_field=models.CharField())
 
         new_parent_path = os.path.dirname(new_path)
 
-        if new_parent_path != os.path.dirname(path):
-            # parent folder has changed
-            try:
-                parent_folder = ChrisFolder.objects.get(path=new_parent_path)
-            except ChrisFolder.DoesNotExist:
-                parent_folder = ChrisFolder.objects.create(path=new_parent_path,
-                                                           owner=self.owner)
-            self.parent_folder = parent_folder
-            self.save()
+        with transaction.atomic():
+            parent_folder = self.parent
+
+            if new_parent_path != os.path.dirname(path):
+                # parent folder has changed
+                try:
+                    parent_folder = ChrisFolder.objects.get(path=new_parent_path)
+                except ChrisFolder.DoesNotExist:
+                    parent_folder = ChrisFolder.objects.create(path=new_parent_path,
+                                                               owner=self.owner)
+                # re-root the ancestors of the whole tree under the new parent
+                depth = len(self.ancestors)
+                new_ancestors = parent_folder.ancestors + [parent_folder.id]
+                ancestors_field = ArrayField(models.BigIntegerField())
+                folder_updates['ancestors'] = Func(
+                    Value(new_ancestors, output_field=ancestors_field),
+                    Func(F('ancestors'), template=f'(%(expressions)s)[{depth + 1}:]'),
+                    template='(%(expressions)s)', arg_joiner=' || ',
+                    output_field=ancestors_field)
+                FolderSizeDelta.record_move(self, new_ancestors)
+                self.ancestors = new_ancestors
+
+            self.get_tree_queryset().update(**folder_updates)
+            ChrisFolder.objects.filter(pk=self.pk).update(parent=parent_folder)
+            ChrisFile.objects.filter(self.get_tree_lookup()).update(fname=fname_update)
+            ChrisLinkFile.objects.filter(self.get_tree_lookup()).update(
+                fname=fname_update)
+
+        self.path = new_path
+        self.parent = parent_folder
+
+    def delete_tree(self, include_self=True, storage_manager=None):
+        """
+        Custom method to delete the folder's tree (or only its contents if
+        ``include_self`` is False) without loading every row in the tree. The files,
+        link files and descendant folders are deleted with set-based DELETE statements
+        in chunks of DELETE_CHUNK_SIZE rows (deepest folders first) and their storage
+        prefix is removed with a single delete_path call, so the per-row post_delete
+        storage receivers don't run for them. Each chunk is committed on its own and
+        the folder itself is only deleted after its storage prefix, so a deletion that
+        failed halfway can simply be run again.
+        """
+        if storage_manager is None:
+            storage_manager = connect_storage(settings)
+
+        for model in (ChrisFile, ChrisLinkFile):
+            ids_qs = model.objects.filter(self.get_tree_lookup()).order_by().values_list(
+                'id', flat=True)
+            while ids := list(ids_qs[:self.DELETE_CHUNK_SIZE]):
+                self._delete_rows(model, ids)
+
+        ids_qs = self.get_descendants_queryset().annotate(
+            depth=Func(F('ancestors'), function='cardinality')).order_by(
+            '-depth').values_list('id', flat=True)
+        while ids := list(ids_qs[:self.DELETE_CHUNK_SIZE]):
+            self._delete_rows(ChrisFolder, ids)
+
+        if storage_manager.path_exists(self.path):
+            storage_manager.delete_path(self.path)
+
+        if include_self:
+            self._delete_rows(ChrisFolder, [self.id])
+
+    @staticmethod
+    def _delete_rows(model, ids):
+        """
+        Internal method to delete the ChrisFolder, ChrisFile or ChrisLinkFile rows with
+        the given ids in a single transaction without sending their post_delete signal.
+        The objects referencing the deleted rows (e.g. their permissions or a feed's
+        folder) are then deleted through the ORM, so the signals for those still run.
+        Postgres only checks the FK constraints on commit.
+        """
+        using = router.db_for_write(model)
+        with transaction.atomic(using=using):
+            if model is ChrisFile:
+                FolderSizeDelta.record_files(model.objects.filter(pk__in=ids), sign=-1)
+            model.objects.filter(pk__in=ids)._raw_delete(using)
+
+            collector = Collector(using=using)
+            for rel in model._meta.related_objects:
+                if rel.related_model not in (ChrisFolder, ChrisFile, ChrisLinkFile):
+                    collector.collect(rel.related_model._base_manager.filter(
+                        **{f'{rel.field.name}__in': ids}))
+            collector.delete()
 
     def get_descendants(self):
         """
         Custom method to return all the folders that are a descendant of this
         folder (including itself).
         """
-        path = str(self.path)
-        return [self] + list(ChrisFolder.objects.filter(path__startswith=path + '/'))
+        return [self] + list(self.get_descendants_queryset())
 
-    def has_group_permission(self, group, permission=''):
+    def get_tree_queryset(self):
+        """
+        Custom method to get the queryset of the folder and all its descendant folders.
+        """
+        return ChrisFolder.objects.filter(
+            models.Q(pk=self.pk) | models.Q(ancestors__contains=[self.id]))
+
+    def get_descendants_queryset(self):
+        """
+        Custom method to get the queryset of all the folders that are a descendant of
+        this folder (excluding itself). The lookup is served by the index on the
+        folders' ancestors.
+        """
+        return ChrisFolder.objects.filter(ancestors__contains=[self.id])
+
+    def get_tree_lookup(self, folder_field='parent_folder'):
+        """
+        Custom method to get a lookup matching the objects whose folder (reached
+        through the ``folder_field`` lookup path) is this folder or any of its
+        descendant folders, e.g. all the files within this folder's tree.
+        """
+        return models.Q(**{folder_field: self}) | models.Q(
+            **{f'{folder_field}__ancestors__contains': [self.id]})
+
+    def get_permission_folder_ids(self, contents=False):
+        """
+        Custom method to get the ids of the folders whose permissions apply to the
+        folder or, if ``contents`` is True, to the folders, files and link files within
+        it. Permissions granted to the root folder and to the top-level folders (e.g.
+        'home' or 'SHARED') are not inherited, they only give access to those folders.
+        """
+        lineage = self.ancestors + [self.id]
+        return lineage[2:] if contents or len(lineage) > 2 else [self.id]
+
+    def has_group_permission(self, group, permission='', contents=False):
         """
         Custom method to determine whether a group has been granted a permission
-        to access the folder.
+        to access the folder (or its contents if ``contents`` is True). Permissions
+        granted to the folder's ancestors are inherited.
         """
+        folder_ids = self.get_permission_folder_ids(contents)
+
         if not permission:
-            qs = FolderGroupPermission.objects.filter(group=group, folder=self)
+            qs = FolderGroupPermission.objects.filter(group=group,
+                                                      folder_id__in=folder_ids)
         else:
             p = validate_permission(permission)
-            qs = FolderGroupPermission.objects.filter(group=group, folder=self,
+            qs = FolderGroupPermission.objects.filter(group=group,
+                                                      folder_id__in=folder_ids,
                                                       permission=p)
         return qs.exists()
 
-    def has_user_permission(self, user, permission=''):
+    def has_user_permission(self, user, permission='', contents=False):
         """
         Custom method to determine whether a user has been granted a permission
-        to access the folder (perhaps through one of its groups).
+        to access the folder (or its contents if ``contents`` is True), perhaps through
+        one of its groups. Permissions granted to the folder's ancestors are inherited.
         """
+        folder_ids = self.get_permission_folder_ids(contents)
         grp_qs = user.groups.all()
 
         if not permission:
-            if FolderUserPermission.objects.filter(folder=self, user=user).exists():
+            if FolderUserPermission.objects.filter(folder_id__in=folder_ids,
+                                                   user=user).exists():
                 return True
-            qs = FolderGroupPermission.objects.filter(folder=self, group__in=grp_qs)
+            qs = FolderGroupPermission.objects.filter(folder_id__in=folder_ids,
+                                                      group__in=grp_qs)
         else:
             p = validate_permission(permission)
-            if FolderUserPermission.objects.filter(folder=self, user=user,
+            if FolderUserPermission.objects.filter(folder_id__in=folder_ids, user=user,
                                                    permission=p).exists():
                 return True
-            qs = FolderGroupPermission.objects.filter(folder=self, permission=p,
-                                                      group__in=grp_qs)
+            qs = FolderGroupPermission.objects.filter(folder_id__in=folder_ids,
+                                                      permission=p, group__in=grp_qs)
         return qs.exists()
 
     def get_groups_permissions_queryset(self):
@@ -447,25 +847,13 @@ class ChrisFolder(AsyncDeletableModel):
     def _update_public_access(self, public_tf):
         """
         Internal method to update public access to the folder and all its descendant
-        folders, link files and files.
+        folders, link files and files with set-based UPDATE statements.
         """
-        path = str(self.path)
-        prefix = path + '/'  # avoid sibling folders with paths that start with path
-
-        folders = [self] + list(ChrisFolder.objects.filter(path__startswith=prefix))
-        for folder in folders:
-            folder.public = public_tf
-        ChrisFolder.objects.bulk_update(folders, ['public'])
-
-        files = list(ChrisFile.objects.filter(fname__startswith=prefix))
-        for f in files:
-            f.public = public_tf
-        ChrisFile.objects.bulk_update(files, ['public'])
-
-        link_files = list(ChrisLinkFile.objects.filter(fname__startswith=prefix))
-        for lf in link_files:
-            lf.public = public_tf
-        ChrisLinkFile.objects.bulk_update(link_files, ['public'])
+        with transaction.atomic():
+            self.get_tree_queryset().update(public=public_tf)
+            ChrisFile.objects.filter(self.get_tree_lookup()).update(public=public_tf)
+            ChrisLinkFile.objects.filter(self.get_tree_lookup()).update(public=public_tf)
+        self.public = public_tf
 
     @classmethod
     def get_first_existing_folder_ancestor(cls, path):
@@ -492,6 +880,56 @@ class ChrisFolder(AsyncDeletableModel):
         )
 
 
+    @classmethod
+    def ensure_folders(cls, paths, owner):
+        """
+        Custom class method to make sure that the folders with the given paths and all
+        their ancestors exist in the DB, creating the missing ones with the given owner
+        (top-level folders are always owned by superuser 'chris'). The missing folders
+        are inserted with one INSERT ... ON CONFLICT DO NOTHING statement per tree
+        level, so folders concurrently created by another process are reused. Returns
+        a dictionary mapping the given paths and their ancestors' paths to the folders.
+        """
+        all_paths = set()
+        for path in paths:
+            if path.startswith('/') or path.endswith('/'):
+                raise ValueError('Paths starting or ending with slashes are not allowed.')
+            while path not in all_paths:
+                all_paths.add(path)
+                if not path:
+                    break
+                path = os.path.dirname(path)
+
+        folders = {f.path: f for f in cls.objects.filter(path__in=all_paths)}
+        missing = all_paths.difference(folders)
+
+        def depth(p):
+            return p.count('/') + 1 if p else 0
+
+        chris = None
+        for level in sorted({depth(p) for p in missing}):
+            level_folders = []
+            for path in [p for p in missing if depth(p) == level]:
+                folder = cls(path=path, owner=owner)
+                if path:
+                    folder.parent = folders[os.path.dirname(path)]
+                    folder.ancestors = folder.parent.ancestors + [folder.parent.id]
+                if cls._is_owned_by_chris(path):
+                    chris = chris or User.objects.get(username='chris')
+                    folder.owner = chris
+                level_folders.append(folder)
+
+            cls.objects.bulk_create(level_folders, ignore_conflicts=True)
+            folders.update((f.path, f) for f in cls.objects.filter(
+                path__in=[f.path for f in level_folders]))
+        return folders
+
+    @staticmethod
+    def _is_owned_by_chris(path):
+        return path in ('', 'home', 'PUBLIC', 'SHARED') or path.startswith(
+            ('PIPELINES', 'SERVICES'))
+
+
 @receiver(post_delete, sender=ChrisFolder)
 def auto_delete_folder_from_storage(sender, instance, **kwargs):
     storage_path = instance.path
@@ -511,80 +949,128 @@ class ChrisFolderFilter(FilterSet):
         fields = ['id', 'path']
 
 
-class FolderGroupPermission(models.Model):
-    permission = models.CharField(choices=PERMISSION_CHOICES, default='r', max_length=1)
-    folder = models.ForeignKey(ChrisFolder, on_delete=models.CASCADE)
-    group = models.ForeignKey(Group, on_delete=models.CASCADE)
+class FolderSizeDelta(models.Model):
+    """
+    Model class that defines a pending change to the size and file count aggregates
+    of a folder and all its ancestor folders. Changes are recorded as new rows when
+    files are created, deleted or moved and added to the folders' aggregates by the
+    compact_folder_size_deltas periodic task, so concurrent writers never contend on
+    the rows of the top-level folders.
+    """
+    COMPACT_BATCH_SIZE = 10000
+    LOCK_ID = 520191  # advisory lock serializing compactions and folder moves
+
+    # ids of the folders the change applies to, recorded when the change happens
+    folder_ids = ArrayField(models.BigIntegerField())
+    size = models.BigIntegerField(default=0)
+    file_count = models.BigIntegerField(default=0)
 
     class Meta:
-        unique_together = ('folder', 'group',)
+        ordering = ('id',)
 
     def __str__(self):
-        return self.permission
+        return str(self.id)
 
-    def save(self, *args, **kwargs):
-        """
-        Overriden to grant the group permission to all the folders, files and link
-        files within the folder.
-        """
-        super(FolderGroupPermission, self).save(*args, **kwargs)
-
-        group = self.group
-        permission = self.permission
-        path = str(self.folder.path)
-        prefix = path + '/'  # avoid sibling folders with paths that start with path
-
-        folders = ChrisFolder.objects.filter(path__startswith=prefix)
-        objs = []
-        for folder in folders:
-            perm = FolderGroupPermission(folder=folder, group=group,
-                                         permission=permission)
-            objs.append(perm)
-        FolderGroupPermission.objects.bulk_create(objs, update_conflicts=True,
-                                                  update_fields=['permission'],
-                                                  unique_fields=['folder_id', 'group_id'])
-
-        files = ChrisFile.objects.filter(fname__startswith=prefix)
-        objs = []
-        for f in files:
-            perm = FileGroupPermission(file=f, group=group, permission=permission)
-            objs.append(perm)
-        FileGroupPermission.objects.bulk_create(objs, update_conflicts=True,
-                                                update_fields=['permission'],
-                                                unique_fields=['file_id', 'group_id'])
-
-        link_files = ChrisLinkFile.objects.filter(fname__startswith=prefix)
-        objs = []
-        for lf in link_files:
-            perm = LinkFileGroupPermission(link_file=lf, group=group,
-                                           permission=permission)
-            objs.append(perm)
-        LinkFileGroupPermission.objects.bulk_create(objs, update_conflicts=True,
-                                                    update_fields=['permission'],
-                                                    unique_fields=['link_file_id',
-                                                                   'group_id'])
-
-    def delete(self, *args, **kwargs):
+    @classmethod
+    def record_file(cls, chris_file, sign=1):
         """
-        Overriden to remove the group permission to all the folders, files and
-        link files within the folder.
+        Custom class method to record the creation (``sign`` 1) or the deletion
+        (``sign`` -1) of a file.
         """
-        super(FolderGroupPermission, self).delete(*args, **kwargs)
+        try:
+            folder = chris_file.parent_folder
+        except ChrisFolder.DoesNotExist:
+            return  # the whole folder is being deleted
+        cls.objects.create(folder_ids=folder.ancestors + [folder.id],
+                           size=sign * (chris_file.fsize or 0), file_count=sign)
 
-        group = self.group
-        permission = self.permission
-        path = str(self.folder.path)
-        prefix = path + '/'  # avoid sibling folders with paths that start with path
+    @classmethod
+    def record_files(cls, files, sign=1, count_files=True):
+        """
+        Custom class method to record the creation (``sign`` 1) or the deletion
+        (``sign`` -1) of all the files in a queryset with one change per parent folder.
+        The number of files is not changed if ``count_files`` is False, e.g. when only
+        the size of existing files has been set.
+        """
+        totals = files.order_by().values('parent_folder_id', 'parent_folder__ancestors')
+        totals = totals.annotate(total_size=Sum(Coalesce('fsize', Value(0))),
+                                 total_count=Count('id'))
+        cls.objects.bulk_create([
+            cls(folder_ids=t['parent_folder__ancestors'] + [t['parent_folder_id']],
+                size=sign * t['total_size'],
+                file_count=sign * t['total_count'] if count_files else 0)
+            for t in totals])
 
-        FolderGroupPermission.objects.filter(folder__path__startswith=prefix, group=group,
-                                             permission=permission).delete()
+    @classmethod
+    def record_move(cls, folder, new_ancestors):
+        """
+        Custom class method to record the move of a folder's tree from its current
+        ancestors to new ones. The folder's aggregates and its pending changes are
+        read under the compaction lock so that they are moved exactly once.
+        """
+        with transaction.atomic():
+            cls._lock()
+            size, file_count = ChrisFolder.objects.filter(pk=folder.pk).values_list(
+                'size', 'file_count').get()
+            pending = cls.objects.filter(folder_ids__contains=[folder.id]).aggregate(
+                size=Coalesce(Sum('size'), 0), file_count=Coalesce(Sum('file_count'), 0))
+            size += pending['size']
+            file_count += pending['file_count']
+            cls.objects.bulk_create([
+                cls(folder_ids=folder.ancestors, size=-size, file_count=-file_count),
+                cls(folder_ids=new_ancestors, size=size, file_count=file_count)])
+
+    @classmethod
+    def compact(cls):
+        """
+        Custom class method to add the changes recorded so far to the folders'
+        aggregates. Changes are processed in batches of COMPACT_BATCH_SIZE rows with
+        one set-based UPDATE statement per batch. Changes of folders that have been
+        deleted in the meantime are discarded.
+        """
+        max_id = cls.objects.aggregate(max_id=Max('id'))['max_id']
+        if max_id is None:
+            return
+
+        sql = f"""
+            WITH deltas AS (
+                DELETE FROM {cls._meta.db_table} WHERE id IN (
+                    SELECT id FROM {cls._meta.db_table} WHERE id <= %s
+                    ORDER BY id LIMIT %s)
+                RETURNING folder_ids, size, file_count
+            ), totals AS (
+                SELECT folder_id, sum(size) AS size, sum(file_count) AS file_count
+                FROM deltas, unnest(folder_ids) AS folder_id
+                GROUP BY folder_id
+            )
+            UPDATE {ChrisFolder._meta.db_table} AS f
+            SET size = f.size + totals.size, file_count = f.file_count + totals.file_count
+            FROM totals WHERE f.id = totals.folder_id
+        """
+        while cls.objects.filter(id__lte=max_id).exists():
+            with transaction.atomic():
+                cls._lock()
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, [max_id, cls.COMPACT_BATCH_SIZE])
 
-        FileGroupPermission.objects.filter(file__fname__startswith=prefix, group=group,
-                                           permission=permission).delete()
+    @classmethod
+    def _lock(cls):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [cls.LOCK_ID])
 
-        LinkFileGroupPermission.objects.filter(link_file__fname__startswith=prefix,
-                                               group=group,
-                                               permission=permission).delete()
+
+class FolderGroupPermission(models.Model):
+    permission = models.CharField(choices=PERMISSION_CHOICES, default='r', max_length=1)
+    folder = models.ForeignKey(ChrisFolder, on_delete=models.CASCADE)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('folder', 'group',)
+        indexes = [models.Index(fields=['group', 'folder'],
+                                name='core_foldergroupperm_group')]
+
+    def __str__(self):
+        return self.permission
 
 
 class FolderGroupPermissionFilter(FilterSet):
@@ -602,71 +1088,12 @@ class FolderUserPermission(models.Model):
 
     class Meta:
         unique_together = ('folder', 'user',)
+        indexes = [models.Index(fields=['user', 'folder'],
+                                name='core_folderuserperm_user')]
 
     def __str__(self):
         return self.permission
 
-    def save(self, *args, **kwargs):
-        """
-        Overriden to grant the user permission to all the folders, files and link
-        files within the folder.
-        """
-        super(FolderUserPermission, self).save(*args, **kwargs)
-
-        user = self.user
-        permission = self.permission
-        path = str(self.folder.path)
-        prefix = path + '/'  # avoid sibling folders with paths that start with path
-
-        folders = ChrisFolder.objects.filter(path__startswith=prefix)
-        objs = []
-        for folder in folders:
-            perm = FolderUserPermission(folder=folder, user=user, permission=permission)
-            objs.append(perm)
-        FolderUserPermission.objects.bulk_create(objs, update_conflicts=True,
-                                                 update_fields=['permission'],
-                                                 unique_fields=['folder_id', 'user_id'])
-
-        files = ChrisFile.objects.filter(fname__startswith=prefix)
-        objs = []
-        for f in files:
-            perm = FileUserPermission(file=f, user=user, permission=permission)
-            objs.append(perm)
-        FileUserPermission.objects.bulk_create(objs, update_conflicts=True,
-                                               update_fields=['permission'],
-                                               unique_fields=['file_id', 'user_id'])
-
-        link_files = ChrisLinkFile.objects.filter(fname__startswith=prefix)
-        objs = []
-        for lf in link_files:
-            perm = LinkFileUserPermission(link_file=lf, user=user, permission=permission)
-            objs.append(perm)
-        LinkFileUserPermission.objects.bulk_create(objs, update_conflicts=True,
-                                                   update_fields=['permission'],
-                                                   unique_fields=['link_file_id',
-                                                                  'user_id'])
-
-    def delete(self, *args, **kwargs):
-        """
-        Overriden to remove the user permission to all the folders, files and
-        link files within the folder.
-        """
-        super(FolderUserPermission, self).delete(*args, **kwargs)
-
-        user = self.user
-        permission = self.permission
-        path = str(self.folder.path)
-        prefix = path + '/'  # avoid sibling folders with paths that start with path
-
-        FolderUserPermission.objects.filter(folder__path__startswith=prefix, user=user,
-                                            permission=permission).delete()
-
-        FileUserPermission.objects.filter(file__fname__startswith=prefix, user=user,
-                                          permission=permission).delete()
-
-        LinkFileUserPermission.objects.filter(link_file__fname__startswith=prefix,
-                                              user=user, permission=permission).delete()
-
 
 class FolderUserPermissionFilter(FilterSet):
     username = django_filters.CharFilter(field_name='user__username', lookup_expr='exact')
@@ -679,6 +1106,8 @@ class FolderUserPermissionFilter(FilterSet):
 class ChrisFile(models.Model):
     creation_date = models.DateTimeField(auto_now_add=True)
     fname = models.FileField(max_length=1024, unique=True)
+    fsize = models.BigIntegerField(null=True, blank=True)  # size in bytes
+    etag = models.CharField(max_length=100, blank=True, default='')  # storage ETag
     public = models.BooleanField(blank=True, default=False, db_index=True)
     parent_folder = models.ForeignKey(ChrisFolder, on_delete=models.CASCADE,
                                       related_name='chris_files')
@@ -690,6 +1119,10 @@ class ChrisFile(models.Model):
 
     class Meta:
         ordering = ('-fname',)
+        indexes = [models.Index(fields=['parent_folder', 'fname'],
+                                name='core_chrisfile_parent_fname'),
+                   GinIndex(fields=['fname'], opclasses=['gin_trgm_ops'],
+                            name='core_chrisfile_fname_trgm')]
 
     def __str__(self):
         return self.fname.name
@@ -698,17 +1131,39 @@ class ChrisFile(models.Model):
         """
         Overriden to ensure file paths never start or end with slashes. Also, to delete
         a leftover file in storage if any error happens when saving the file.
+
+        The size and ETag of an uploaded file are recorded from its data and the
+        storage metadata. Files registered from existing storage objects must set
+        ``fsize`` and ``etag`` themselves.
         """
         path = self.fname.name
         if path.startswith('/') or path.endswith('/'):
             raise ValueError('Paths starting or ending with slashes are not allowed.')
+        uploading = bool(self.fname) and not self.fname._committed
+        if self.fsize is None and uploading:
+            self.fsize = self.fname.file.size
+        adding = self._state.adding
+        if adding:
+            # an uploaded file replaces the leftover object of a deleted file while a
+            # registered existing object must only be kept from being deleted
+            StorageGarbage.release(
+                path, connect_storage(settings) if uploading else None)
         try:
+            if uploading:
+                # write the data before the row so that the object's ETag is known
+                self.fname.save(path, self.fname.file, save=False)
+                path = self.fname.name
+                obj = connect_storage(settings).obj_info(path)
+                if obj is not None:
+                    self.etag = obj.etag
             super(ChrisFile, self).save(*args, **kwargs)
         except Exception:
             storage_manager = connect_storage(settings)
             if storage_manager.obj_exists(path):
                 storage_manager.delete_obj(path)
             raise
+        if adding:
+            FolderSizeDelta.record_file(self)
 
     def move(self, new_path):
         """
@@ -717,6 +1172,7 @@ class ChrisFile(models.Model):
         new_path = new_path.strip('/')
 
         storage_manager = connect_storage(settings)
+        StorageGarbage.release(new_path)
         if storage_manager.obj_exists(new_path):
             storage_manager.delete_obj(new_path)
 
@@ -733,7 +1189,9 @@ class ChrisFile(models.Model):
             except ChrisFolder.DoesNotExist:
                 parent_folder = ChrisFolder.objects.create(path=new_folder_path,
                                                            owner=self.owner)
+            FolderSizeDelta.record_file(self, -1)
             self.parent_folder = parent_folder
+            FolderSizeDelta.record_file(self)
 
         self.fname.name = new_path
         self.save()
@@ -741,19 +1199,21 @@ class ChrisFile(models.Model):
     def has_group_permission(self, group, permission=''):
         """
         Custom method to determine whether a group has been granted a permission to
-        access the file.
+        access the file, either directly or through the file's parent folder.
         """
         if not permission:
             qs = FileGroupPermission.objects.filter(group=group, file=self)
         else:
             p = validate_permission(permission)
             qs = FileGroupPermission.objects.filter(group=group, file=self, permission=p)
-        return qs.exists()
+        return qs.exists() or self.parent_folder.has_group_permission(
+            group, permission, contents=True)
 
     def has_user_permission(self, user, permission=''):
         """
         Custom method to determine whether a user has been granted a permission to
-        access the file (perhaps through one of its groups).
+        access the file (perhaps through one of its groups), either directly or through
+        the file's parent folder.
         """
         grp_qs = user.groups.all()
 
@@ -768,7 +1228,8 @@ class ChrisFile(models.Model):
                 return True
             qs = FileGroupPermission.objects.filter(file=self, permission=p,
                                                     group__in=grp_qs)
-        return qs.exists()
+        return qs.exists() or self.parent_folder.has_user_permission(
+            user, permission, contents=True)
 
     def get_groups_permissions_queryset(self):
         """
@@ -921,13 +1382,8 @@ class ChrisFile(models.Model):
 
 @receiver(post_delete, sender=ChrisFile)
 def auto_delete_file_from_storage(sender, instance, **kwargs):
-    storage_path = instance.fname.name
-    storage_manager = connect_storage(settings)
-    try:
-        if storage_manager.obj_exists(storage_path):
-            storage_manager.delete_obj(storage_path)
-    except Exception as e:
-        logger.error('Storage error, detail: %s' % str(e))
+    StorageGarbage.record(instance.fname.name)
+    FolderSizeDelta.record_file(instance, -1)
 
 
 class FileGroupPermission(models.Model):
@@ -937,6 +1393,8 @@ class FileGroupPermission(models.Model):
 
     class Meta:
         unique_together = ('file', 'group',)
+        indexes = [models.Index(fields=['group', 'file'],
+                                name='core_filegroupperm_group')]
 
     def __str__(self):
         return self.permission
@@ -957,6 +1415,8 @@ class FileUserPermission(models.Model):
 
     class Meta:
         unique_together = ('file', 'user',)
+        indexes = [models.Index(fields=['user', 'file'],
+                                name='core_fileuserperm_user')]
 
     def __str__(self):
         return self.permission
@@ -974,6 +1434,8 @@ class ChrisLinkFile(models.Model):
     creation_date = models.DateTimeField(auto_now_add=True)
     path = models.CharField(max_length=1024, db_index=True)  # pointed path
     fname = models.FileField(max_length=1024, unique=True)
+    fsize = models.BigIntegerField(null=True, blank=True)  # size in bytes
+    etag = models.CharField(max_length=100, blank=True, default='')  # storage ETag
     public = models.BooleanField(blank=True, default=False, db_index=True)
     parent_folder = models.ForeignKey(ChrisFolder, on_delete=models.CASCADE,
                                       related_name='chris_link_files')
@@ -983,6 +1445,12 @@ class ChrisLinkFile(models.Model):
     shared_users = models.ManyToManyField(User, related_name='shared_link_files',
                                           through='LinkFileUserPermission')
 
+    class Meta:
+        indexes = [models.Index(fields=['parent_folder', 'fname'],
+                                name='core_linkfile_parent_fname'),
+                   GinIndex(fields=['fname'], opclasses=['gin_trgm_ops'],
+                            name='core_linkfile_fname_trgm')]
+
     def __str__(self):
         return self.fname.name
 
@@ -998,12 +1466,18 @@ class ChrisLinkFile(models.Model):
 
         storage_manager = connect_storage(settings)
 
-        with io.StringIO(link_file_contents) as f:
-            if storage_manager.obj_exists(link_file_path):
-                storage_manager.delete_obj(link_file_path)
-            storage_manager.upload_obj(link_file_path, f.read(),
-                                       content_type='text/plain')
+        link_file_data = link_file_contents.encode('utf-8')
+
+        StorageGarbage.release(link_file_path)
+        if storage_manager.obj_exists(link_file_path):
+            storage_manager.delete_obj(link_file_path)
+        with storage_manager.open_write(link_file_path, content_type='text/plain') as f:
+            f.write(link_file_data)
         self.fname.name = link_file_path
+
+        # the contents are known so size and hash don't need a storage request
+        self.fsize = len(link_file_data)
+        self.etag = hashlib.md5(link_file_data).hexdigest()
         super(ChrisLinkFile, self).save(*args, **kwargs)
 
     def move(self, new_path):
@@ -1015,6 +1489,7 @@ class ChrisLinkFile(models.Model):
             raise ValueError("The new path must end with '.chrislink' sufix.")
 
         storage_manager = connect_storage(settings)
+        StorageGarbage.release(new_path)
         if storage_manager.obj_exists(new_path):
             storage_manager.delete_obj(new_path)
 
@@ -1041,7 +1516,7 @@ class ChrisLinkFile(models.Model):
     def has_group_permission(self, group, permission=''):
         """
         Custom method to determine whether a group has been granted a permission to
-        access the link file.
+        access the link file, either directly or through the link file's parent folder.
         """
         if not permission:
             qs = LinkFileGroupPermission.objects.filter(group=group, link_file=self)
@@ -1049,12 +1524,14 @@ class ChrisLinkFile(models.Model):
             p = validate_permission(permission)
             qs = LinkFileGroupPermission.objects.filter(group=group, link_file=self,
                                                         permission=p)
-        return qs.exists()
+        return qs.exists() or self.parent_folder.has_group_permission(
+            group, permission, contents=True)
 
     def has_user_permission(self, user, permission=''):
         """
         Custom method to determine whether a user has been granted a permission to
-        access the link file (perhaps through one of its groups).
+        access the link file (perhaps through one of its groups), either directly or
+        through the link file's parent folder.
         """
         grp_qs = user.groups.all()
 
@@ -1069,7 +1546,8 @@ class ChrisLinkFile(models.Model):
                 return True
             qs = LinkFileGroupPermission.objects.filter(link_file=self, permission=p,
                                                         group__in=grp_qs)
-        return qs.exists()
+        return qs.exists() or self.parent_folder.has_user_permission(
+            user, permission, contents=True)
 
     def get_groups_permissions_queryset(self):
         """
@@ -1217,14 +1695,8 @@ class ChrisLinkFile(models.Model):
 
 
 @receiver(post_delete, sender=ChrisLinkFile)
-def auto_delete_file_from_storage(sender, instance, **kwargs):
-    storage_path = instance.fname.name
-    storage_manager = connect_storage(settings)
-    try:
-        if storage_manager.obj_exists(storage_path):
-            storage_manager.delete_obj(storage_path)
-    except Exception as e:
-        logger.error('Storage error, detail: %s' % str(e))
+def auto_delete_link_file_from_storage(sender, instance, **kwargs):
+    StorageGarbage.record(instance.fname.name)
 
 
 class LinkFileGroupPermission(models.Model):
@@ -1234,6 +1706,8 @@ class LinkFileGroupPermission(models.Model):
 
     class Meta:
         unique_together = ('link_file', 'group',)
+        indexes = [models.Index(fields=['group', 'link_file'],
+                                name='core_linkfilegroupperm_group')]
 
     def __str__(self):
         return self.permission
@@ -1254,6 +1728,8 @@ class LinkFileUserPermission(models.Model):
 
     class Meta:
         unique_together = ('link_file', 'user',)
+        indexes = [models.Index(fields=['user', 'link_file'],
+                                name='core_linkfileuserperm_user')]
 
     def __str__(self):
         return self.permission
@@ -1284,3 +1760,93 @@ class FileDownloadTokenFilter(FilterSet):
     class Meta:
         model = FileDownloadToken
         fields = ['id']
+
+
+class StorageGarbage(models.Model):
+    """
+    Outbox of the storage objects of deleted files and link files. A row is created
+    in the same transaction that deletes the file from the DB and the object is
+    deleted from storage as soon as that transaction commits. The rows of the objects
+    that couldn't be deleted then are kept as retry records for the
+    delete_storage_garbage periodic task.
+    """
+    BATCH_SIZE = 1000
+
+    creation_date = models.DateTimeField(auto_now_add=True)
+    path = models.CharField(max_length=1024)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __str__(self):
+        return self.path
+
+    @classmethod
+    def record(cls, path):
+        """
+        Custom method to record the object at a path for deletion. The object is
+        deleted from storage when the current transaction commits.
+        """
+        garbage = cls.objects.create(path=path)
+        transaction.on_commit(lambda: cls.collect(ids=[garbage.id]), robust=True)
+
+    @classmethod
+    def collect(cls, storage_manager=None, ids=None):
+        """
+        Custom method to delete from storage up to BATCH_SIZE objects in the outbox
+        (only those of the given rows if ``ids`` is passed) with a single batch delete
+        request. Rows are locked while their batch is processed so that concurrent
+        calls don't process the same objects. Objects that were registered again in
+        the meantime are skipped and the rows of the objects that couldn't be deleted
+        are kept. Return the number of processed rows and the failures.
+        """
+        if storage_manager is None:
+            storage_manager = connect_storage(settings)
+
+        with transaction.atomic():
+            qs = cls.objects.select_for_update(skip_locked=True)
+            if ids is not None:
+                qs = qs.filter(id__in=ids)
+            garbage = list(qs[:cls.BATCH_SIZE])
+            if not garbage:
+                return 0, {}
+
+            paths = {g.path for g in garbage}
+            # skip the paths that were registered again after being deleted
+            paths.difference_update(ChrisFile.objects.filter(
+                fname__in=paths).values_list('fname', flat=True))
+            paths.difference_update(ChrisLinkFile.objects.filter(
+                fname__in=paths).values_list('fname', flat=True))
+
+            failures = storage_manager.delete_objs(paths) if paths else {}
+            cls.objects.filter(
+                id__in=[g.id for g in garbage if g.path not in failures]).delete()
+
+        if failures:
+            logger.error(f'Storage error, could not delete {len(failures)} object(s) '
+                         f'from storage, detail: {failures}')
+        return len(garbage), failures
+
+    @classmethod
+    def release(cls, path, storage_manager=None, prefix=False):
+        """
+        Custom method to drop the pending deletes of the object at a path (or of all
+        the objects under a path prefix if ``prefix`` is True) before new objects are
+        written there, so they can't delete the new objects. If a storage manager is
+        passed the deleted files' objects still in storage are deleted first, so that
+        a new upload to the same path isn't renamed by the storage backend.
+        """
+        lookup = {'path__startswith': path + '/'} if prefix else {'path': path}
+
+        with transaction.atomic():
+            garbage = list(cls.objects.select_for_update().filter(**lookup))
+            if not garbage:
+                return
+
+            if storage_manager is not None:
+                failures = storage_manager.delete_objs({g.path for g in garbage})
+                if failures:
+                    logger.error(f'Storage error, could not delete {len(failures)} '
+                                 f'object(s) from storage, detail: {failures}')
+                    return
+            cls.objects.filter(id__in=[g.id for g in garbage]).delete()
@@ -0,0 +1,174 @@
+
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DataError, models
+from django.db.models.fields.files import FieldFile
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetLimitOffsetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with an opt-in keyset (cursor) mode. Passing the
+    ``cursor`` query parameter (empty for the first page) switches to the keyset mode
+    where pages are selected with a WHERE clause on the queryset's ordering columns
+    (plus the primary key as a unique tie-breaker) instead of OFFSET and the total
+    count is not computed, so deep pages cost the same as the first one. The
+    ``next`` and ``previous`` links carry the cursor of the adjacent pages.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = None
+        if self.use_keyset(request):
+            self.ordering = self.get_keyset_ordering(queryset)
+        if self.ordering is None:
+            return super(KeysetLimitOffsetPagination, self).paginate_queryset(
+                queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            self.limit = self.default_limit
+        position, self.reverse = self.decode_cursor(request)
+
+        ordering = [(name, desc != self.reverse) for (name, desc) in self.ordering]
+        queryset = queryset.order_by(*[('-' if desc else '') + name
+                                       for (name, desc) in ordering])
+        try:
+            if position is not None:
+                queryset = queryset.filter(self.get_position_lookup(ordering, position))
+            results = list(queryset[:self.limit + 1])
+        except (TypeError, ValueError, ValidationError, DataError):
+            # the cursor's values don't fit the ordering columns
+            raise NotFound(self.invalid_cursor_message)
+        self.has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if self.reverse:
+            results.reverse()
+        self.is_first_page = position is None
+        self.positions = [self.get_position(obj) for obj in results[:1] + results[-1:]]
+        return results
+
+    def get_paginated_response(self, data):
+        if self.ordering is None:
+            return super(KeysetLimitOffsetPagination, self).get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if self.ordering is None:
+            return super(KeysetLimitOffsetPagination, self).get_next_link()
+        if not self.positions or (not self.reverse and not self.has_more):
+            return None
+        return self.encode_cursor(self.positions[-1], False)
+
+    def get_previous_link(self):
+        if self.ordering is None:
+            return super(KeysetLimitOffsetPagination, self).get_previous_link()
+        if not self.positions or self.is_first_page or (
+                self.reverse and not self.has_more):
+            return None
+        return self.encode_cursor(self.positions[0], True)
+
+    def use_keyset(self, request):
+        """
+        Return whether the request asks for the keyset mode.
+        """
+        return self.cursor_query_param in request.query_params
+
+    def get_keyset_ordering(self, queryset):
+        """
+        Return the queryset's ordering as a list of (field attname, descending)
+        tuples ending with a unique field (the primary key is appended as a
+        tie-breaker if there isn't one) or None if the ordering is not made of
+        the model's own non-nullable concrete fields or annotations (which are assumed
+        not to be NULL), in which case limit/offset is used instead.
+        """
+        if not isinstance(queryset, models.QuerySet) or queryset.query.combinator:
+            return None
+        opts = queryset.model._meta
+        ordering = []
+        for item in queryset.query.order_by or opts.ordering:
+            if not isinstance(item, str):
+                return None
+            name = item.lstrip('-')
+            name = opts.pk.attname if name == 'pk' else name
+            if name in queryset.query.annotations:
+                ordering.append((name, item.startswith('-')))
+                continue
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            # NULLs don't compare so nullable columns can't be part of a keyset
+            if not getattr(field, 'concrete', False) or field.many_to_many or field.null:
+                return None
+            ordering.append((field.attname, item.startswith('-')))
+            if field.primary_key or field.unique:
+                return ordering
+        ordering.append((opts.pk.attname, ordering[-1][1] if ordering else False))
+        return ordering
+
+    @staticmethod
+    def get_position_lookup(ordering, position):
+        """
+        Return the lookup matching the rows that come after the given position for
+        the given ordering, e.g. (a > x) OR (a = x AND b > y) for ascending columns.
+        """
+        lookup = models.Q()
+        for i, (name, desc) in enumerate(ordering):
+            row_lookup = {ordering[j][0]: position[j] for j in range(i)}
+            row_lookup[f'{name}__{"lt" if desc else "gt"}'] = position[i]
+            lookup |= models.Q(**row_lookup)
+        return lookup
+
+    def get_position(self, obj):
+        position = []
+        for (name, _) in self.ordering:
+            value = getattr(obj, name)
+            position.append(value.name if isinstance(value, FieldFile) else value)
+        return position
+
+    def decode_cursor(self, request):
+        """
+        Return the position and direction encoded in the request's cursor.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            position, reverse = data['p'], bool(data['r'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        data = json.dumps({'p': position, 'r': int(reverse)}, cls=DjangoJSONEncoder)
+        cursor = base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+
+class KeysetPagination(KeysetLimitOffsetPagination):
+    """
+    Keyset pagination for the list views that only support the keyset mode, the
+    first page is returned when no cursor is passed.
+    """
+
+    def use_keyset(self, request):
+        return True
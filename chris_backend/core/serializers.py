@@ -58,7 +58,9 @@ class ChrisFileSerializer(serializers.HyperlinkedModelSerializer,
         """
         Get the size of the file in bytes.
         """
-        return obj.fname.size
+        if obj.fsize is not None:
+            return obj.fsize
+        return obj.fname.size  # not recorded yet, ask the storage
 
     @extend_schema_field(OpenApiTypes.URI)
     def get_file_link(self, obj):
@@ -13,12 +13,14 @@ variable and function names use Swift terminology.
 """
 from typing import Dict
 
-from .storagemanager import StorageManager
+from .storagemanager import StorageManager, StorageObject
 from .swiftmanager import SwiftManager
 from .s3manager import S3Manager
 from .plain_fs import FilesystemManager
+from .bulk import BulkOperationError
 from .helpers import connect_storage, verify_storage_connection
 
 
-__all__ = ['StorageManager', 'SwiftManager', 'S3Manager', 'FilesystemManager',
-           'connect_storage', 'verify_storage_connection']
+__all__ = ['StorageManager', 'StorageObject', 'SwiftManager', 'S3Manager',
+           'FilesystemManager', 'BulkOperationError', 'connect_storage',
+           'verify_storage_connection']
@@ -0,0 +1,94 @@
+"""
+Helpers for running storage operations over many objects concurrently.
+
+Object storage services are latency-bound: copying, moving or deleting a prefix one
+object at a time spends almost all of its time waiting on round trips. The helpers in
+this module run those per-object requests on a bounded pool of worker threads and
+collect per-object failures so that a single bad object doesn't abort the whole
+operation halfway through.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterable, Iterator, List, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+DEFAULT_MAX_WORKERS = 16
+"""
+Default number of concurrent requests issued by a storage manager for prefix
+operations. Can be overridden with the ``STORAGE_MAX_WORKERS`` setting.
+"""
+
+
+class BulkOperationError(Exception):
+    """
+    Raised when a storage operation over many objects finished but some of the
+    per-object requests failed. The ``failures`` attribute maps each failed object
+    path to a human-readable error message.
+    """
+
+    def __init__(self, operation: str, failures: Dict[str, str]):
+        self.operation = operation
+        self.failures = failures
+        sample = '; '.join(f'{k}: {v}' for k, v in list(failures.items())[:5])
+        super().__init__(f'{operation} failed for {len(failures)} object(s), '
+                         f'detail: {sample}')
+
+
+def run_concurrently(func: Callable[[T], None], items: Iterable[T],
+                     key: Callable[[T], str], max_workers: int) -> Dict[str, str]:
+    """
+    Apply ``func`` to every element of ``items`` using at most ``max_workers``
+    threads. The number of in-flight tasks is bounded so ``items`` may be a lazy
+    iterable of any length.
+
+    Returns a dictionary with the failures. Keys are given by ``key(item)`` and
+    values are the error messages.
+    """
+    failures = {}
+
+    def _collect(done):
+        for future in done:
+            item = pending.pop(future)
+            exc = future.exception()
+            if exc is not None:
+                logger.error(f'Storage error for {key(item)}, detail: {str(exc)}')
+                failures[key(item)] = str(exc)
+
+    if max_workers <= 1:
+        for item in items:
+            try:
+                func(item)
+            except Exception as e:
+                logger.error(f'Storage error for {key(item)}, detail: {str(e)}')
+                failures[key(item)] = str(e)
+        return failures
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item in items:
+            if len(pending) >= 2 * max_workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(done)
+            pending[executor.submit(func, item)] = item
+        done, _ = wait(pending)
+        _collect(done)
+    return failures
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split an iterable into lists of at most ``size`` elements.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,3 +1,6 @@
+import json
+import os
+import threading
 from typing import Dict, Any, ContextManager
 from tempfile import TemporaryDirectory
 import unittest.mock
@@ -6,24 +9,76 @@ from contextlib import contextmanager
 from core.storage.storagemanager import StorageManager
 from core.storage.swiftmanager import SwiftManager
 from core.storage.plain_fs import FilesystemManager
-from core.storage.s3manager import S3Manager
+from core.storage.s3manager import S3Manager, DEFAULT_MULTIPART_THRESHOLD
+from core.storage.bulk import DEFAULT_MAX_WORKERS
+
+
+# settings that determine the storage manager returned by connect_storage
+_STORAGE_SETTINGS = ('MEDIA_ROOT', 'SWIFT_CONTAINER_NAME', 'SWIFT_CONNECTION_PARAMS',
+                     'SWIFT_TEMP_URL_KEY', 'S3_BUCKET_NAME', 'S3_CONNECTION_PARAMS',
+                     'S3_MULTIPART_THRESHOLD', 'STORAGE_MAX_WORKERS')
+
+# process-wide registry of storage managers keyed by their settings
+_managers: Dict[str, StorageManager] = {}
+_managers_lock = threading.Lock()
 
 
 def connect_storage(settings) -> StorageManager:
     """
     :param settings: django.conf.settings object
-    :returns: a manager for the storage configured by settings
+    :returns: the manager for the storage configured by settings
+
+    Managers are thread-safe and shared by the whole process so that their HTTP
+    connection pools and authentication tokens are reused across calls. A forked
+    child process starts with an empty registry.
+    """
+    key = json.dumps([__get_storage_name(settings)] +
+                     [getattr(settings, name, None) for name in _STORAGE_SETTINGS],
+                     sort_keys=True, default=str)
+    manager = _managers.get(key)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(key)
+            if manager is None:
+                manager = _create_storage_manager(settings)
+                _managers[key] = manager
+    return manager
+
+
+def _create_storage_manager(settings) -> StorageManager:
+    """
+    :param settings: django.conf.settings object
+    :returns: a new manager for the storage configured by settings
     """
     storage_name = __get_storage_name(settings)
+    max_workers = getattr(settings, 'STORAGE_MAX_WORKERS', DEFAULT_MAX_WORKERS)
     if storage_name == 'SwiftStorage':
-        return SwiftManager(settings.SWIFT_CONTAINER_NAME, settings.SWIFT_CONNECTION_PARAMS)
+        return SwiftManager(settings.SWIFT_CONTAINER_NAME, settings.SWIFT_CONNECTION_PARAMS,
+                            max_workers=max_workers,
+                            temp_url_key=getattr(settings, 'SWIFT_TEMP_URL_KEY', ''))
     elif storage_name == 'FileSystemStorage':
         return FilesystemManager(settings.MEDIA_ROOT)
     elif storage_name == 'S3Boto3Storage':
-        return S3Manager(settings.S3_BUCKET_NAME, settings.S3_CONNECTION_PARAMS)
+        return S3Manager(settings.S3_BUCKET_NAME, settings.S3_CONNECTION_PARAMS,
+                         max_workers=max_workers,
+                         multipart_threshold=getattr(settings, 'S3_MULTIPART_THRESHOLD',
+                                                     DEFAULT_MULTIPART_THRESHOLD))
     raise ValueError(f'Unsupported storage system: {storage_name}')
 
 
+def _reset_managers() -> None:
+    """
+    Empty the registry of storage managers. Called in the child after a fork since
+    network connections can't be shared between processes.
+    """
+    global _managers_lock
+    _managers.clear()
+    _managers_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_managers)
+
+
 def verify_storage_connection(**kwargs) -> None:
     """
     Create a ``StorageManager`` for the given settings. Raises an exception if the connection
@@ -1,9 +1,33 @@
 
+import datetime
+import io
+import os
 from pathlib import Path
 import shutil
-from typing import Union, List, Dict, AnyStr, Optional
+from typing import Union, List, Dict, AnyStr, Optional, Iterable, Iterator, Tuple, BinaryIO
 
-from core.storage.storagemanager import StorageManager
+from core.storage.storagemanager import StorageManager, StorageObject
+from core.storage.streams import CHUNK_SIZE, LimitedStream
+
+
+class _FileWriter(io.BufferedWriter):
+    """
+    Buffered file writer that removes the file when the write is aborted.
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        super().__init__(io.FileIO(path, 'wb'), CHUNK_SIZE)
+
+    def abort(self) -> None:
+        self.close()
+        self._path.unlink(missing_ok=True)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
 
 
 class FilesystemManager(StorageManager):
@@ -24,10 +48,54 @@ class FilesystemManager(StorageManager):
         self.__base.mkdir(exist_ok=True, parents=True)
 
     def ls(self, path_prefix: str) -> List[str]:
-        if self.obj_exists(path_prefix):
-            return [path_prefix]
-        all_paths = (self.__base / path_prefix).rglob('*')
-        return [str(p.relative_to(self.__base)) for p in all_paths if p.is_file()]
+        return list(self.iter_ls(path_prefix))
+
+    def ls_info(self, path_prefix: str) -> List[StorageObject]:
+        return list(self.iter_ls_info(path_prefix))
+
+    def iter_ls(self, path_prefix: str) -> Iterator[str]:
+        for name, _ in self.__walk(path_prefix):
+            yield name
+
+    def iter_ls_info(self, path_prefix: str) -> Iterator[StorageObject]:
+        for name, entry in self.__walk(path_prefix):
+            yield self.__stat_obj(name, entry.stat())
+
+    def __walk(self, path_prefix: str) -> Iterator[Tuple[str, Union[os.DirEntry, Path]]]:
+        """
+        Lazily yield the relative path and the directory entry of every file under the
+        given path, one directory at a time.
+        """
+        p = self.__base / path_prefix
+        if p.is_file():
+            yield path_prefix, p
+            return
+        dirs = [p]
+        while dirs:
+            try:
+                entries = os.scandir(dirs.pop())
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        dirs.append(entry.path)
+                    elif entry.is_file():
+                        yield os.path.relpath(entry.path, self.__base), entry
+
+    @staticmethod
+    def __stat_obj(name: str, st: os.stat_result) -> StorageObject:
+        """
+        :returns: a ``StorageObject`` for the given stat result. The ETag is derived
+                  from the modification time and size, like common web servers do.
+        """
+        return StorageObject(
+            name=name,
+            size=st.st_size,
+            etag=f'{st.st_mtime_ns:x}-{st.st_size:x}',
+            last_modified=datetime.datetime.fromtimestamp(st.st_mtime,
+                                                          tz=datetime.timezone.utc)
+        )
 
     def path_exists(self, path: str) -> bool:
         return (self.__base / path).exists()
@@ -54,6 +122,25 @@ class FilesystemManager(StorageManager):
     def download_obj(self, file_path: str) -> AnyStr:
         return (self.__base / file_path).read_bytes()
 
+    def open_read(self, file_path: str, start: int = 0,
+                  end: Optional[int] = None) -> BinaryIO:
+        if start == 0 and end is None:
+            return (self.__base / file_path).open('rb', buffering=CHUNK_SIZE)
+        f = (self.__base / file_path).open('rb', buffering=0)
+        f.seek(start)
+        if end is None:
+            return io.BufferedReader(f, CHUNK_SIZE)
+        return io.BufferedReader(LimitedStream(f, end - start), CHUNK_SIZE)
+
+    def open_write(self, file_path: str, content_type: Optional[str] = None) -> BinaryIO:
+        dst = (self.__base / file_path)
+        dst.parent.mkdir(exist_ok=True, parents=True)
+        return _FileWriter(dst)
+
+    def get_download_url(self, file_path: str, expires_in: int,
+                         filename: Optional[str] = None) -> Optional[str]:
+        return None  # files are served by the reverse proxy instead, if configured
+
     def copy_obj(self, src: str, dst: str) -> None:
         src_path = self.__base / src
         dst_path = self.__base / dst
@@ -63,6 +150,15 @@ class FilesystemManager(StorageManager):
     def delete_obj(self, file_path: str) -> None:
         (self.__base / file_path).unlink()
 
+    def delete_objs(self, file_paths: Iterable[str]) -> Dict[str, str]:
+        failures = {}
+        for file_path in file_paths:
+            try:
+                (self.__base / file_path).unlink(missing_ok=True)
+            except OSError as e:
+                failures[file_path] = str(e)
+        return failures
+
     def copy_path(self, src: str, dst: str) -> None:
         src_path = self.__base / src
         dst_path = self.__base / dst
@@ -126,12 +222,14 @@ class FilesystemManager(StorageManager):
         p_rel = Path(path)
 
         if p.is_dir():
-            for item in sorted(p.rglob('*'), key=lambda i: len(i.parts), reverse=True):
-                # Sorted by depth (deepest paths first) to handle files and subfolders
-                # before their parent folders
-                new_name = item.name.replace(',', '')
-
-                if item.is_file():
+            # Walk the tree bottom-up to handle files and subfolders before their
+            # parent folders without materializing the whole listing
+            for dirpath, dirnames, filenames in os.walk(p, topdown=False):
+                d = Path(dirpath)
+
+                for name in filenames:
+                    item = d / name
+                    new_name = name.replace(',', '')
                     item_rel_path = item.relative_to(self.__base)
 
                     if new_name.strip() == '':
@@ -152,7 +250,10 @@ class FilesystemManager(StorageManager):
                         if new_item_rel_path != item_rel_path:  # Final file path changes
                             new_file_paths[str(item_rel_path)] = str(new_item_rel_path)
 
-                elif item.is_dir():
+                for name in dirnames:
+                    item = d / name
+                    new_name = name.replace(',', '')
+
                     if new_name.strip() == '':
                         # Move contents to the parent folder
                         parent = item.parent
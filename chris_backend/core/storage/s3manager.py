@@ -11,15 +11,20 @@ MD5 hashes. We disable this via botocore.config.Config below.
 """
 
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import Dict, List, AnyStr, Optional
+from typing import Dict, List, AnyStr, Optional, Iterable, Iterator, BinaryIO
 
 import boto3
 from botocore.config import Config
 from botocore.exceptions import ClientError
 
-from core.storage.storagemanager import StorageManager
+from core.storage.storagemanager import StorageManager, StorageObject
+from core.storage.bulk import (BulkOperationError, DEFAULT_MAX_WORKERS, batched,
+                               run_concurrently)
+from core.storage.streams import ObjectWriter, http_range
 
 logger = logging.getLogger(__name__)
 
@@ -32,37 +37,186 @@ _S3_CLIENT_CONFIG = Config(
     response_checksum_validation='when_required',
 )
 
+# maximum number of keys accepted by a single DeleteObjects request
+_S3_DELETE_BATCH_SIZE = 1000
+
+DEFAULT_MULTIPART_THRESHOLD = 64 * 1024 * 1024
+"""
+Default size above which objects are uploaded and copied with multipart requests.
+Can be overridden with the ``S3_MULTIPART_THRESHOLD`` setting.
+"""
+
+# minimum size of the parts of a multipart upload, S3 requires at least 5 MiB for
+# all the parts but the last one
+_S3_PART_SIZE = 8 * 1024 * 1024
+
+# maximum number of parts of a multipart upload
+_S3_MAX_PARTS = 10000
+
+# maximum size of an object that can be copied with a single CopyObject request
+_S3_MAX_COPY_SIZE = 5 * 1024 * 1024 * 1024
+
+
+def _part_size(size: int) -> int:
+    """
+    Return the part size of a multipart upload of an object of the given size.
+    """
+    return max(_S3_PART_SIZE, -(-size // _S3_MAX_PARTS))
+
+
+def _call_with_retries(func, **kwargs):
+    """
+    Call an S3 client method retrying on client errors.
+    """
+    for i in range(5):
+        try:
+            return func(**kwargs)
+        except ClientError as e:
+            logger.error(str(e))
+            if i == 4:
+                raise
+            time.sleep(0.4)
+
+
+def _is_copy_too_large(error: ClientError) -> bool:
+    """
+    Return whether a CopyObject error means that the source object is larger than the
+    maximum size of a single request copy. S3 reports it as an InvalidRequest error
+    (like other invalid copies) so the error message has to be checked.
+    """
+    err = error.response.get('Error', {})
+    if err.get('Code') == 'EntityTooLarge':
+        return True
+    return err.get('Code') == 'InvalidRequest' and (
+        'maximum allowable size' in err.get('Message', ''))
+
+
+class _S3ObjectWriter(ObjectWriter):
+    """
+    Writable stream that uploads an S3 object. Objects that fit in a single part
+    are uploaded with a plain PutObject request, larger ones with a multipart
+    upload whose parts are sent by up to ``max_workers`` threads while the data is
+    still being written.
+    """
+
+    def __init__(self, client, bucket_name: str, key: str,
+                 content_type: Optional[str] = None, max_workers: int = 1):
+        super().__init__(_S3_PART_SIZE)
+        self._client = client
+        self._object_kwargs = {'Bucket': bucket_name, 'Key': key}
+        if content_type:
+            self._object_kwargs['ContentType'] = content_type
+        self._max_workers = max(1, max_workers)
+        self._executor = None
+        self._pending = set()  # futures of the parts being uploaded
+        self._upload_id = None
+        self._parts = []
+
+    def _send_part(self, part_number: int, data: bytes) -> dict:
+        resp = _call_with_retries(self._client.upload_part,
+                                  Bucket=self._object_kwargs['Bucket'],
+                                  Key=self._object_kwargs['Key'],
+                                  UploadId=self._upload_id,
+                                  PartNumber=part_number,
+                                  Body=data)
+        return {'ETag': resp['ETag'], 'PartNumber': part_number}
+
+    def _collect(self, done):
+        self._pending -= done
+        for future in done:
+            self._parts.append(future.result())  # re-raises the part's error
+
+    def _upload_part(self, part, size):
+        if self._upload_id is None:
+            resp = _call_with_retries(self._client.create_multipart_upload,
+                                      **self._object_kwargs)
+            self._upload_id = resp['UploadId']
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        if len(self._pending) >= self._max_workers:
+            # bound the number of parts held in memory
+            done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        part_number = len(self._parts) + len(self._pending) + 1
+        self._pending.add(self._executor.submit(self._send_part, part_number,
+                                                part.read()))
+
+    def _complete(self, part, size):
+        if self._upload_id is None:
+            _call_with_retries(self._client.put_object, Body=part.read(),
+                               **self._object_kwargs)
+            return
+        self._upload_part(part, size)
+        done, _ = wait(self._pending)
+        self._collect(done)
+        self._executor.shutdown()
+        _call_with_retries(self._client.complete_multipart_upload,
+                           Bucket=self._object_kwargs['Bucket'],
+                           Key=self._object_kwargs['Key'],
+                           UploadId=self._upload_id,
+                           MultipartUpload={'Parts': sorted(
+                               self._parts, key=lambda p: p['PartNumber'])})
+
+    def _abort(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+        if self._upload_id is not None:
+            _call_with_retries(self._client.abort_multipart_upload,
+                               Bucket=self._object_kwargs['Bucket'],
+                               Key=self._object_kwargs['Key'],
+                               UploadId=self._upload_id)
+
 
 class S3Manager(StorageManager):
 
-    def __init__(self, bucket_name: str, conn_params: dict):
+    def __init__(self, bucket_name: str, conn_params: dict,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD):
         self.bucket_name = bucket_name
         self.conn_params = conn_params
+        # number of concurrent requests issued by prefix and multipart operations
+        self.max_workers = max_workers
+        # objects larger than this are uploaded and copied in parallel parts
+        self.multipart_threshold = multipart_threshold
         self._client = None
+        self._client_lock = threading.Lock()
 
     def __get_client(self):
         """
         Connect to S3-compatible storage and return the client object.
+
+        The client is shared by all the threads, it keeps a pool of HTTP connections
+        that is reused by every request.
         """
         if self._client is not None:
             return self._client
+        with self._client_lock:
+            if self._client is None:
+                self._client = self.__create_client()
+        return self._client
+
+    def __create_client(self):
+        """
+        Create the boto3 client. A new session is used because creating clients
+        from boto3's default session is not thread-safe.
+        """
         for i in range(5):
             try:
-                self._client = boto3.client(
+                return boto3.session.Session().client(
                     's3',
                     endpoint_url=self.conn_params.get('endpoint_url'),
                     aws_access_key_id=self.conn_params.get('access_key'),
                     aws_secret_access_key=self.conn_params.get('secret_key'),
                     region_name=self.conn_params.get('region_name', 'us-east-1'),
-                    config=_S3_CLIENT_CONFIG,
+                    # boto3 clients are thread-safe, make sure the underlying
+                    # connection pool is large enough for the bulk operations
+                    config=_S3_CLIENT_CONFIG.merge(
+                        Config(max_pool_connections=max(10, self.max_workers))),
                 )
             except ClientError as e:
                 logger.error(str(e))
                 if i == 4:
                     raise
                 time.sleep(0.4)
-            else:
-                return self._client
 
     def create_container(self) -> None:
         """
@@ -89,25 +243,59 @@ class S3Manager(StorageManager):
         """
         Return a list of object keys in the bucket with the given path as prefix.
         """
-        l_ls = []
+        return list(self.iter_ls(path))
+
+    def ls_info(self, path: str) -> List[StorageObject]:
+        """
+        Return a list of objects in the bucket with the given path as prefix along
+        with their size, ETag and last modification time.
+        """
+        return list(self.iter_ls_info(path))
+
+    def iter_ls(self, path: str) -> Iterator[str]:
+        """
+        Lazily yield the object keys in the bucket with the given path as prefix,
+        one listing page at a time.
+        """
+        for page in self._iter_pages(path):
+            for obj in page:
+                yield obj['Key']
+
+    def iter_ls_info(self, path: str) -> Iterator[StorageObject]:
+        """
+        Same as ``iter_ls`` but yields the objects' metadata.
+        """
+        for page in self._iter_pages(path):
+            for obj in page:
+                yield StorageObject(name=obj['Key'],
+                                    size=obj['Size'],
+                                    etag=obj['ETag'].strip('"'),
+                                    last_modified=obj['LastModified'])
+
+    def _iter_pages(self, path: str) -> Iterator[List[dict]]:
+        """
+        Yield the contents of each ListObjectsV2 page for the given prefix. Every page
+        request is retried on its own so that a long listing resumes where it failed.
+        """
         if not path:
-            return l_ls
+            return
         client = self.__get_client()
-        for i in range(5):
-            try:
-                paginator = client.get_paginator('list_objects_v2')
-                pages = paginator.paginate(Bucket=self.bucket_name, Prefix=path)
-                for page in pages:
-                    for obj in page.get('Contents', []):
-                        l_ls.append(obj['Key'])
-            except ClientError as e:
-                logger.error(str(e))
-                if i == 4:
-                    raise
-                time.sleep(0.4)
-            else:
+        list_kwargs = {'Bucket': self.bucket_name, 'Prefix': path}
+        while True:
+            for i in range(5):
+                try:
+                    resp = client.list_objects_v2(**list_kwargs)
+                except ClientError as e:
+                    logger.error(str(e))
+                    if i == 4:
+                        raise
+                    time.sleep(0.4)
+                else:
+                    break
+            yield resp.get('Contents', [])
+            if not resp.get('IsTruncated'):
                 break
-        return l_ls
+            list_kwargs['ContinuationToken'] = resp['NextContinuationToken']
 
     def path_exists(self, path: str) -> bool:
         """
@@ -159,6 +347,16 @@ class S3Manager(StorageManager):
         }
         if content_type:
             put_kwargs['ContentType'] = content_type
+        if len(contents) > self.multipart_threshold:
+            data = memoryview(contents)
+            self._multipart_upload(
+                file_path, len(data),
+                lambda upload_id, part_number, start, end: _call_with_retries(
+                    client.upload_part, Bucket=self.bucket_name, Key=file_path,
+                    UploadId=upload_id, PartNumber=part_number,
+                    Body=data[start:end].tobytes())['ETag'],
+                content_type)
+            return
         for i in range(5):
             try:
                 client.put_object(**put_kwargs)
@@ -185,20 +383,73 @@ class S3Manager(StorageManager):
                     raise
                 time.sleep(0.4)
 
+    def open_read(self, file_path: str, start: int = 0,
+                  end: Optional[int] = None) -> BinaryIO:
+        """
+        Open an S3 object for reading. The returned streaming body fetches the
+        object data from the open HTTP response as it is read. A byte range is
+        requested with the ``Range`` header.
+        """
+        client = self.__get_client()
+        get_kwargs = {'Bucket': self.bucket_name, 'Key': file_path}
+        byte_range = http_range(start, end)
+        if byte_range:
+            get_kwargs['Range'] = byte_range
+        resp = _call_with_retries(client.get_object, **get_kwargs)
+        return resp['Body']
+
+    def open_write(self, file_path: str,
+                   content_type: Optional[str] = None) -> BinaryIO:
+        """
+        Open an S3 object for writing. Data is uploaded in parts of
+        ``_S3_PART_SIZE`` bytes as it is written.
+        """
+        return _S3ObjectWriter(self.__get_client(), self.bucket_name, file_path,
+                               content_type, self.max_workers)
+
+    def get_download_url(self, file_path: str, expires_in: int,
+                         filename: Optional[str] = None) -> Optional[str]:
+        """
+        Return a presigned GetObject URL for the given key. The URL is signed locally
+        so no request is sent to the storage service.
+        """
+        params = {'Bucket': self.bucket_name, 'Key': file_path}
+        if filename:
+            params['ResponseContentDisposition'] = f'attachment; filename="{filename}"'
+        return self.__get_client().generate_presigned_url('get_object', Params=params,
+                                                          ExpiresIn=expires_in)
+
     def copy_obj(self, src: str, dst: str) -> None:
         """
         Copy an object within the same bucket.
         """
+        self._copy_obj(src, dst)
+
+    def _copy_obj(self, src: str, dst: str, size: Optional[int] = None) -> None:
+        """
+        Copy an object within the same bucket. Objects larger than the multipart
+        threshold are copied server-side in parallel parts with UploadPartCopy.
+
+        :param size: object size if already known from a listing. When it's not known
+                     a plain CopyObject request is tried first and the object is only
+                     copied in parts if it's too large for it
+        """
         client = self.__get_client()
-        copy_source = {'Bucket': self.bucket_name, 'Key': src}
+        threshold = min(self.multipart_threshold, _S3_MAX_COPY_SIZE)
+        if size is not None and size > threshold:
+            self._multipart_copy(src, dst)
+            return
         for i in range(5):
             try:
                 client.copy_object(
                     Bucket=self.bucket_name,
                     Key=dst,
-                    CopySource=copy_source,
+                    CopySource={'Bucket': self.bucket_name, 'Key': src},
                 )
             except ClientError as e:
+                if size is None and _is_copy_too_large(e):
+                    self._multipart_copy(src, dst)
+                    return
                 logger.error(str(e))
                 if i == 4:
                     raise
@@ -206,6 +457,56 @@ class S3Manager(StorageManager):
             else:
                 break
 
+    def _multipart_copy(self, src: str, dst: str) -> None:
+        """
+        Copy an object within the same bucket in parallel parts with UploadPartCopy.
+        """
+        client = self.__get_client()
+        copy_source = {'Bucket': self.bucket_name, 'Key': src}
+        # multipart copies don't carry over the content type of the source
+        head = _call_with_retries(client.head_object, Bucket=self.bucket_name, Key=src)
+        self._multipart_upload(
+            dst, head['ContentLength'],
+            lambda upload_id, part_number, start, end: _call_with_retries(
+                client.upload_part_copy, Bucket=self.bucket_name, Key=dst,
+                UploadId=upload_id, PartNumber=part_number,
+                CopySource=copy_source,
+                CopySourceRange=f'bytes={start}-{end - 1}'
+            )['CopyPartResult']['ETag'],
+            head.get('ContentType'))
+
+    def _multipart_upload(self, key: str, size: int, upload_part,
+                          content_type: Optional[str] = None) -> None:
+        """
+        Create an object of the given size with a multipart upload whose parts are
+        sent concurrently. ``upload_part(upload_id, part_number, start, end)`` must
+        upload the bytes ``[start, end)`` of the object and return the part's ETag.
+        The multipart upload is aborted if any part fails.
+        """
+        client = self.__get_client()
+        create_kwargs = {'Bucket': self.bucket_name, 'Key': key}
+        if content_type:
+            create_kwargs['ContentType'] = content_type
+        upload_id = _call_with_retries(client.create_multipart_upload,
+                                       **create_kwargs)['UploadId']
+        part_size = _part_size(size)
+        ranges = [(part_number, start, min(start + part_size, size))
+                  for part_number, start in enumerate(range(0, size, part_size), 1)]
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+                etags = list(executor.map(lambda r: upload_part(upload_id, *r),
+                                          ranges))
+            _call_with_retries(client.complete_multipart_upload,
+                               Bucket=self.bucket_name, Key=key, UploadId=upload_id,
+                               MultipartUpload={'Parts': [
+                                   {'ETag': etag, 'PartNumber': part_number}
+                                   for (part_number, _, _), etag in zip(ranges, etags)
+                               ]})
+        except Exception:
+            _call_with_retries(client.abort_multipart_upload, Bucket=self.bucket_name,
+                               Key=key, UploadId=upload_id)
+            raise
+
     def delete_obj(self, file_path: str) -> None:
         """
         Delete an object from S3.
@@ -222,53 +523,108 @@ class S3Manager(StorageManager):
             else:
                 break
 
+    def delete_objs(self, file_paths: Iterable[str]) -> Dict[str, str]:
+        """
+        Delete the given objects from S3 using concurrent DeleteObjects requests of up
+        to 1000 objects each.
+
+        Returns a dictionary with the objects that couldn't be deleted and their errors.
+        """
+        return self._delete_keys(file_paths)
+
     def copy_path(self, src: str, dst: str) -> None:
         """
         Copy all objects under src prefix to dst prefix.
+
+        Objects are copied concurrently while the source prefix is being listed.
+        Raises ``BulkOperationError`` after all the copies have been attempted if any
+        of them failed.
         """
-        l_ls = self.ls(src)
-        for obj_key in l_ls:
-            new_key = obj_key.replace(src, dst, 1)
-            self.copy_obj(obj_key, new_key)
+        failures = run_concurrently(
+            lambda obj: self._copy_obj(obj.name, obj.name.replace(src, dst, 1), obj.size),
+            self._iter_src_objs(src, dst), key=lambda obj: obj.name,
+            max_workers=self.max_workers)
+        if failures:
+            raise BulkOperationError('copy_path', failures)
 
     def move_path(self, src: str, dst: str) -> None:
         """
         Move all objects under src prefix to dst prefix (copy + delete).
+
+        The source prefix is processed one listing page at a time: the page's objects
+        are copied concurrently and then their sources are removed with a single batch
+        delete. The source of an object that couldn't be copied is left in place.
+        Raises ``BulkOperationError`` if any of the objects couldn't be moved.
         """
-        l_ls = self.ls(src)
-        for obj_key in l_ls:
-            new_key = obj_key.replace(src, dst, 1)
-            self.copy_obj(obj_key, new_key)
-            self.delete_obj(obj_key)
+        failures = {}
+        for objs in batched(self._iter_src_objs(src, dst), _S3_DELETE_BATCH_SIZE):
+            copy_failures = run_concurrently(
+                lambda obj: self._copy_obj(obj.name, obj.name.replace(src, dst, 1),
+                                           obj.size),
+                objs, key=lambda obj: obj.name, max_workers=self.max_workers)
+            failures.update(copy_failures)
+            copied = [obj.name for obj in objs if obj.name not in copy_failures]
+            if copied:
+                failures.update(self._delete_batch(copied))
+        if failures:
+            raise BulkOperationError('move_path', failures)
 
     def delete_path(self, path: str) -> None:
         """
         Delete all objects under a given prefix.
 
-        Uses batch delete for efficiency (up to 1000 objects per request).
+        Uses batch delete for efficiency (up to 1000 objects per request) and sends
+        the batches concurrently while the prefix is being listed. Raises
+        ``BulkOperationError`` if any of the objects couldn't be deleted.
+        """
+        failures = self._delete_keys(self.iter_ls(path))
+        if failures:
+            raise BulkOperationError('delete_path', failures)
+
+    def _iter_src_objs(self, src: str, dst: str) -> Iterable[StorageObject]:
+        """
+        Return the objects under the src prefix for a copy or move to dst. The listing
+        is only materialized upfront when the new keys would also match the src prefix.
+        """
+        if dst.startswith(src):
+            return self.ls_info(src)
+        return self.iter_ls_info(src)
+
+    def _delete_keys(self, keys) -> Dict[str, str]:
+        """
+        Delete the given object keys using concurrent DeleteObjects requests.
+
+        Returns a dictionary with the keys that couldn't be deleted and their errors.
+        """
+        failures = {}
+        run_concurrently(lambda batch: failures.update(self._delete_batch(batch)),
+                         batched(keys, _S3_DELETE_BATCH_SIZE), key=lambda b: b[0],
+                         max_workers=self.max_workers)
+        return failures
+
+    def _delete_batch(self, keys: List[str]) -> Dict[str, str]:
+        """
+        Delete up to 1000 objects with a single DeleteObjects request.
+
+        Returns a dictionary with the keys that couldn't be deleted and their errors.
         """
         client = self.__get_client()
-        paginator = client.get_paginator('list_objects_v2')
-        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=path)
-
-        for page in pages:
-            contents = page.get('Contents', [])
-            if not contents:
-                continue
-            delete_keys = [{'Key': obj['Key']} for obj in contents]
-            for i in range(5):
-                try:
-                    client.delete_objects(
-                        Bucket=self.bucket_name,
-                        Delete={'Objects': delete_keys, 'Quiet': True},
-                    )
-                except ClientError as e:
-                    logger.error(str(e))
-                    if i == 4:
-                        raise
-                    time.sleep(0.4)
-                else:
-                    break
+        delete_keys = [{'Key': key} for key in keys]
+        for i in range(5):
+            try:
+                resp = client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': delete_keys, 'Quiet': True},
+                )
+            except ClientError as e:
+                logger.error(str(e))
+                if i == 4:
+                    return {key: str(e) for key in keys}
+                time.sleep(0.4)
+            else:
+                # in quiet mode only the keys that failed are reported
+                return {err['Key']: f"{err.get('Code')}: {err.get('Message')}"
+                        for err in resp.get('Errors', [])}
 
     def sanitize_obj_names(self, path: str) -> Dict[str, str]:
         """
@@ -284,17 +640,21 @@ class S3Manager(StorageManager):
         the empty string as the value.
         """
         new_obj_paths = {}
-        l_ls = self.ls(path)
+        failures = {}
+        p = Path(path)
 
-        if len(l_ls) != 1 or l_ls[0] != path:  # path is a prefix
-            p = Path(path)
+        # process the listing one page at a time to keep memory bounded
+        for l_ls in batched(self.iter_ls_info(path), _S3_DELETE_BATCH_SIZE):
+            page_obj_paths = {}
+            page_obj_sizes = {obj.name: obj.size for obj in l_ls}
 
-            for obj_path in l_ls:
+            for obj_path in page_obj_sizes:
+                if obj_path == path:  # path is an object rather than a prefix
+                    continue
                 p_obj = Path(obj_path)
 
                 if p_obj.name.replace(',', '').strip() == '':
-                    self.delete_obj(obj_path)
-                    new_obj_paths[obj_path] = ''
+                    page_obj_paths[obj_path] = ''
                 else:
                     new_parts = []
                     for part in p_obj.relative_to(p).parts:
@@ -305,8 +665,19 @@ class S3Manager(StorageManager):
                     new_p_obj = p / Path(*new_parts)
 
                     if new_p_obj != p_obj:
-                        new_obj_path = str(new_p_obj)
-                        self.copy_obj(obj_path, new_obj_path)
-                        self.delete_obj(obj_path)
-                        new_obj_paths[obj_path] = new_obj_path
+                        page_obj_paths[obj_path] = str(new_p_obj)
+
+            # copy the renamed objects concurrently, then batch delete all the sources
+            renamed = [k for k, v in page_obj_paths.items() if v]
+            copy_failures = run_concurrently(
+                lambda key: self._copy_obj(key, page_obj_paths[key], page_obj_sizes[key]),
+                renamed, key=str, max_workers=self.max_workers)
+            failures.update(copy_failures)
+            to_delete = [k for k in page_obj_paths if k not in copy_failures]
+            if to_delete:
+                failures.update(self._delete_batch(to_delete))
+            new_obj_paths.update(page_obj_paths)
+
+        if failures:
+            raise BulkOperationError('sanitize_obj_names', failures)
         return new_obj_paths
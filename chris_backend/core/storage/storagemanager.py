@@ -1,6 +1,19 @@
 
 import abc
-from typing import List, Dict, AnyStr, Optional
+import datetime
+from dataclasses import dataclass
+from typing import List, Dict, AnyStr, Optional, Iterable, Iterator, BinaryIO
+
+
+@dataclass(frozen=True)
+class StorageObject:
+    """
+    Metadata of a stored file as returned by a storage listing.
+    """
+    name: str
+    size: int
+    etag: str
+    last_modified: datetime.datetime
 
 
 class StorageManager(abc.ABC):
@@ -28,6 +41,36 @@ class StorageManager(abc.ABC):
         """
         ...
 
+    def ls_info(self, path_prefix: str) -> List[StorageObject]:
+        """
+        Same as ``ls`` but each file comes with its size, ETag and last modification
+        time, taken from the same listing request(s).
+        """
+        ...
+
+    def iter_ls(self, path_prefix: str) -> Iterator[str]:
+        """
+        Same as ``ls`` but lazily yields the files, so that listing a huge path prefix
+        only needs to hold a page of the listing in memory.
+        """
+        ...
+
+    def iter_ls_info(self, path_prefix: str) -> Iterator[StorageObject]:
+        """
+        Same as ``ls_info`` but lazily yields the files' metadata.
+        """
+        ...
+
+    def obj_info(self, file_path: str) -> Optional[StorageObject]:
+        """
+        :returns: the metadata of the file at the given path (from a listing request)
+                  or None if there is no such file.
+        """
+        for obj in self.iter_ls_info(file_path):
+            if obj.name == file_path:
+                return obj
+        return None
+
     def path_exists(self, path: str) -> bool:
         """
         :returns: True if path exists (whether it be a directory OR file)
@@ -56,6 +99,50 @@ class StorageManager(abc.ABC):
         """
         ...
 
+    def open_read(self, file_path: str, start: int = 0,
+                  end: Optional[int] = None) -> BinaryIO:
+        """
+        Open a stored file for reading without downloading all of its data at once.
+
+        :param file_path: file path to read from
+        :param start: position of the first byte to read
+        :param end: position after the last byte to read, defaults to the end of the
+                    file. Only the requested byte range is fetched from the storage
+                    service.
+        :returns: a readable binary file-like object that fetches the data from the
+                  storage service in chunks. It must be closed by the caller and can
+                  be used as a context manager.
+        """
+        ...
+
+    def open_write(self, file_path: str, content_type: Optional[str] = None) -> BinaryIO:
+        """
+        Open a file in the storage service for writing without holding all of its
+        data in memory.
+
+        The file is created (or replaced) when the returned writable binary
+        file-like object is closed. When used as a context manager an exception
+        raised inside the ``with`` block aborts the write instead.
+
+        :param file_path: file path to upload to
+        :param content_type: optional media type, e.g. "text/plain"
+        """
+        ...
+
+    def get_download_url(self, file_path: str, expires_in: int,
+                         filename: Optional[str] = None) -> Optional[str]:
+        """
+        Get a short-lived URL from which clients can download a file directly from
+        the storage service, without going through ChRIS.
+
+        :param file_path: file path to download
+        :param expires_in: number of seconds the URL is valid for
+        :param filename: file name suggested to the client in the
+                         ``Content-Disposition`` header of the download
+        :returns: the URL or None if the storage service doesn't support them
+        """
+        ...
+
     def copy_obj(self, src: str, dst: str) -> None:
         """
         Copy file data to a new path.
@@ -70,6 +157,16 @@ class StorageManager(abc.ABC):
         """
         ...
 
+    def delete_objs(self, file_paths: Iterable[str]) -> Dict[str, str]:
+        """
+        Delete file data from all the given paths. Implementations should use the
+        storage service's batch delete requests when available. Paths that don't
+        exist are not considered failures.
+
+        :returns: a dictionary with the paths that couldn't be deleted and their errors.
+        """
+        ...
+
     def copy_path(self, src: str, dst: str) -> None:
         """
         Copy all the data under a src path to a new dst path.
@@ -0,0 +1,337 @@
+"""
+File-like objects used by the storage managers to stream object data.
+
+``open_read`` returns a readable binary stream and ``open_write`` returns an
+``ObjectWriter``. Both move data through the backend in fixed-size chunks so that
+large objects are never fully held in memory.
+"""
+
+import abc
+import datetime
+import io
+import logging
+import tarfile
+import tempfile
+import zipfile
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+"""
+Size of the chunks read from or written to the storage backends when streaming.
+"""
+
+# max number of bytes of a part kept in memory before it's spooled to disk
+_MAX_MEMORY_PART_SIZE = 16 * 1024 * 1024
+
+ARCHIVE_FORMATS = ('zip', 'tar')
+
+
+def http_range(start: int = 0, end: Optional[int] = None) -> Optional[str]:
+    """
+    :returns: the value of the HTTP ``Range`` header requesting the bytes
+              ``[start, end)`` of an object or None if the whole object is requested.
+    """
+    if start == 0 and end is None:
+        return None
+    return f'bytes={start}-' + ('' if end is None else str(end - 1))
+
+
+class LimitedStream(io.RawIOBase):
+    """
+    Readable binary stream over at most ``limit`` bytes of another stream.
+    """
+
+    def __init__(self, stream, limit: int):
+        self._stream = stream
+        self._remaining = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(b)[:self._remaining]
+        n = self._stream.readinto(view)
+        self._remaining -= n
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            try:
+                self._stream.close()
+            finally:
+                super().close()
+
+
+class IterStream(io.RawIOBase):
+    """
+    Readable binary stream over an iterator of bytes chunks, e.g. the body of a
+    chunked HTTP response.
+    """
+
+    def __init__(self, chunks: Iterator[bytes],
+                 close_func: Optional[Callable[[], None]] = None):
+        self._chunks = chunks
+        self._close_func = close_func
+        self._buf = memoryview(b'')
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            try:
+                self._buf = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            try:
+                if self._close_func is not None:
+                    self._close_func()
+            finally:
+                super().close()
+
+
+class ObjectWriter(io.RawIOBase, abc.ABC):
+    """
+    Base class of the writable binary streams returned by ``open_write``.
+
+    Written data is buffered into parts of ``part_size`` bytes. Every time a part is
+    full and more data comes in, the part is handed to ``_upload_part``. When the
+    stream is closed the remaining data (the whole object if no part was uploaded)
+    is handed to ``_complete``, which makes the object visible in storage.
+
+    When used as a context manager, an exception raised inside the ``with`` block
+    aborts the upload instead so that no partial object is left in storage.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        # the io base classes bypass the abstract methods check done by object
+        if cls.__abstractmethods__:
+            methods = ', '.join(sorted(cls.__abstractmethods__))
+            raise TypeError(f"Can't instantiate abstract class {cls.__name__} with "
+                            f"abstract methods {methods}")
+        return super().__new__(cls)
+
+    def __init__(self, part_size: int):
+        self.part_size = part_size
+        self._part = self._new_part()
+        self._part_len = 0
+        self._aborted = False
+
+    def _new_part(self):
+        return tempfile.SpooledTemporaryFile(
+            max_size=min(self.part_size, _MAX_MEMORY_PART_SIZE))
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        if self.closed:
+            raise ValueError('write to closed file')
+        view = memoryview(b).cast('B')
+        total = len(view)
+        while view:
+            if self._part_len == self.part_size:
+                self._part.seek(0)
+                try:
+                    self._upload_part(self._part, self._part_len)
+                except Exception:
+                    self.abort()
+                    raise
+                self._part.close()
+                self._part = self._new_part()
+                self._part_len = 0
+            n = min(len(view), self.part_size - self._part_len)
+            self._part.write(view[:n])
+            self._part_len += n
+            view = view[n:]
+        return total
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if not self._aborted:
+                self._part.seek(0)
+                try:
+                    self._complete(self._part, self._part_len)
+                except Exception:
+                    self._aborted = True
+                    self._abort()
+                    raise
+        finally:
+            self._part.close()
+            super().close()
+
+    def abort(self) -> None:
+        """
+        Discard the written data without creating the object.
+        """
+        if self.closed:
+            return
+        self._aborted = True
+        try:
+            self._abort()
+        finally:
+            self.close()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def __del__(self):
+        # never commit a half-written object on garbage collection
+        if not self.closed:
+            try:
+                self.abort()
+            except Exception as e:
+                logger.error(f'Error while aborting unfinished upload, '
+                             f'detail: {str(e)}')
+
+    @abc.abstractmethod
+    def _upload_part(self, part: io.IOBase, size: int) -> None:
+        """
+        Upload a full intermediate part read from the ``part`` file object.
+        """
+        ...
+
+    @abc.abstractmethod
+    def _complete(self, part: io.IOBase, size: int) -> None:
+        """
+        Upload the last part and make the object visible in storage.
+        """
+        ...
+
+    def _abort(self) -> None:
+        """
+        Clean up any part already uploaded.
+        """
+        pass
+
+
+class ArchiveEntry(NamedTuple):
+    """
+    A stored file to be added to an archive by ``iter_archive``.
+    """
+    name: str  # path of the file within the archive
+    path: str  # path of the file in storage
+    size: Optional[int]  # taken from the storage metadata when not known
+    mtime: datetime.datetime
+
+
+class _ChunkSink:
+    """
+    Write-only, non-seekable file-like object that collects the written data until
+    it's popped.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_archive(storage_manager, entries: Iterable[ArchiveEntry],
+                 archive_format: str = 'zip') -> Iterator[bytes]:
+    """
+    Generate the data of a zip (stored, without compression) or tar archive of the
+    given stored files.
+
+    The archive is built on the fly: every file is read from storage with
+    ``open_read`` and the archive data is yielded in chunks of about ``CHUNK_SIZE``
+    bytes as soon as it's produced, so no temporary file is used and memory use
+    doesn't depend on the size or number of the files.
+    """
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unsupported archive format '{archive_format}'")
+    entries = (entry if entry.size is not None else entry._replace(
+        size=_get_stored_size(storage_manager, entry.path)) for entry in entries)
+    if archive_format == 'tar':
+        chunks = _iter_tar(storage_manager, entries)
+    else:
+        chunks = _iter_zip(storage_manager, entries)
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+
+
+def _get_stored_size(storage_manager, path: str) -> int:
+    """
+    Return the size of a stored file from the storage listing metadata.
+    """
+    obj = storage_manager.obj_info(path)
+    if obj is None:
+        raise FileNotFoundError(f"File '{path}' not found in storage")
+    return obj.size
+
+
+def _iter_zip(storage_manager, entries: Iterable[ArchiveEntry]) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    # the sink isn't seekable so sizes and CRCs are written in data descriptors
+    zf = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+    for entry in entries:
+        mtime = entry.mtime.astimezone(datetime.timezone.utc)
+        zinfo = zipfile.ZipInfo(entry.name, date_time=max(
+            mtime.timetuple()[:6], (1980, 1, 1, 0, 0, 0)))
+        zinfo.file_size = entry.size
+        zinfo.external_attr = 0o644 << 16
+        with zf.open(zinfo, 'w') as dest, storage_manager.open_read(entry.path) as src:
+            while chunk := src.read(CHUNK_SIZE):
+                dest.write(chunk)
+                yield sink.pop()
+        yield sink.pop()
+    zf.close()  # write the central directory
+    yield sink.pop()
+
+
+def _iter_tar(storage_manager, entries: Iterable[ArchiveEntry]) -> Iterator[bytes]:
+    # the members are written by hand rather than with TarFile.addfile, which
+    # copies a whole file's data before returning
+    for entry in entries:
+        info = tarfile.TarInfo(entry.name)
+        info.size = entry.size
+        info.mtime = int(entry.mtime.timestamp())
+        info.mode = 0o644
+        yield info.tobuf(tarfile.PAX_FORMAT)
+
+        # the header's size can't be changed once sent so a file whose data
+        # doesn't match it aborts the archive instead of corrupting it
+        remaining = entry.size
+        with storage_manager.open_read(entry.path) as src:
+            while remaining > 0:
+                chunk = src.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"File '{entry.path}' is shorter than its recorded "
+                                  f"size {entry.size}, archive aborted")
+                remaining -= len(chunk)
+                yield chunk
+            if src.read(1):
+                raise IOError(f"File '{entry.path}' is longer than its recorded "
+                              f"size {entry.size}, archive aborted")
+        padding = -entry.size % tarfile.BLOCKSIZE
+        if padding:
+            yield tarfile.NUL * padding
+    yield tarfile.NUL * (2 * tarfile.BLOCKSIZE)  # end-of-archive marker
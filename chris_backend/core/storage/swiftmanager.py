@@ -2,45 +2,208 @@
 Swift storage manager module.
 """
 
+import collections
+import datetime
+import io
+import json
 import logging
 import os
+import threading
 import time
+import weakref
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Iterable, Iterator, BinaryIO, Optional, Tuple
+from urllib.parse import quote, unquote, urlencode, urlsplit
 
 from swiftclient import Connection
 from swiftclient.exceptions import ClientException
+from swiftclient.utils import generate_temp_url
 
-from core.storage.storagemanager import StorageManager
+from core.storage.storagemanager import StorageManager, StorageObject
+from core.storage.bulk import (BulkOperationError, DEFAULT_MAX_WORKERS, batched,
+                               run_concurrently)
+from core.storage.streams import CHUNK_SIZE, IterStream, ObjectWriter, http_range
 
 logger = logging.getLogger(__name__)
 
+# number of objects requested per container listing page (swift's default maximum)
+_SWIFT_LISTING_LIMIT = 10000
+
+# size of the segments of a streamed upload, larger objects are stored as static
+# large objects. It bounds the data buffered per writer while keeping the default
+# limit of 1000 segments per manifest at about 100 GiB per object
+_SWIFT_SEGMENT_SIZE = 100 * 1024 * 1024
+
+
+def _call_with_retries(func, *args, **kwargs):
+    """
+    Call a swift connection method retrying on client errors other than a missing
+    object or container.
+    """
+    for i in range(5):
+        try:
+            return func(*args, **kwargs)
+        except ClientException as e:
+            if e.http_status == 404:
+                raise
+            logger.error(str(e))
+            if i == 4:
+                raise
+            time.sleep(0.4)
+
+
+class _SharedAuthConnection(Connection):
+    """
+    Swift connection that gets its storage url and auth token from a function shared
+    by all the connections of a manager instead of authenticating on its own.
+    swiftclient calls ``get_auth`` when the connection has no token yet and after a
+    request is rejected with a 401.
+    """
+
+    def __init__(self, get_shared_auth, **conn_params):
+        super().__init__(**conn_params)
+        self._get_shared_auth = get_shared_auth
+        self._shared_token = None  # last token got from the manager
+
+    def get_auth(self):
+        self.url, self.token = self._get_shared_auth(super().get_auth,
+                                                     self._shared_token)
+        self._shared_token = self.token
+        return self.url, self.token
+
+
+class _ConnectionLease:
+    """
+    A pooled connection held by a thread. The connection goes back to the pool when
+    the lease is garbage collected, which happens when the thread ends.
+    """
+
+    def __init__(self, conn, pool):
+        self.conn = conn
+        finalizer = weakref.finalize(self, pool.append, conn)
+        finalizer.atexit = False
+
+
+class _SwiftObjectWriter(ObjectWriter):
+    """
+    Writable stream that uploads a swift object. Written data is buffered in a
+    spooled file and every time ``_SWIFT_SEGMENT_SIZE`` bytes have been written
+    they are uploaded as a segment to the ``<container>_segments`` container while
+    the next segment fills. The segments are then stitched together with a static
+    large object manifest. Objects that fit in a single segment are uploaded with a
+    single PUT on close. Uploads stream the data in chunks of ``CHUNK_SIZE`` bytes.
+    """
+
+    def __init__(self, conn, container_name: str, obj_path: str,
+                 content_type: Optional[str] = None):
+        super().__init__(_SWIFT_SEGMENT_SIZE)
+        self._conn = conn
+        self._container_name = container_name
+        self._obj_path = obj_path
+        self._content_type = content_type
+        self._segments_container = f'{container_name}_segments'
+        self._segments_prefix = f'{obj_path}/{time.time():f}/'
+        self._segments = []  # static large object manifest
+
+    def _put(self, container, obj_path, part=None, **kwargs) -> str:
+        """
+        Upload an object retrying on client errors. ``part`` is rewound before every
+        attempt.
+        """
+        for i in range(5):
+            if part is not None:
+                part.seek(0)
+                kwargs['contents'] = part
+            try:
+                return self._conn.put_object(container, obj_path,
+                                             chunk_size=CHUNK_SIZE, **kwargs)
+            except ClientException as e:
+                logger.error(str(e))
+                if i == 4:
+                    raise
+                time.sleep(0.4)
+
+    def _upload_part(self, part, size):
+        if not self._segments:
+            self._conn.put_container(self._segments_container)
+        segment_path = f'{self._segments_prefix}{len(self._segments):08d}'
+        etag = self._put(self._segments_container, segment_path, part,
+                         content_length=size)
+        self._segments.append({'path': f'/{self._segments_container}/{segment_path}',
+                               'etag': etag,
+                               'size_bytes': size})
+
+    def _complete(self, part, size):
+        if not self._segments:
+            self._put(self._container_name, self._obj_path, part,
+                      content_length=size, content_type=self._content_type)
+            return
+        self._upload_part(part, size)
+        self._put(self._container_name, self._obj_path,
+                  contents=json.dumps(self._segments),
+                  content_type=self._content_type,
+                  query_string='multipart-manifest=put')
+
+    def _abort(self):
+        for segment in self._segments:
+            segment_path = segment['path'].split('/', 2)[2]
+            try:
+                self._conn.delete_object(self._segments_container, segment_path)
+            except ClientException as e:
+                logger.error(str(e))
+
 
 class SwiftManager(StorageManager):
 
-    def __init__(self, container_name, conn_params):
+    def __init__(self, container_name, conn_params, max_workers=DEFAULT_MAX_WORKERS,
+                 temp_url_key=''):
         self.container_name = container_name
         # swift storage connection parameters dictionary
         self.conn_params = conn_params
-        # swift storage connection object
-        self._conn = None
+        # secret key of the account used to sign temporary download URLs
+        self.temp_url_key = temp_url_key
+        # number of concurrent requests issued by prefix operations
+        self.max_workers = max_workers
+        # swift connection objects are not thread-safe so each thread gets its own
+        self._local = threading.local()
+        # connections released by the threads that ended, reused by the new ones
+        self._idle_conns = collections.deque()
+        # (storage url, auth token) shared by the connections of all the threads
+        self._auth = None
+        self._auth_lock = threading.Lock()
+        # max number of deletes per bulk-delete request, 0 if not supported
+        self._bulk_delete_size = None
 
     def __get_connection(self):
         """
-        Connect to swift storage and return the connection object.
+        Return the swift connection of the current thread.
+
+        A thread takes an idle connection from the pool if there's one and its
+        connection goes back to the pool when the thread ends, so the short-lived
+        worker threads of every bulk operation reuse the connections (and their open
+        HTTP connections) of the previous ones.
         """
-        if self._conn is not None:
-            return self._conn
-        for i in range(5):  # 5 retries at most
+        lease = getattr(self._local, 'lease', None)
+        if lease is None:
             try:
-                self._conn = Connection(**self.conn_params)
-            except ClientException as e:
-                logger.error(str(e))
-                if i == 4:
-                    raise  # give up
-                time.sleep(0.4)
-            else:
-                return self._conn
+                conn = self._idle_conns.pop()
+            except IndexError:
+                conn = _SharedAuthConnection(self._get_auth, **self.conn_params)
+            lease = _ConnectionLease(conn, self._idle_conns)
+            self._local.lease = lease
+        return lease.conn
+
+    def _get_auth(self, authenticate, stale_token=None):
+        """
+        Return the (storage url, auth token) shared by all the connections. Only the
+        first connection authenticates, the others reuse its token. When a request
+        is rejected with a 401 (expired token) the token is renewed by the first
+        connection that reports it and the others get the renewed one.
+        """
+        with self._auth_lock:
+            if self._auth is None or (stale_token and self._auth[1] == stale_token):
+                self._auth = authenticate()
+            return self._auth
 
     def create_container(self):
         """
@@ -58,7 +221,66 @@ class SwiftManager(StorageManager):
         Return a list of objects in the swift storage with the provided path
         as a prefix.
         """
-        return self._ls(path, b_full_listing=True)
+        return list(self.iter_ls(path))
+
+    def ls_info(self, path):
+        """
+        Return a list of objects in the swift storage with the provided path
+        as a prefix along with their size, ETag and last modification time.
+        """
+        return list(self.iter_ls_info(path))
+
+    def iter_ls(self, path) -> Iterator[str]:
+        """
+        Lazily yield the objects in the swift storage with the provided path as a
+        prefix, one listing page at a time.
+        """
+        for ld_obj in self._iter_pages(path):
+            for d_obj in ld_obj:
+                yield d_obj['name']
+
+    def iter_ls_info(self, path) -> Iterator[StorageObject]:
+        """
+        Same as ``iter_ls`` but yields the objects' metadata.
+        """
+        for ld_obj in self._iter_pages(path):
+            for d_obj in ld_obj:
+                yield StorageObject(name=d_obj['name'],
+                                    size=d_obj['bytes'],
+                                    etag=d_obj['hash'],
+                                    # swift reports UTC times without offset
+                                    last_modified=datetime.datetime.fromisoformat(
+                                        d_obj['last_modified']).replace(
+                                        tzinfo=datetime.timezone.utc))
+
+    def _iter_pages(self, path):
+        """
+        Yield the container listing for the provided path prefix one page (a list of
+        dictionaries with the objects' metadata) at a time. Every page request is
+        retried on its own so that a long listing resumes where it failed.
+        """
+        if not path:
+            return
+        conn = self.__get_connection()
+        marker = ''
+        while True:
+            for i in range(5):
+                try:
+                    ld_obj = conn.get_container(self.container_name,
+                                                prefix=path,
+                                                marker=marker,
+                                                limit=_SWIFT_LISTING_LIMIT)[1]
+                except ClientException as e:
+                    logger.error(str(e))
+                    if i == 4:
+                        raise
+                    time.sleep(0.4)
+                else:
+                    break
+            if not ld_obj:
+                break
+            yield ld_obj
+            marker = ld_obj[-1]['name']
 
     def _ls(self, path, b_full_listing: bool):
         """
@@ -145,16 +367,87 @@ class SwiftManager(StorageManager):
             else:
                 return obj_contents
 
+    def open_read(self, obj_path, start=0, end=None) -> BinaryIO:
+        """
+        Open an object in swift storage for reading. The object data is fetched
+        from the open HTTP response in chunks as it is read. A byte range is
+        requested with the ``Range`` header.
+        """
+        conn = self.__get_connection()
+        byte_range = http_range(start, end)
+        headers = {'Range': byte_range} if byte_range else None
+        for i in range(5):
+            try:
+                resp_headers, body = conn.get_object(self.container_name, obj_path,
+                                                     resp_chunk_size=CHUNK_SIZE,
+                                                     headers=headers)
+            except ClientException as e:
+                logger.error(str(e))
+                if i == 4:
+                    raise
+                time.sleep(0.4)
+            else:
+                return io.BufferedReader(IterStream(body, body.close), CHUNK_SIZE)
+
+    def open_write(self, obj_path, content_type=None) -> BinaryIO:
+        """
+        Open an object in swift storage for writing. Data is buffered to a spooled
+        temporary file and uploaded in segments of ``_SWIFT_SEGMENT_SIZE`` bytes as
+        it is written, objects that fit in a single segment are uploaded on close.
+        """
+        return _SwiftObjectWriter(self.__get_connection(), self.container_name,
+                                  obj_path, content_type)
+
+    def get_download_url(self, obj_path, expires_in, filename=None):
+        """
+        Return a temporary URL (tempurl middleware) for the given object or None if
+        no temp URL key has been configured.
+        """
+        if not self.temp_url_key:
+            return None
+        if self._auth is None:
+            self.__get_connection().get_auth()  # authenticate to get the storage url
+        storage_url = urlsplit(self._auth[0])
+        path = f'{storage_url.path}/{self.container_name}/{obj_path}'
+        signed = generate_temp_url(path, expires_in, self.temp_url_key, 'GET')
+        query = signed.split('?', 1)[1]
+        if filename:
+            query += '&' + urlencode({'filename': filename})
+        return f'{storage_url.scheme}://{storage_url.netloc}{quote(path)}?{query}'
+
     def copy_obj(self, obj_path, dest_path):
         """
         Copy an object to a new destination in swift storage.
         """
+        self._copy_obj(obj_path, dest_path)
+
+    def _copy_obj(self, obj_path, dest_path, size=None):
+        """
+        Copy an object to a new destination in swift storage. Static large objects are
+        copied segment by segment with a new manifest.
+
+        :param size: object size if already known from a listing (swift lists the
+                     total size of static large objects). When it's not known a plain
+                     copy is tried first and the object is only copied by segments if
+                     it's too large for it
+        """
+        if size is not None and size > _SWIFT_SEGMENT_SIZE:
+            manifest = self._get_manifest(obj_path)
+            if manifest is not None:
+                self._copy_large_obj(dest_path, *manifest)
+                return
         conn = self.__get_connection()
         dest = os.path.join('/' + self.container_name, dest_path.lstrip('/'))
         for i in range(5):
             try:
                 conn.copy_object(self.container_name, obj_path, dest)
             except ClientException as e:
+                if size is None and e.http_status == 413:
+                    # a static large object larger than the max object size
+                    manifest = self._get_manifest(obj_path)
+                    if manifest is not None:
+                        self._copy_large_obj(dest_path, *manifest)
+                        return
                 logger.error(str(e))
                 if i == 4:
                     raise
@@ -162,15 +455,84 @@ class SwiftManager(StorageManager):
             else:
                 break
 
+    def _copy_large_obj(self, dest_path, segments, content_type):
+        """
+        Create a static large object at the given path from server-side copies of the
+        given segments of another static large object, so that deleting either object
+        along with its segments doesn't affect the other one.
+        """
+        conn = self.__get_connection()
+        segments_container = f'{self.container_name}_segments'
+        segments_prefix = f'{dest_path}/{time.time():f}/'
+        _call_with_retries(conn.put_container, segments_container)
+        new_segments = [f'{segments_prefix}{i:08d}' for i in range(len(segments))]
+
+        def copy_segment(i):
+            container, segment_path = segments[i]['name'].lstrip('/').split('/', 1)
+            _call_with_retries(self.__get_connection().copy_object, container,
+                               segment_path, f'/{segments_container}/{new_segments[i]}')
+
+        failures = run_concurrently(copy_segment, range(len(segments)),
+                                    key=lambda i: segments[i]['name'],
+                                    max_workers=self.max_workers)
+        try:
+            if failures:
+                raise BulkOperationError('copy_obj', failures)
+            manifest = [{'path': f'/{segments_container}/{new_segments[i]}',
+                         'etag': segment['hash'],
+                         'size_bytes': segment['bytes']}
+                        for i, segment in enumerate(segments)]
+            _call_with_retries(conn.put_object, self.container_name, dest_path,
+                               contents=json.dumps(manifest),
+                               content_type=content_type,
+                               query_string='multipart-manifest=put')
+        except Exception:
+            self._delete_objs(((p, 0) for p in new_segments), segments_container)
+            raise
+
+    def _get_manifest(self, obj_path):
+        """
+        Return the segments (dictionaries with the segments' 'name', 'hash' and
+        'bytes') and content type of the static large object at the given path or
+        None if the object is not a static large object.
+        """
+        conn = self.__get_connection()
+        try:
+            headers = _call_with_retries(conn.head_object, self.container_name,
+                                         obj_path)
+        except ClientException as e:
+            if e.http_status == 404:
+                return None
+            raise
+        if headers.get('x-static-large-object', '').lower() != 'true':
+            return None
+        _, body = _call_with_retries(conn.get_object, self.container_name, obj_path,
+                                     query_string='multipart-manifest=get')
+        return json.loads(body), headers.get('content-type')
+
     def delete_obj(self, obj_path):
         """
-        Delete an object from swift storage.
+        Delete an object from swift storage. The segments of a static large object
+        are deleted first.
+        """
+        self._delete_obj(obj_path)
+
+    def _delete_obj(self, obj_path, size=None, container_name=None):
         """
+        Delete an object. The object is checked for being a static large object whose
+        segments must be deleted first unless its known size fits in a single segment.
+        """
+        container_name = container_name or self.container_name
+        if container_name == self.container_name and (
+                size is None or size > _SWIFT_SEGMENT_SIZE):
+            self._delete_segments(obj_path)
         conn = self.__get_connection()
         for i in range(5):
             try:
-                conn.delete_object(self.container_name, obj_path)
+                conn.delete_object(container_name, obj_path)
             except ClientException as e:
+                if e.http_status == 404 and container_name != self.container_name:
+                    break  # segment already deleted by a previous attempt
                 logger.error(str(e))
                 if i == 4:
                     raise
@@ -178,23 +540,177 @@ class SwiftManager(StorageManager):
             else:
                 break
 
+    def _delete_segments(self, obj_path):
+        """
+        Delete the segments of the object at the given path if it's a static large
+        object. Raises ``BulkOperationError`` if any of them couldn't be deleted.
+        """
+        manifest = self._get_manifest(obj_path)
+        if manifest is None:
+            return
+        failures = {}
+        by_container = {}
+        for segment in manifest[0]:
+            container, segment_path = segment['name'].lstrip('/').split('/', 1)
+            by_container.setdefault(container, []).append((segment_path, 0))
+        for container, segments in by_container.items():
+            failures.update(self._delete_objs(segments, container))
+        if failures:
+            raise BulkOperationError('delete_segments', failures)
+
+    def delete_objs(self, obj_paths: Iterable[str]) -> Dict[str, str]:
+        """
+        Delete the given objects from swift storage using the cluster's bulk-delete
+        middleware if it's available. The segments of static large objects are
+        deleted first.
+
+        Returns a dictionary with the objects that couldn't be deleted and their errors.
+        """
+        return self._delete_objs((obj_path, None) for obj_path in obj_paths)
+
     def copy_path(self, src: str, dst: str) -> None:
-        l_ls = self.ls(src)
-        for obj_path in l_ls:
-            new_obj_path = obj_path.replace(src, dst, 1)
-            self.copy_obj(obj_path, new_obj_path)
+        """
+        Copy all objects under src prefix to dst prefix.
+
+        Objects are copied concurrently while the source prefix is being listed.
+        Raises ``BulkOperationError`` after all the copies have been attempted if any
+        of them failed.
+        """
+        failures = run_concurrently(
+            lambda obj: self._copy_obj(obj.name, obj.name.replace(src, dst, 1), obj.size),
+            self._iter_src_objs(src, dst), key=lambda obj: obj.name,
+            max_workers=self.max_workers)
+        if failures:
+            raise BulkOperationError('copy_path', failures)
 
     def move_path(self, src: str, dst: str) -> None:
-        l_ls = self.ls(src)
-        for obj_path in l_ls:
-            new_obj_path = obj_path.replace(src, dst, 1)
-            self.copy_obj(obj_path, new_obj_path)
-            self.delete_obj(obj_path)
+        """
+        Move all objects under src prefix to dst prefix (copy + delete).
+
+        The source prefix is processed one listing page at a time: the page's objects
+        are copied concurrently and then their sources are removed with bulk deletes.
+        The source of an object that couldn't be copied is left in place. Raises
+        ``BulkOperationError`` if any of the objects couldn't be moved.
+        """
+        failures = {}
+        for objs in batched(self._iter_src_objs(src, dst), _SWIFT_LISTING_LIMIT):
+            copy_failures = run_concurrently(
+                lambda obj: self._copy_obj(obj.name, obj.name.replace(src, dst, 1),
+                                           obj.size),
+                objs, key=lambda obj: obj.name, max_workers=self.max_workers)
+            failures.update(copy_failures)
+            failures.update(self._delete_objs((obj.name, obj.size) for obj in objs
+                                              if obj.name not in copy_failures))
+        if failures:
+            raise BulkOperationError('move_path', failures)
 
     def delete_path(self, path: str) -> None:
-        l_ls = self.ls(path)
-        for obj_path in l_ls:
-            self.delete_obj(obj_path)
+        """
+        Delete all objects under a given prefix while the prefix is being listed.
+
+        Raises ``BulkOperationError`` if any of the objects couldn't be deleted.
+        """
+        failures = self._delete_objs((obj.name, obj.size)
+                                     for obj in self.iter_ls_info(path))
+        if failures:
+            raise BulkOperationError('delete_path', failures)
+
+    def _iter_src_objs(self, src: str, dst: str) -> Iterable[StorageObject]:
+        """
+        Return the objects under the src prefix for a copy or move to dst. The listing
+        is only materialized upfront when the new paths would also match the src prefix.
+        """
+        if dst.startswith(src):
+            return self.ls_info(src)
+        return self.iter_ls_info(src)
+
+    def _delete_objs(self, objs: Iterable[Tuple[str, Optional[int]]],
+                     container_name: Optional[str] = None) -> Dict[str, str]:
+        """
+        Delete the given (path, size) objects from a container (the storage container
+        by default) using the cluster's bulk-delete middleware if it's available,
+        otherwise fall back to concurrent single object deletes. The segments of the
+        static large objects are deleted before their manifests, the objects whose
+        size is None (not known) or larger than a segment are checked for it.
+
+        Returns a dictionary with the objects that couldn't be deleted and their errors.
+        """
+        container_name = container_name or self.container_name
+        batch_size = self._get_bulk_delete_size()
+        if not batch_size:
+            return run_concurrently(lambda obj: self._delete_obj(*obj, container_name),
+                                    objs, key=lambda obj: obj[0],
+                                    max_workers=self.max_workers)
+        failures = {}
+
+        def delete_batch(batch):
+            if container_name == self.container_name:
+                # manifests whose segments couldn't be deleted are left in place
+                large = [p for (p, size) in batch
+                         if size is None or size > _SWIFT_SEGMENT_SIZE]
+                segment_failures = run_concurrently(self._delete_segments, large,
+                                                    key=str,
+                                                    max_workers=self.max_workers)
+                failures.update(segment_failures)
+                batch = [obj for obj in batch if obj[0] not in segment_failures]
+            if batch:
+                failures.update(self._bulk_delete([p for (p, _) in batch],
+                                                  container_name))
+
+        run_concurrently(delete_batch, batched(objs, batch_size),
+                         key=lambda b: b[0][0], max_workers=self.max_workers)
+        return failures
+
+    def _get_bulk_delete_size(self) -> int:
+        """
+        Return the max number of objects that can be deleted with a single
+        bulk-delete request or 0 if the middleware is not enabled in the cluster.
+        """
+        if self._bulk_delete_size is None:
+            conn = self.__get_connection()
+            try:
+                capabilities = conn.get_capabilities()
+            except ClientException as e:
+                logger.error(str(e))
+                capabilities = {}
+            if 'bulk_delete' in capabilities:
+                self._bulk_delete_size = capabilities['bulk_delete'].get(
+                    'max_deletes_per_request', 10000)
+            else:
+                self._bulk_delete_size = 0
+        return self._bulk_delete_size
+
+    def _bulk_delete(self, obj_paths: List[str],
+                     container_name: Optional[str] = None) -> Dict[str, str]:
+        """
+        Delete a batch of objects from a container (the storage container by default)
+        with a single bulk-delete request.
+
+        Returns a dictionary with the objects that couldn't be deleted and their errors.
+        Objects that were already missing are not reported as failures.
+        """
+        conn = self.__get_connection()
+        prefix = '/' + (container_name or self.container_name) + '/'
+        data = '\n'.join(quote(prefix + obj_path) for obj_path in obj_paths)
+        headers = {'Accept': 'application/json', 'Content-Type': 'text/plain'}
+        for i in range(5):
+            try:
+                resp_headers, body = conn.post_account(headers, query_string='bulk-delete',
+                                                       data=data.encode('utf-8'))
+                result = json.loads(body)
+            except (ClientException, ValueError) as e:
+                logger.error(str(e))
+                if i == 4:
+                    return {obj_path: str(e) for obj_path in obj_paths}
+                time.sleep(0.4)
+            else:
+                failures = {}
+                for err_path, err_status in result.get('Errors', []):
+                    failures[unquote(err_path)[len(prefix):]] = err_status
+                if failures:
+                    logger.error(f'Bulk delete failed for {len(failures)} object(s), '
+                                 f'response status: {result.get("Response Status")}')
+                return failures
 
     def sanitize_obj_names(self, path: str) -> Dict[str, str]:
         """
@@ -210,17 +726,21 @@ class SwiftManager(StorageManager):
         the empty string as the value.
         """
         new_obj_paths = {}
-        l_ls = self.ls(path)
+        failures = {}
+        p = Path(path)
 
-        if len(l_ls) != 1 or l_ls[0] != path:  # Path is a prefix
-            p = Path(path)
+        # process the listing one page at a time to keep memory bounded
+        for l_ls in batched(self.iter_ls_info(path), _SWIFT_LISTING_LIMIT):
+            page_obj_paths = {}
+            page_obj_sizes = {obj.name: obj.size for obj in l_ls}
 
-            for obj_path in l_ls:
+            for obj_path in page_obj_sizes:
+                if obj_path == path:  # Path is an object rather than a prefix
+                    continue
                 p_obj = Path(obj_path)
 
                 if p_obj.name.replace(',', '').strip() == '':
-                    self.delete_obj(obj_path)
-                    new_obj_paths[obj_path] = ''
+                    page_obj_paths[obj_path] = ''
                 else:
                     new_parts = []
                     for part in p_obj.relative_to(p).parts:
@@ -231,8 +751,20 @@ class SwiftManager(StorageManager):
                     new_p_obj = p / Path(*new_parts)
 
                     if new_p_obj != p_obj:  # Final file path is different
-                        new_obj_path = str(new_p_obj)
-                        self.copy_obj(obj_path, new_obj_path)
-                        self.delete_obj(obj_path)
-                        new_obj_paths[obj_path] = new_obj_path
+                        page_obj_paths[obj_path] = str(new_p_obj)
+
+            # copy the renamed objects concurrently, then bulk delete all the sources
+            renamed = [k for k, v in page_obj_paths.items() if v]
+            copy_failures = run_concurrently(
+                lambda obj_path: self._copy_obj(obj_path, page_obj_paths[obj_path],
+                                                page_obj_sizes[obj_path]),
+                renamed, key=str, max_workers=self.max_workers)
+            failures.update(copy_failures)
+            failures.update(self._delete_objs([(k, page_obj_sizes[k])
+                                               for k in page_obj_paths
+                                               if k not in copy_failures]))
+            new_obj_paths.update(page_obj_paths)
+
+        if failures:
+            raise BulkOperationError('sanitize_obj_names', failures)
         return new_obj_paths
@@ -0,0 +1,35 @@
+
+import logging
+
+from django.conf import settings
+
+from celery import shared_task
+from .models import FolderSizeDelta, StorageGarbage
+from .storage import connect_storage
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def delete_storage_garbage():
+    """
+    Delete the storage objects left in the storage garbage outbox (those that
+    couldn't be deleted when their file was deleted). The objects are deleted with
+    one batch delete request per StorageGarbage.BATCH_SIZE objects until the outbox
+    is empty or a batch fails.
+    """
+    storage_manager = connect_storage(settings)
+
+    while True:
+        count, failures = StorageGarbage.collect(storage_manager)
+        if not count or failures:
+            return
+
+
+@shared_task
+def compact_folder_size_deltas():
+    """
+    Add the recorded changes to the folders' size and file count aggregates.
+    """
+    FolderSizeDelta.compact()
@@ -0,0 +1,69 @@
+"""
+Tests for the storage benchmark and its local stand-ins of the storage backends.
+"""
+
+import importlib.util
+import json
+import os
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.benchmarks.storage import OPERATIONS, run_benchmark, swift_backend
+
+
+class StorageBenchmarkTests(TestCase):
+
+    def test_run_benchmark_filesystem(self):
+        report = run_benchmark(['filesystem'], counts=[3], sizes=[10, 20], repeat=2)
+        results = report['results']
+        self.assertEqual(report['repeat'], 2)
+        self.assertEqual(len(results), len(OPERATIONS) * 2)
+        self.assertEqual([r['operation'] for r in results[:len(OPERATIONS)]],
+                         list(OPERATIONS))
+        for r in results:
+            self.assertEqual(r['backend'], 'filesystem')
+            self.assertEqual(len(r['seconds']), 2)
+            self.assertLessEqual(r['min'], r['median'])
+
+    def test_run_benchmark_swift(self):
+        results = run_benchmark(['swift'], counts=[4], sizes=[10], repeat=1)['results']
+        self.assertEqual({r['operation'] for r in results}, set(OPERATIONS))
+
+    @skipUnless(importlib.util.find_spec('moto'), 'moto is not installed')
+    def test_run_benchmark_s3(self):
+        results = run_benchmark(['s3'], counts=[4], sizes=[10], repeat=1)['results']
+        self.assertEqual({r['operation'] for r in results}, set(OPERATIONS))
+
+    def test_swift_backend_stand_in(self):
+        """
+        Test whether SwiftManager works against the local swift stand-in.
+        """
+        with swift_backend() as manager:
+            manager.upload_obj('test/a,b.txt', b'ab')
+            manager.upload_obj('test/sub/c.txt', b'c')
+            self.assertEqual(manager.ls('test'), ['test/a,b.txt', 'test/sub/c.txt'])
+            self.assertEqual(manager.download_obj('test/sub/c.txt'), b'c')
+            manager.move_path('test/sub', 'test/moved')
+            self.assertEqual(manager.sanitize_obj_names('test'),
+                             {'test/a,b.txt': 'test/ab.txt'})
+            self.assertEqual(manager.ls('test'), ['test/ab.txt', 'test/moved/c.txt'])
+            manager.delete_path('test')
+            self.assertFalse(manager.path_exists('test'))
+
+    def test_benchmark_storage_command_writes_json_output(self):
+        with TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, 'results.json')
+            call_command('benchmark_storage', backends='filesystem', counts=[2],
+                         sizes=[5], repeat=1, output=output, stdout=StringIO())
+            with open(output) as f:
+                report = json.load(f)
+        self.assertEqual(len(report['results']), len(OPERATIONS))
+
+    def test_benchmark_storage_command_unknown_backend(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_storage', backends='ftp', stdout=StringIO())
@@ -0,0 +1,526 @@
+"""
+Unit tests for the concurrent bulk storage helpers and the prefix and multipart
+operations of the object storage managers that are built on top of them.
+
+Object storage clients are mocked so these tests always run regardless of STORAGE_ENV.
+"""
+
+import datetime
+import json
+import threading
+from unittest import mock
+from urllib.parse import unquote
+
+from django.test import TestCase
+from swiftclient.exceptions import ClientException
+
+from core.storage.bulk import BulkOperationError, batched, run_concurrently
+from core.storage.s3manager import S3Manager
+from core.storage.swiftmanager import SwiftManager
+
+
+class RunConcurrentlyTests(TestCase):
+
+    def test_run_concurrently_applies_func_to_all_items(self):
+        seen = set()
+        lock = threading.Lock()
+
+        def func(item):
+            with lock:
+                seen.add(item)
+
+        failures = run_concurrently(func, iter(range(100)), key=str, max_workers=4)
+        self.assertEqual(failures, {})
+        self.assertEqual(seen, set(range(100)))
+
+    def test_run_concurrently_collects_failures_without_aborting(self):
+        done = []
+
+        def func(item):
+            if item % 10 == 0:
+                raise ValueError(f'bad {item}')
+            done.append(item)
+
+        failures = run_concurrently(func, range(50), key=str, max_workers=4)
+        self.assertEqual(set(failures), {'0', '10', '20', '30', '40'})
+        self.assertEqual(failures['20'], 'bad 20')
+        self.assertEqual(len(done), 45)
+
+    def test_run_concurrently_serial(self):
+        order = []
+        failures = run_concurrently(order.append, range(5), key=str, max_workers=1)
+        self.assertEqual(failures, {})
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+
+    def test_batched(self):
+        self.assertEqual(list(batched(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(batched([], 3)), [])
+
+
+class S3ManagerBulkTests(TestCase):
+
+    def setUp(self):
+        self.manager = S3Manager('users', {}, max_workers=4)
+        self.client = mock.Mock()
+        self.client.delete_objects.return_value = {}
+        self.manager._client = self.client
+        keys = [f'home/foo/feeds/f{i}' for i in range(2500)]
+        self.keys = keys
+
+        def list_objects_v2(Bucket, Prefix, ContinuationToken='0'):
+            start = int(ContinuationToken)
+            page = {'Contents': [{'Key': k, 'Size': 10, 'ETag': '"e"',
+                                  'LastModified': datetime.datetime.now()}
+                                 for k in keys[start:start + 1000]],
+                    'IsTruncated': start + 1000 < len(keys)}
+            if page['IsTruncated']:
+                page['NextContinuationToken'] = str(start + 1000)
+            return page
+
+        self.client.list_objects_v2.side_effect = list_objects_v2
+
+    def test_iter_ls_pages_through_listing(self):
+        it = self.manager.iter_ls('home/foo/feeds')
+        self.assertEqual(next(it), 'home/foo/feeds/f0')
+        self.assertEqual(self.client.list_objects_v2.call_count, 1)
+        self.assertEqual(list(it), self.keys[1:])
+        self.assertEqual(self.client.list_objects_v2.call_count, 3)
+
+    def test_move_path_copies_concurrently_and_batch_deletes_sources(self):
+        self.manager.move_path('home/foo/feeds', 'home/foo/moved')
+
+        self.assertEqual(self.client.copy_object.call_count, 2500)
+        self.client.copy_object.assert_any_call(
+            Bucket='users', Key='home/foo/moved/f7',
+            CopySource={'Bucket': 'users', 'Key': 'home/foo/feeds/f7'})
+        self.assertEqual(self.client.delete_objects.call_count, 3)
+        self.client.delete_object.assert_not_called()
+        deleted = [o['Key'] for c in self.client.delete_objects.call_args_list
+                   for o in c.kwargs['Delete']['Objects']]
+        self.assertCountEqual(deleted, self.keys)
+
+    def test_move_path_keeps_sources_that_failed_to_copy(self):
+        from botocore.exceptions import ClientError
+
+        def copy_object(Bucket, Key, CopySource):
+            if CopySource['Key'] == 'home/foo/feeds/f3':
+                raise ClientError({'Error': {'Code': '500'}}, 'CopyObject')
+
+        self.client.copy_object.side_effect = copy_object
+
+        with mock.patch('core.storage.s3manager.time.sleep'):
+            with self.assertRaises(BulkOperationError) as cm:
+                self.manager.move_path('home/foo/feeds', 'home/foo/moved')
+
+        self.assertEqual(list(cm.exception.failures), ['home/foo/feeds/f3'])
+        deleted = [o['Key'] for c in self.client.delete_objects.call_args_list
+                   for o in c.kwargs['Delete']['Objects']]
+        self.assertNotIn('home/foo/feeds/f3', deleted)
+        self.assertEqual(len(deleted), 2499)
+
+    def test_delete_path_reports_per_object_errors(self):
+        self.client.delete_objects.side_effect = [
+            {'Errors': [{'Key': 'home/foo/feeds/f1', 'Code': 'AccessDenied',
+                         'Message': 'Access Denied'}]}, {}, {}]
+
+        with self.assertRaises(BulkOperationError) as cm:
+            self.manager.delete_path('home/foo/feeds')
+
+        self.assertEqual(cm.exception.failures,
+                         {'home/foo/feeds/f1': 'AccessDenied: Access Denied'})
+        self.assertEqual(self.client.delete_objects.call_count, 3)
+
+
+    def test_copy_path_uses_listing_sizes(self):
+        self.manager.copy_path('home/foo/feeds', 'home/foo/copied')
+
+        self.assertEqual(self.client.copy_object.call_count, 2500)
+        self.client.head_object.assert_not_called()
+
+
+class S3ManagerMultipartTests(TestCase):
+
+    def setUp(self):
+        self.manager = S3Manager('users', {}, max_workers=4, multipart_threshold=20)
+        self.client = mock.Mock()
+        self.client.create_multipart_upload.return_value = {'UploadId': 'up1'}
+        self.client.upload_part.side_effect = (
+            lambda **kwargs: {'ETag': f'"etag{kwargs["PartNumber"]}"'})
+        self.client.upload_part_copy.side_effect = (
+            lambda **kwargs: {'CopyPartResult': {'ETag': f'"etag{kwargs["PartNumber"]}"'}})
+        self.manager._client = self.client
+        part_size_patcher = mock.patch('core.storage.s3manager._S3_PART_SIZE', 10)
+        part_size_patcher.start()
+        self.addCleanup(part_size_patcher.stop)
+
+    def test_upload_obj_small_object_uses_put_object(self):
+        self.manager.upload_obj('home/foo/a.bin', b'x' * 20)
+        self.client.put_object.assert_called_once()
+        self.client.create_multipart_upload.assert_not_called()
+
+    def test_upload_obj_large_object_uploads_parts_concurrently(self):
+        data = bytes(range(25))
+        self.manager.upload_obj('home/foo/a.bin', data, content_type='text/plain')
+
+        self.client.put_object.assert_not_called()
+        self.client.create_multipart_upload.assert_called_once_with(
+            Bucket='users', Key='home/foo/a.bin', ContentType='text/plain')
+        bodies = {c.kwargs['PartNumber']: c.kwargs['Body']
+                  for c in self.client.upload_part.call_args_list}
+        self.assertEqual(bodies, {1: data[:10], 2: data[10:20], 3: data[20:]})
+        self.client.complete_multipart_upload.assert_called_once_with(
+            Bucket='users', Key='home/foo/a.bin', UploadId='up1',
+            MultipartUpload={'Parts': [{'ETag': '"etag1"', 'PartNumber': 1},
+                                       {'ETag': '"etag2"', 'PartNumber': 2},
+                                       {'ETag': '"etag3"', 'PartNumber': 3}]})
+
+    def test_upload_obj_aborts_multipart_upload_on_part_error(self):
+        from botocore.exceptions import ClientError
+
+        self.client.upload_part.side_effect = ClientError({'Error': {'Code': '500'}},
+                                                          'UploadPart')
+        with mock.patch('core.storage.s3manager.time.sleep'):
+            with self.assertRaises(ClientError):
+                self.manager.upload_obj('home/foo/a.bin', b'x' * 25)
+
+        self.client.abort_multipart_upload.assert_called_once_with(
+            Bucket='users', Key='home/foo/a.bin', UploadId='up1')
+        self.client.complete_multipart_upload.assert_not_called()
+
+    def test_copy_obj_uses_copy_object_without_head_request(self):
+        self.manager.copy_obj('home/foo/a.bin', 'home/foo/b.bin')
+
+        self.client.copy_object.assert_called_once_with(
+            Bucket='users', Key='home/foo/b.bin',
+            CopySource={'Bucket': 'users', 'Key': 'home/foo/a.bin'})
+        self.client.head_object.assert_not_called()
+        self.client.create_multipart_upload.assert_not_called()
+
+    def test_copy_obj_too_large_object_uses_upload_part_copy(self):
+        from botocore.exceptions import ClientError
+
+        self.client.copy_object.side_effect = ClientError(
+            {'Error': {'Code': 'InvalidRequest',
+                       'Message': 'The specified copy source is larger than the maximum '
+                                  'allowable size for a copy source: 5368709120'}},
+            'CopyObject')
+        self.client.head_object.return_value = {'ContentLength': 25,
+                                                'ContentType': 'application/zip'}
+        self.manager.copy_obj('home/foo/a.bin', 'home/foo/b.bin')
+
+        self.client.copy_object.assert_called_once()
+        self.client.create_multipart_upload.assert_called_once_with(
+            Bucket='users', Key='home/foo/b.bin', ContentType='application/zip')
+        ranges = sorted(c.kwargs['CopySourceRange']
+                        for c in self.client.upload_part_copy.call_args_list)
+        self.assertEqual(ranges, ['bytes=0-9', 'bytes=10-19', 'bytes=20-24'])
+        self.client.complete_multipart_upload.assert_called_once()
+
+
+    def test_copy_obj_reports_other_invalid_requests(self):
+        from botocore.exceptions import ClientError
+
+        self.client.copy_object.side_effect = ClientError(
+            {'Error': {'Code': 'InvalidRequest',
+                       'Message': 'This copy request is illegal because it is trying '
+                                  'to copy an object to itself'}}, 'CopyObject')
+        with mock.patch('core.storage.s3manager.time.sleep'):
+            with self.assertRaises(ClientError):
+                self.manager.copy_obj('home/foo/a.bin', 'home/foo/a.bin')
+
+        self.assertEqual(self.client.copy_object.call_count, 5)
+        self.client.head_object.assert_not_called()
+        self.client.create_multipart_upload.assert_not_called()
+
+class SwiftManagerBulkTests(TestCase):
+
+    def setUp(self):
+        self.manager = SwiftManager('users', {}, max_workers=4)
+        self.conn = mock.Mock()
+        self.conn.get_auth.return_value = ('http://swift/v1/AUTH_test', 'token')
+        self.obj_paths = [f'home/foo/feeds/f{i}' for i in range(25)]
+
+        def get_container(container, prefix, marker='', limit=None, full_listing=False):
+            names = sorted(p for p in self.obj_paths if p > marker)
+            return {}, [{'name': p, 'bytes': 10, 'hash': 'etag',
+                         'last_modified': '2024-01-01T00:00:00.000000'}
+                        for p in names[:limit or 10000]]
+
+        self.conn.get_container.side_effect = get_container
+        connection_patcher = mock.patch(
+            'core.storage.swiftmanager._SharedAuthConnection', return_value=self.conn)
+        connection_patcher.start()
+        self.addCleanup(connection_patcher.stop)
+
+    def test_connections_are_reused_across_bulk_operations(self):
+        connection_cls = mock.Mock(side_effect=lambda *args, **kwargs: mock.Mock())
+        with mock.patch('core.storage.swiftmanager._SharedAuthConnection',
+                        connection_cls):
+            for _ in range(3):
+                run_concurrently(
+                    lambda i: self.manager._SwiftManager__get_connection(),
+                    range(20), key=str, max_workers=4)
+
+        self.assertLessEqual(connection_cls.call_count, 4)
+
+    def test_iter_ls_pages_through_listing(self):
+        with mock.patch('core.storage.swiftmanager._SWIFT_LISTING_LIMIT', 10):
+            self.assertCountEqual(list(self.manager.iter_ls('home/foo/feeds')),
+                                  self.obj_paths)
+        # two full pages, a partial one and the final empty one
+        self.assertEqual(self.conn.get_container.call_count, 4)
+
+    def test_delete_path_uses_bulk_delete(self):
+        self.conn.get_capabilities.return_value = {
+            'bulk_delete': {'max_deletes_per_request': 10}}
+        self.conn.post_account.return_value = (
+            {}, json.dumps({'Number Deleted': 10, 'Errors': []}).encode())
+
+        self.manager.delete_path('home/foo/feeds')
+
+        self.assertEqual(self.conn.post_account.call_count, 3)
+        self.conn.delete_object.assert_not_called()
+        bodies = [c.kwargs['data'].decode() for c in self.conn.post_account.call_args_list]
+        deleted = [line for body in bodies for line in body.split('\n')]
+        self.assertCountEqual(deleted, [f'/users/{p}' for p in self.obj_paths])
+        # objects listed smaller than a segment can't be static large objects
+        self.conn.head_object.assert_not_called()
+
+    def test_delete_path_reports_bulk_delete_errors(self):
+        self.conn.get_capabilities.return_value = {'bulk_delete': {}}
+        self.conn.post_account.return_value = (
+            {}, json.dumps({'Errors': [['/users/home/foo/feeds/f2', '409 Conflict']],
+                            'Response Status': '400 Bad Request'}).encode())
+
+        with self.assertRaises(BulkOperationError) as cm:
+            self.manager.delete_path('home/foo/feeds')
+
+        self.assertEqual(cm.exception.failures, {'home/foo/feeds/f2': '409 Conflict'})
+
+    def test_move_path_falls_back_to_single_deletes(self):
+        self.conn.get_capabilities.return_value = {}
+
+        self.manager.move_path('home/foo/feeds', 'home/foo/moved')
+
+        self.assertEqual(self.conn.copy_object.call_count, 25)
+        self.conn.copy_object.assert_any_call('users', 'home/foo/feeds/f4',
+                                              '/users/home/foo/moved/f4')
+        self.assertEqual(self.conn.delete_object.call_count, 25)
+        self.conn.post_account.assert_not_called()
+
+
+class SwiftManagerAuthTests(TestCase):
+
+    def setUp(self):
+        self.manager = SwiftManager('users', {'authurl': 'http://swift/auth/v1.0',
+                                              'user': 'chris:chris1234',
+                                              'key': 'testing'})
+        self.tokens = iter(['token1', 'token2'])
+        auth_patcher = mock.patch(
+            'swiftclient.client.get_auth',
+            side_effect=lambda *args, **kwargs: ('http://swift/v1/AUTH_test',
+                                                 next(self.tokens)))
+        self.get_auth = auth_patcher.start()
+        self.addCleanup(auth_patcher.stop)
+
+    def _get_thread_connections(self, n):
+        connections = []
+        barrier = threading.Barrier(n)
+
+        def get_connection():
+            conn = self.manager._SwiftManager__get_connection()
+            conn.get_auth()  # what swiftclient does before the first request
+            connections.append(conn)
+            barrier.wait()  # keep the connections in use by all the threads
+
+        threads = [threading.Thread(target=get_connection) for _ in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return connections
+
+    def test_thread_connections_share_auth_token(self):
+        connections = self._get_thread_connections(3)
+
+        self.assertEqual(len(set(map(id, connections))), 3)
+        self.assertEqual([conn.token for conn in connections], ['token1'] * 3)
+        self.get_auth.assert_called_once()
+
+    def test_expired_token_is_renewed_once(self):
+        conn1, conn2 = self._get_thread_connections(2)
+
+        # what swiftclient does when a request is rejected with a 401
+        for conn in (conn1, conn2):
+            conn.url = conn.token = None
+            self.assertEqual(conn.get_auth()[1], 'token2')
+
+        self.assertEqual(self.get_auth.call_count, 2)
+        self.assertEqual(self.manager._auth, ('http://swift/v1/AUTH_test', 'token2'))
+
+
+class _FakeSwiftConnection:
+    """
+    In-memory stand-in for a swift connection that supports static large objects
+    and the bulk-delete middleware.
+    """
+
+    def __init__(self):
+        self.objects = {}  # (container, path) -> data or list of segments (manifest)
+        self.content_types = {}
+        self.requests = []
+
+    def get_auth(self):
+        return 'http://swift/v1/AUTH_test', 'token'
+
+    def get_capabilities(self):
+        return {'bulk_delete': {'max_deletes_per_request': 100}}
+
+    def put_container(self, container):
+        pass
+
+    def _data(self, container, path):
+        obj = self.objects[(container, path)]
+        if isinstance(obj, list):
+            return b''.join(self._data(*s['name'].lstrip('/').split('/', 1))
+                            for s in obj)
+        return obj
+
+    def _get(self, container, path):
+        if (container, path) not in self.objects:
+            raise ClientException('Not Found', http_status=404)
+        return self.objects[(container, path)]
+
+    def put_object(self, container, path, contents, chunk_size=None,
+                   content_length=None, content_type=None, query_string=None):
+        self.requests.append(('PUT', container, path, query_string))
+        data = contents if isinstance(contents, (str, bytes)) else contents.read()
+        if query_string == 'multipart-manifest=put':
+            data = [{'name': s['path'], 'hash': s['etag'], 'bytes': s['size_bytes']}
+                    for s in json.loads(data)]
+        self.objects[(container, path)] = data
+        self.content_types[(container, path)] = content_type
+        return f'etag-{path}'
+
+    def head_object(self, container, path):
+        self.requests.append(('HEAD', container, path, None))
+        obj = self._get(container, path)
+        headers = {'content-type': self.content_types.get((container, path))}
+        if isinstance(obj, list):
+            headers['x-static-large-object'] = 'True'
+        return headers
+
+    def get_object(self, container, path, resp_chunk_size=None, query_string=None,
+                   headers=None):
+        self.requests.append(('GET', container, path, query_string))
+        obj = self._get(container, path)
+        if query_string == 'multipart-manifest=get':
+            return {}, json.dumps(obj).encode()
+        data = self._data(container, path)
+        if resp_chunk_size:
+            body = mock.MagicMock()
+            body.__iter__.return_value = iter([data])
+            body.__next__.side_effect = iter([data]).__next__
+            return {}, body
+        return {}, data
+
+    def copy_object(self, container, path, destination):
+        self.requests.append(('COPY', container, path, None))
+        data = self._data(container, path)
+        if len(data) > 8:  # max object size
+            raise ClientException('Request Entity Too Large', http_status=413)
+        self.objects[tuple(destination.lstrip('/').split('/', 1))] = data
+
+    def delete_object(self, container, path):
+        self.requests.append(('DELETE', container, path, None))
+        self._get(container, path)
+        del self.objects[(container, path)]
+
+    def post_account(self, headers, query_string, data):
+        self.requests.append(('POST', None, None, query_string))
+        for line in data.decode().split('\n'):
+            key = tuple(unquote(line).lstrip('/').split('/', 1))
+            self.objects.pop(key, None)
+        return {}, json.dumps({'Errors': []}).encode()
+
+    def get_container(self, container, prefix, marker='', limit=None,
+                      full_listing=False):
+        names = sorted(p for (c, p) in self.objects
+                       if c == container and p.startswith(prefix) and p > marker)
+        return {}, [{'name': p, 'bytes': len(self._data(container, p)),
+                     'hash': 'etag', 'last_modified': '2024-01-01T00:00:00.000000'}
+                    for p in names[:limit or 10000]]
+
+
+class SwiftManagerLargeObjectTests(TestCase):
+
+    def setUp(self):
+        self.manager = SwiftManager('users', {}, max_workers=4)
+        self.conn = _FakeSwiftConnection()
+        connection_patcher = mock.patch(
+            'core.storage.swiftmanager._SharedAuthConnection', return_value=self.conn)
+        connection_patcher.start()
+        self.addCleanup(connection_patcher.stop)
+        segment_size_patcher = mock.patch(
+            'core.storage.swiftmanager._SWIFT_SEGMENT_SIZE', 4)
+        segment_size_patcher.start()
+        self.addCleanup(segment_size_patcher.stop)
+
+        with self.manager.open_write('home/foo/feeds/a.bin',
+                                     content_type='application/zip') as f:
+            f.write(b'0123456789')
+        self.manager.upload_obj('home/foo/feeds/b.txt', b'abc')
+
+    def _segments(self):
+        return {p for (c, p) in self.conn.objects if c == 'users_segments'}
+
+    def test_write_and_read_multi_segment_object(self):
+        self.assertEqual(len(self._segments()), 3)
+        self.assertIsInstance(self.conn.objects[('users', 'home/foo/feeds/a.bin')], list)
+        with self.manager.open_read('home/foo/feeds/a.bin') as f:
+            self.assertEqual(f.read(), b'0123456789')
+
+    def test_copy_obj_copies_large_object_segments(self):
+        self.manager.copy_obj('home/foo/feeds/a.bin', 'home/foo/b.bin')
+
+        manifest = self.conn.objects[('users', 'home/foo/b.bin')]
+        self.assertIsInstance(manifest, list)
+        self.assertTrue(all(s['name'].startswith('/users_segments/home/foo/b.bin/')
+                            for s in manifest))
+        self.assertEqual(len(self._segments()), 6)
+        self.assertEqual(self.conn.content_types[('users', 'home/foo/b.bin')],
+                         'application/zip')
+        self.manager.delete_obj('home/foo/feeds/a.bin')
+        with self.manager.open_read('home/foo/b.bin') as f:
+            self.assertEqual(f.read(), b'0123456789')
+
+    def test_move_path_keeps_large_objects_segmented(self):
+        self.manager.move_path('home/foo/feeds', 'home/foo/moved')
+
+        self.assertEqual(sorted(p for (c, p) in self.conn.objects if c == 'users'),
+                         ['home/foo/moved/a.bin', 'home/foo/moved/b.txt'])
+        self.assertTrue(all(p.startswith('home/foo/moved/a.bin/')
+                            for p in self._segments()))
+        self.assertEqual(len(self._segments()), 3)
+        with self.manager.open_read('home/foo/moved/a.bin') as f:
+            self.assertEqual(f.read(), b'0123456789')
+
+    def test_delete_obj_deletes_large_object_segments(self):
+        self.manager.delete_obj('home/foo/feeds/a.bin')
+
+        self.assertNotIn(('users', 'home/foo/feeds/a.bin'), self.conn.objects)
+        self.assertEqual(self._segments(), set())
+
+    def test_delete_objs_deletes_large_object_segments(self):
+        failures = self.manager.delete_objs(['home/foo/feeds/a.bin',
+                                             'home/foo/feeds/b.txt'])
+
+        self.assertEqual(failures, {})
+        self.assertEqual(self.conn.objects, {})
+
+    def test_delete_path_only_checks_objects_larger_than_a_segment(self):
+        self.manager.delete_path('home/foo/feeds')
+
+        self.assertEqual(self.conn.objects, {})
+        heads = [path for (method, _, path, _) in self.conn.requests if method == 'HEAD']
+        self.assertEqual(heads, ['home/foo/feeds/a.bin'])
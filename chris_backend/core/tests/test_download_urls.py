@@ -0,0 +1,57 @@
+"""
+Unit tests for the direct download URLs generated by the storage managers.
+
+Object storage clients are mocked so these tests always run regardless of STORAGE_ENV.
+"""
+
+from unittest import mock
+from urllib.parse import urlsplit, parse_qs
+
+from django.test import TestCase
+
+from core.storage.s3manager import S3Manager
+from core.storage.swiftmanager import SwiftManager
+
+
+class S3DownloadUrlTests(TestCase):
+
+    def test_get_download_url_returns_presigned_url(self):
+        manager = S3Manager('users', {})
+        manager._client = mock.Mock()
+        manager._client.generate_presigned_url.return_value = 'https://s3/presigned'
+
+        url = manager.get_download_url('home/foo/a.txt', 300, 'a.txt')
+
+        self.assertEqual(url, 'https://s3/presigned')
+        manager._client.generate_presigned_url.assert_called_once_with(
+            'get_object',
+            Params={'Bucket': 'users', 'Key': 'home/foo/a.txt',
+                    'ResponseContentDisposition': 'attachment; filename="a.txt"'},
+            ExpiresIn=300)
+
+
+class SwiftDownloadUrlTests(TestCase):
+
+    def setUp(self):
+        auth_patcher = mock.patch(
+            'swiftclient.client.get_auth',
+            return_value=('https://swift:8080/v1/AUTH_chris', 'token'))
+        auth_patcher.start()
+        self.addCleanup(auth_patcher.stop)
+
+    def test_get_download_url_returns_temp_url(self):
+        manager = SwiftManager('users', {}, temp_url_key='secret')
+
+        url = urlsplit(manager.get_download_url('home/foo/my file.txt', 300,
+                                                'my file.txt'))
+
+        self.assertEqual(url.netloc, 'swift:8080')
+        self.assertEqual(url.path, '/v1/AUTH_chris/users/home/foo/my%20file.txt')
+        query = parse_qs(url.query)
+        self.assertIn('temp_url_sig', query)
+        self.assertIn('temp_url_expires', query)
+        self.assertEqual(query['filename'], ['my file.txt'])
+
+    def test_get_download_url_without_temp_url_key(self):
+        manager = SwiftManager('users', {})
+        self.assertIsNone(manager.get_download_url('home/foo/a.txt', 300))
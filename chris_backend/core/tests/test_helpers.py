@@ -0,0 +1,70 @@
+"""
+Unit tests for the storage helpers, in particular the process-wide registry of
+storage managers used by connect_storage.
+"""
+
+import os
+from tempfile import TemporaryDirectory
+
+from django.test import TestCase
+
+from core.storage import connect_storage
+from core.storage.helpers import _DummySettings, _reset_managers
+
+
+class ConnectStorageTests(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.settings = _DummySettings({
+            'STORAGES': {'default': {'BACKEND': 'fake.FileSystemStorage'}},
+            'MEDIA_ROOT': self.tmp_dir.name
+        })
+
+    def test_connect_storage_returns_shared_manager(self):
+        """
+        Test whether connect_storage returns the same manager instance for the same
+        storage settings.
+        """
+        manager = connect_storage(self.settings)
+        same_settings = _DummySettings(vars(self.settings))
+        self.assertIs(connect_storage(same_settings), manager)
+
+    def test_connect_storage_returns_different_manager_for_different_settings(self):
+        """
+        Test whether connect_storage returns a different manager instance when the
+        storage settings are different.
+        """
+        manager = connect_storage(self.settings)
+        with TemporaryDirectory() as other_dir:
+            other_settings = _DummySettings(dict(vars(self.settings),
+                                                 MEDIA_ROOT=other_dir))
+            self.assertIsNot(connect_storage(other_settings), manager)
+
+    def test_reset_managers(self):
+        """
+        Test whether a new manager instance is created after the registry is reset.
+        """
+        manager = connect_storage(self.settings)
+        _reset_managers()
+        self.assertIsNot(connect_storage(self.settings), manager)
+
+    def test_forked_child_gets_new_manager(self):
+        """
+        Test whether a forked child process doesn't reuse the manager instances of
+        its parent.
+        """
+        manager = connect_storage(self.settings)
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # child
+            os.close(r)
+            os.write(w, b'1' if connect_storage(self.settings) is manager else b'0')
+            os._exit(0)
+        os.close(w)
+        with os.fdopen(r, 'rb') as f:
+            reused = f.read()
+        os.waitpid(pid, 0)
+        self.assertEqual(reused, b'0')
+        self.assertIs(connect_storage(self.settings), manager)
@@ -6,10 +6,14 @@ from unittest import mock
 
 from django.test import TestCase, tag
 from django.conf import settings
-from django.contrib.auth.models import User
-
-from core.models import (ChrisFolder, ChrisFile, ChrisLinkFile, PathAccessError,
-                         validate_path_access, user_can_access_obj)
+from django.contrib.auth.models import User, Group
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+
+from core.models import (ChrisFolder, ChrisFile, ChrisLinkFile, FolderUserPermission,
+                         FileUserPermission, FolderSizeDelta, PathAccessError,
+                         PermissionResolver, validate_path_access,
+                         validate_paths_access, user_can_access_obj)
 from core.storage import connect_storage
 from userfiles.models import UserFile
 
@@ -53,6 +57,225 @@ class ChrisFolderModelTests(ModelTests):
         folder = ChrisFolder.get_first_existing_folder_ancestor('home/12345678/file.txt')
         self.assertEqual(folder.path, 'home')
 
+    def test_save_sets_ancestors(self):
+        """
+        Test whether custom save method records the ids of all the ancestor folders
+        from the root folder down to the parent folder.
+        """
+        owner = User.objects.get(username=self.username)
+        folder = ChrisFolder.objects.create(path=f'home/{self.username}/a/b', owner=owner)
+        paths = ['', 'home', f'home/{self.username}', f'home/{self.username}/a']
+        ids = [ChrisFolder.objects.get(path=p).id for p in paths]
+        self.assertEqual(folder.ancestors, ids)
+        self.assertEqual(ChrisFolder.objects.get(path='').ancestors, [])
+
+    def test_ensure_folders(self):
+        """
+        Test whether custom ensure_folders class method creates all the missing folders
+        and their ancestors with the right parents and returns them by path.
+        """
+        owner = User.objects.get(username=self.username)
+        home = f'home/{self.username}'
+        paths = [f'{home}/out/a/b', f'{home}/out/a/c', f'{home}/out/d']
+
+        folders = ChrisFolder.ensure_folders(paths, owner)
+
+        for path in paths + [f'{home}/out/a', f'{home}/out', home, 'home', '']:
+            folder = ChrisFolder.objects.get(path=path)
+            self.assertEqual(folders[path], folder)
+            if path:
+                self.assertEqual(folder.parent.path, os.path.dirname(path))
+                self.assertEqual(folder.ancestors,
+                                 folder.parent.ancestors + [folder.parent.id])
+        self.assertEqual(folders[f'{home}/out/a/b'].owner, owner)
+        self.assertEqual(folders['home'].owner.username, 'chris')
+
+        # existing folders are only looked up
+        with self.assertNumQueries(1):
+            self.assertEqual(ChrisFolder.ensure_folders(paths, owner), folders)
+
+    def test_move_updates_tree(self):
+        """
+        Test whether custom move method updates the paths of the folder's tree and
+        re-roots its ancestors under the new parent folder.
+        """
+        owner = User.objects.get(username=self.username)
+        home = f'home/{self.username}'
+        folder = ChrisFolder.objects.create(path=f'{home}/a', owner=owner)
+        subfolder = ChrisFolder.objects.create(path=f'{home}/a/b', owner=owner)
+        f = ChrisFile(parent_folder=subfolder, owner=owner)
+        f.fname.name = f'{home}/a/b/file.txt'
+        f.save()
+        sibling = ChrisFolder.objects.create(path=f'{home}/ab', owner=owner)
+
+        with mock.patch('core.models.connect_storage'):
+            folder.move(f'{home}/x/a')
+
+        new_parent = ChrisFolder.objects.get(path=f'{home}/x')
+        folder.refresh_from_db()
+        subfolder.refresh_from_db()
+        f.refresh_from_db()
+        self.assertEqual(folder.parent, new_parent)
+        self.assertEqual(folder.ancestors, new_parent.ancestors + [new_parent.id])
+        self.assertEqual(subfolder.path, f'{home}/x/a/b')
+        self.assertEqual(subfolder.ancestors, folder.ancestors + [folder.id])
+        self.assertEqual(f.fname.name, f'{home}/x/a/b/file.txt')
+        self.assertEqual(list(folder.get_descendants_queryset()), [subfolder])
+        self.assertEqual(list(ChrisFile.objects.filter(folder.get_tree_lookup())), [f])
+        sibling.refresh_from_db()
+        self.assertEqual(sibling.path, f'{home}/ab')
+
+    def test_move_rename_keeps_ancestors(self):
+        """
+        Test whether custom move method renames the folder's tree in place when the
+        parent folder doesn't change.
+        """
+        owner = User.objects.get(username=self.username)
+        home = f'home/{self.username}'
+        folder = ChrisFolder.objects.create(path=f'{home}/a', owner=owner)
+        subfolder = ChrisFolder.objects.create(path=f'{home}/a/b', owner=owner)
+        lf = ChrisLinkFile(path=home, owner=owner, parent_folder=subfolder)
+        lf.save(name='home_link')
+        ancestors = list(subfolder.ancestors)
+
+        with mock.patch('core.models.connect_storage'):
+            folder.move(f'{home}/renamed')
+
+        self.assertEqual(folder.path, f'{home}/renamed')
+        subfolder.refresh_from_db()
+        lf.refresh_from_db()
+        self.assertEqual(subfolder.path, f'{home}/renamed/b')
+        self.assertEqual(subfolder.ancestors, ancestors)
+        self.assertEqual(lf.fname.name, f'{home}/renamed/b/home_link.chrislink')
+
+    def test_grant_and_remove_public_access(self):
+        """
+        Test whether custom grant_public_access and remove_public_access methods update
+        the whole folder's tree.
+        """
+        owner = User.objects.get(username=self.username)
+        home = f'home/{self.username}'
+        folder = ChrisFolder.objects.create(path=f'{home}/a', owner=owner)
+        subfolder = ChrisFolder.objects.create(path=f'{home}/a/b', owner=owner)
+        f = ChrisFile(parent_folder=subfolder, owner=owner)
+        f.fname.name = f'{home}/a/b/file.txt'
+        f.save()
+
+        folder.grant_public_access()
+        self.assertTrue(folder.public)
+        self.assertTrue(ChrisFolder.objects.get(pk=subfolder.pk).public)
+        self.assertTrue(ChrisFile.objects.get(pk=f.pk).public)
+        self.assertFalse(ChrisFolder.objects.get(path=home).public)
+
+        folder.remove_public_access()
+        self.assertFalse(folder.public)
+        self.assertFalse(ChrisFolder.objects.get(pk=subfolder.pk).public)
+        self.assertFalse(ChrisFile.objects.get(pk=f.pk).public)
+
+    def test_delete_tree(self):
+        """
+        Test whether custom delete_tree method deletes the folder's tree in chunks and
+        removes it from storage with a single delete_path call.
+        """
+        owner = User.objects.get(username=self.username)
+        other_user = User.objects.create_user(username='other', password='other')
+        home = f'home/{self.username}'
+        folder = ChrisFolder.objects.create(path=f'{home}/a', owner=owner)
+        subfolder = ChrisFolder.objects.create(path=f'{home}/a/b/c', owner=owner)
+        for name in ('f1.txt', 'f2.txt', 'f3.txt'):
+            f = ChrisFile(parent_folder=subfolder, owner=owner)
+            f.fname.name = f'{home}/a/b/c/{name}'
+            f.save()
+        f.grant_user_permission(other_user, 'r')
+        subfolder.grant_user_permission(other_user, 'r')
+        lf = ChrisLinkFile(path=home, owner=owner, parent_folder=folder)
+        lf.save(name='home_link')
+        storage_manager = mock.Mock()
+
+        with mock.patch.object(ChrisFolder, 'DELETE_CHUNK_SIZE', 2):
+            folder.delete_tree(storage_manager=storage_manager)
+
+        self.assertFalse(ChrisFolder.objects.filter(path__startswith=f'{home}/a').exists())
+        self.assertFalse(ChrisFile.objects.filter(
+            fname__startswith=f'{home}/a/').exists())
+        self.assertFalse(ChrisLinkFile.objects.filter(pk=lf.pk).exists())
+        self.assertFalse(FileUserPermission.objects.filter(user=other_user).exists())
+        self.assertFalse(FolderUserPermission.objects.filter(user=other_user).exists())
+        self.assertTrue(ChrisFolder.objects.filter(path=home).exists())
+        storage_manager.delete_path.assert_called_once_with(f'{home}/a')
+        storage_manager.delete_obj.assert_not_called()
+
+    def test_folder_size_aggregates(self):
+        """
+        Test whether the folders' size and file count aggregates are updated by the
+        compaction of the changes recorded when files are created, moved and deleted.
+        """
+        owner = User.objects.get(username=self.username)
+        home = f'home/{self.username}'
+        folder = ChrisFolder.objects.create(path=f'{home}/a', owner=owner)
+        subfolder = ChrisFolder.objects.create(path=f'{home}/a/b', owner=owner)
+        other = ChrisFolder.objects.create(path=f'{home}/c', owner=owner)
+        files = []
+        for (parent, name, fsize) in ((folder, 'f1', 10), (subfolder, 'f2', 20),
+                                      (subfolder, 'f3', 30)):
+            f = ChrisFile(parent_folder=parent, owner=owner, fsize=fsize)
+            f.fname.name = f'{parent.path}/{name}.txt'
+            f.save()
+            files.append(f)
+
+        def aggregates(*folders):
+            FolderSizeDelta.compact()
+            return [tuple(ChrisFolder.objects.filter(pk=f.pk).values_list(
+                'size', 'file_count').get()) for f in folders]
+
+        home_folder = ChrisFolder.objects.get(path=home)
+        self.assertEqual(aggregates(home_folder, folder, subfolder),
+                         [(60, 3), (60, 3), (50, 2)])
+        self.assertFalse(FolderSizeDelta.objects.exists())
+
+        with mock.patch('core.models.connect_storage'):
+            files[2].move(f'{home}/c/f3.txt')
+            subfolder.move(f'{home}/c/b')
+        self.assertEqual(aggregates(home_folder, folder, other, subfolder),
+                         [(60, 3), (10, 1), (50, 2), (20, 1)])
+
+        files[0].delete()
+        other.delete_tree(storage_manager=mock.Mock())
+        self.assertEqual(aggregates(home_folder, folder), [(0, 0), (0, 0)])
+
+    def test_permissions_are_inherited_from_ancestors(self):
+        """
+        Test whether a permission granted to a folder is stored only once and applies
+        to all its descendant folders and files until it's removed.
+        """
+        owner = User.objects.get(username=self.username)
+        other = User.objects.create_user(username='other', password='other-pass')
+        home = f'home/{self.username}'
+        folder = ChrisFolder.objects.create(path=f'{home}/a', owner=owner)
+        subfolder = ChrisFolder.objects.create(path=f'{home}/a/b', owner=owner)
+        f = ChrisFile(parent_folder=subfolder, owner=owner)
+        f.fname.name = f'{home}/a/b/file.txt'
+        f.save()
+
+        folder.grant_user_permission(other, 'w')
+
+        self.assertEqual(FolderUserPermission.objects.filter(user=other).count(), 1)
+        self.assertFalse(FileUserPermission.objects.filter(user=other).exists())
+        self.assertTrue(subfolder.has_user_permission(other, 'w'))
+        self.assertFalse(subfolder.has_user_permission(other, 'r'))
+        self.assertTrue(f.has_user_permission(other))
+        self.assertFalse(ChrisFolder.objects.get(path=home).has_user_permission(other))
+
+        # permissions granted to the top-level folders are not inherited
+        all_grp = Group.objects.get(name='all_users')
+        self.assertTrue(ChrisFolder.objects.get(path='home').has_group_permission(all_grp))
+        self.assertFalse(ChrisFolder.objects.get(path=home).has_group_permission(all_grp))
+
+        folder.remove_user_permission(other, 'w')
+
+        self.assertFalse(subfolder.has_user_permission(other))
+        self.assertFalse(f.has_user_permission(other))
+
 
 class ChrisFileModelTests(ModelTests):
 
@@ -91,6 +314,68 @@ class ChrisFileModelTests(ModelTests):
             storage_manager_mock.delete_obj.assert_called_with(self.upload_path)
 
 
+class ChrisFileMetadataTests(ModelTests):
+    """
+    Tests for the file size and ETag columns of ChrisFile and ChrisLinkFile.
+    """
+
+    def setUp(self):
+        super(ChrisFileMetadataTests, self).setUp()
+        self.storage_manager = connect_storage(settings)
+        self.owner = User.objects.get(username=self.username)
+        self.folder_path = f'home/{self.username}/uploads/metadata'
+        (self.folder, _) = ChrisFolder.objects.get_or_create(path=self.folder_path,
+                                                             owner=self.owner)
+
+    def tearDown(self):
+        self.storage_manager.delete_path(self.folder_path)
+        super(ChrisFileMetadataTests, self).tearDown()
+
+    def test_save_records_size_and_etag_of_uploaded_file(self):
+        """
+        Test whether overriden save method records the size of an uploaded file
+        without a storage request and its ETag from the storage metadata.
+        """
+        fpath = f'{self.folder_path}/upload.txt'
+        f = ChrisFile(parent_folder=self.folder, owner=self.owner)
+        f.fname = ContentFile(b'test file', name=fpath)
+        with mock.patch('django.core.files.storage.FileSystemStorage.size') as size_mock:
+            f.save()
+            size_mock.assert_not_called()
+        f.refresh_from_db()
+        self.assertEqual(f.fsize, 9)
+        self.assertEqual(f.etag, self.storage_manager.obj_info(fpath).etag)
+
+    def test_link_file_save_records_size_and_etag(self):
+        """
+        Test whether overriden save method records the size and MD5 hash of the link
+        file contents.
+        """
+        lf = ChrisLinkFile(path='PUBLIC', owner=self.owner, parent_folder=self.folder)
+        lf.save(name='public')
+        lf.refresh_from_db()
+        self.assertEqual(lf.fsize, len('PUBLIC'))
+        self.assertEqual(lf.etag, 'cd0c6092d6a6874f379fe4827ed1db8b')
+
+    def test_backfill_file_metadata_command(self):
+        """
+        Test whether the backfill_file_metadata command populates the size and ETag
+        of the existing records that don't have them.
+        """
+        fpath = f'{self.folder_path}/old.txt'
+        self.storage_manager.upload_obj(fpath, 'old file', content_type='text/plain')
+        f = ChrisFile(parent_folder=self.folder, owner=self.owner)
+        f.fname.name = fpath
+        f.save()
+        self.assertIsNone(f.fsize)
+
+        call_command('backfill_file_metadata', batch_size=1, stdout=io.StringIO(),
+                     stderr=io.StringIO())
+        f.refresh_from_db()
+        self.assertEqual(f.fsize, 8)
+        self.assertEqual(f.etag, self.storage_manager.obj_info(fpath).etag)
+
+
 class UserCanAccessObjTests(ModelTests):
     """
     Tests for the canonical ``user_can_access_obj`` read-access rule.
@@ -126,6 +411,89 @@ class UserCanAccessObjTests(ModelTests):
         self.assertTrue(user_can_access_obj(folder, user))
 
 
+class PermissionResolverTests(ModelTests):
+    """
+    Tests for the memoizing ``PermissionResolver``.
+    """
+
+    def setUp(self):
+        super(PermissionResolverTests, self).setUp()
+        self.other = User.objects.create_user(username='other4', password='o-pass')
+        self.folder = ChrisFolder.objects.create(path='home/other4/shared/inner',
+                                                 owner=self.other)
+        self.files = []
+        for i in range(20):
+            f = ChrisFile(parent_folder=self.folder, owner=self.other)
+            f.fname.name = f'home/other4/shared/inner/file{i}.txt'
+            f.save()
+            self.files.append(f)
+
+    def test_has_permission_matches_has_user_permission(self):
+        """
+        Test whether the resolver's decisions are the same as the objects' own
+        has_user_permission methods for direct, inherited and group permissions.
+        """
+        user = User.objects.get(username=self.username)
+        shared_folder = self.folder.parent
+        shared_folder.grant_user_permission(user, 'r')
+        self.files[0].grant_user_permission(user, 'w')
+        grp = Group.objects.create(name='resolver_grp')
+        user.groups.add(grp)
+        self.folder.grant_group_permission(grp, 'w')
+
+        resolver = PermissionResolver(user)
+        for obj in [shared_folder, self.folder] + self.files[:2]:
+            for permission in ('', 'r', 'w'):
+                self.assertEqual(resolver.has_permission(obj, permission),
+                                 obj.has_user_permission(user, permission))
+        home = ChrisFolder.objects.get(path='home/other4')
+        self.assertFalse(resolver.has_permission(home))
+
+    def test_has_permission_constant_number_of_queries(self):
+        """
+        Test whether checking the permissions of many files costs a constant number of
+        queries.
+        """
+        user = User.objects.get(username=self.username)
+        self.folder.grant_user_permission(user, 'r')
+        files = list(ChrisFile.objects.filter(parent_folder=self.folder))
+
+        resolver = PermissionResolver(user)
+        # parent folder ancestors, group ids, file permissions and folder permissions
+        with self.assertNumQueries(4):
+            resolver.prefetch(files)
+            for f in files:
+                self.assertTrue(user_can_access_obj(f, user, resolver))
+
+    def test_has_permission_only_loads_checked_objects_permissions(self):
+        """
+        Test whether the resolver only loads the permissions on the checked objects and
+        their lineage folders.
+        """
+        user = User.objects.get(username=self.username)
+        for f in self.files:
+            f.grant_user_permission(user, 'w')
+        self.folder.grant_user_permission(user, 'r')
+
+        resolver = PermissionResolver(user)
+        self.assertTrue(resolver.has_permission(self.files[0], 'r'))
+        self.assertEqual(set(resolver._permissions[ChrisFile]), {self.files[0].id})
+        self.assertEqual(set(resolver._permissions[ChrisFolder]),
+                         set(self.folder.get_permission_folder_ids(contents=True)))
+
+    def test_for_request_reuses_resolver(self):
+        """
+        Test whether the resolver is created once per request and user.
+        """
+        user = User.objects.get(username=self.username)
+        request = mock.Mock(spec=['user'])
+        request.user = user
+        resolver = PermissionResolver.for_request(request)
+        self.assertIs(PermissionResolver.for_request(request), resolver)
+        request.user = self.other
+        self.assertIsNot(PermissionResolver.for_request(request), resolver)
+
+
 class ValidatePathAccessTests(ModelTests):
     """
     Tests for the centralized ``validate_path_access`` path-access
@@ -216,6 +584,38 @@ class ValidatePathAccessTests(ModelTests):
         self.assertEqual(validate_path_access(chris, other_folder.path),
                          other_folder.path)
 
+    def test_validate_paths_access_batch(self):
+        """
+        Test whether validate_paths_access checks many folder, file and link file paths
+        with a constant number of queries and reports the first invalid path.
+        """
+        user = User.objects.get(username=self.username)
+        other = User.objects.create_user(username='other5', password='o-pass')
+        folder = ChrisFolder.objects.create(path='home/other5/shared', owner=other)
+        folder.grant_user_permission(user, 'r')
+        paths = [folder.path]
+        for i in range(30):
+            f = ChrisFile(parent_folder=folder, owner=other)
+            f.fname.name = f'home/other5/shared/file{i}.txt'
+            f.save()
+            paths.append(f.fname.name)
+        lf = ChrisLinkFile(path=f'home/{self.username}', owner=other,
+                           parent_folder=folder)
+        lf.save(name='link')
+        paths.append(lf.fname.name)
+
+        # paths lookup, group ids, file, link file and folder permissions
+        with self.assertNumQueries(5):
+            self.assertEqual(validate_paths_access(user, [p + '/' for p in paths]),
+                             paths)
+
+        private = ChrisFolder.objects.create(path='home/other5/private', owner=other)
+        with self.assertRaises(PathAccessError) as cm:
+            validate_paths_access(user, paths + [private.path, 'home'])
+        self.assertEqual(
+            str(cm.exception),
+            "User does not have permission to access path 'home/other5/private'.")
+
 
 @tag('integration')
 class ValidatePathAccessStorageTests(ModelTests):
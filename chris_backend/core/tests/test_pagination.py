@@ -0,0 +1,114 @@
+
+import base64
+import json
+import logging
+from urllib.parse import parse_qs, urlparse
+
+from django.db.models import F
+from django.db.models.functions import Length
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import ChrisFolder
+from core.pagination import KeysetLimitOffsetPagination
+
+
+class KeysetLimitOffsetPaginationTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        self.factory = APIRequestFactory()
+        self.username = 'foo'
+        owner = User.objects.create_user(username=self.username, password='bar')
+        ChrisFolder.objects.create(path=f'home/{self.username}', owner=owner)
+        for i in range(5):
+            ChrisFolder.objects.create(path=f'home/{self.username}/folder{i}',
+                                       owner=owner, public=i % 2 == 0)
+        self.queryset = ChrisFolder.objects.filter(
+            path__startswith=f'home/{self.username}/')
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def _paginate(self, queryset, url):
+        paginator = KeysetLimitOffsetPagination()
+        request = Request(self.factory.get(url))
+        page = paginator.paginate_queryset(queryset, request)
+        return paginator, page
+
+    def _walk(self, queryset, url):
+        """
+        Follow the next links from the given url and then the previous links back to
+        the first page, returning the visited pages.
+        """
+        forward = []
+        while url:
+            paginator, page = self._paginate(queryset, url)
+            forward.append(page)
+            url = paginator.get_next_link()
+            last_paginator = paginator
+        backward = [forward[-1]]
+        url = last_paginator.get_previous_link()
+        while url:
+            paginator, page = self._paginate(queryset, url)
+            backward.append(page)
+            url = paginator.get_previous_link()
+        return forward, backward[::-1]
+
+    def test_paginate_queryset_without_cursor_uses_limit_offset(self):
+        paginator, page = self._paginate(self.queryset, '/?limit=2&offset=2')
+        self.assertEqual([f.path for f in page],
+                         [f'home/{self.username}/folder2', f'home/{self.username}/folder1'])
+        response = paginator.get_paginated_response([])
+        self.assertEqual(response.data['count'], 5)
+
+    def test_paginate_queryset_with_cursor_follows_model_ordering(self):
+        forward, backward = self._walk(self.queryset, '/?limit=2&cursor=')
+        self.assertEqual([[f.path for f in page] for page in forward],
+                         [[f'home/{self.username}/folder4', f'home/{self.username}/folder3'],
+                          [f'home/{self.username}/folder2', f'home/{self.username}/folder1'],
+                          [f'home/{self.username}/folder0']])
+        self.assertEqual(forward, backward)
+
+    def test_paginate_queryset_with_cursor_uses_pk_tie_breaker(self):
+        queryset = self.queryset.order_by('public')
+        forward, backward = self._walk(queryset, '/?limit=2&cursor=')
+        self.assertEqual([f.id for page in forward for f in page],
+                         [f.id for f in queryset.order_by('public', 'id')])
+        self.assertEqual(forward, backward)
+
+    def test_get_paginated_response_with_cursor(self):
+        paginator, page = self._paginate(self.queryset, '/?limit=2&cursor=')
+        response = paginator.get_paginated_response([])
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        next_link = response.data['next']
+        self.assertIn('cursor', parse_qs(urlparse(next_link).query))
+
+    def test_paginate_queryset_with_invalid_cursor(self):
+        with self.assertRaises(NotFound):
+            self._paginate(self.queryset, '/?cursor=invalid')
+
+    def test_paginate_queryset_with_cursor_on_annotation(self):
+        queryset = self.queryset.annotate(
+            path_length=Length('path') + F('id') % 2
+        ).order_by('-path_length')
+        forward, backward = self._walk(queryset, '/?limit=2&cursor=')
+        self.assertEqual([f.id for page in forward for f in page],
+                         [f.id for f in queryset.order_by('-path_length', '-id')])
+        self.assertEqual(forward, backward)
+
+    def test_paginate_queryset_with_cursor_of_wrong_value_types(self):
+        queryset = self.queryset.order_by('id')
+        for position in (['x'], [{'a': 1}]):
+            data = json.dumps({'p': position, 'r': 0}).encode('utf-8')
+            url = '/?cursor=' + base64.urlsafe_b64encode(data).decode('ascii')
+            with self.assertRaises(NotFound):
+                self._paginate(queryset, url)
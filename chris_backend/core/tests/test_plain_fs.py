@@ -58,6 +58,29 @@ class FilesystemManagerCRUDTests(TestCase):
         result = self.manager.download_obj('test/string.txt')
         self.assertEqual(result, data.encode('utf-8'))
 
+    def test_open_write_and_open_read(self):
+        data = b'streamed ' * 100000
+        with self.manager.open_write('test/stream.bin') as f:
+            for i in range(0, len(data), 4096):
+                f.write(data[i:i + 4096])
+        with self.manager.open_read('test/stream.bin') as f:
+            self.assertEqual(f.read(9), b'streamed ')
+            self.assertEqual(f.read(), data[9:])
+
+    def test_open_read_byte_range(self):
+        self.manager.upload_obj('test/range.bin', b'0123456789')
+        with self.manager.open_read('test/range.bin', 2, 5) as f:
+            self.assertEqual(f.read(), b'234')
+        with self.manager.open_read('test/range.bin', 7) as f:
+            self.assertEqual(f.read(), b'789')
+
+    def test_open_write_aborted_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.manager.open_write('test/aborted.bin') as f:
+                f.write(b'partial')
+                raise ValueError('boom')
+        self.assertFalse(self.manager.obj_exists('test/aborted.bin'))
+
     def test_obj_exists(self):
         self.assertFalse(self.manager.obj_exists('test/nonexistent.txt'))
         self.manager.upload_obj('test/exists.txt', b'data')
@@ -83,12 +106,42 @@ class FilesystemManagerCRUDTests(TestCase):
         result = self.manager.ls('test/single.txt')
         self.assertEqual(result, ['test/single.txt'])
 
+    def test_iter_ls(self):
+        """iter_ls lazily yields the same files as ls."""
+        self.manager.upload_obj('test/iterls/a.txt', b'a')
+        self.manager.upload_obj('test/iterls/sub/b.txt', b'b')
+        it = self.manager.iter_ls('test/iterls')
+        self.assertNotIsInstance(it, list)
+        self.assertEqual(sorted(it), sorted(self.manager.ls('test/iterls')))
+
+    def test_ls_info(self):
+        """ls_info returns the same files as ls along with their metadata."""
+        self.manager.upload_obj('test/lsinfo/a.txt', b'a')
+        self.manager.upload_obj('test/lsinfo/sub/cc.txt', b'cc')
+        result = sorted(self.manager.ls_info('test/lsinfo'), key=lambda o: o.name)
+        self.assertEqual([o.name for o in result],
+                         ['test/lsinfo/a.txt', 'test/lsinfo/sub/cc.txt'])
+        self.assertEqual([o.size for o in result], [1, 2])
+        self.assertTrue(all(o.etag and o.last_modified.tzinfo for o in result))
+        single = self.manager.ls_info('test/lsinfo/a.txt')
+        self.assertEqual(single, result[:1])
+        self.assertEqual(self.manager.ls_info('test/lsinfo/missing'), [])
+
     def test_delete_obj(self):
         self.manager.upload_obj('test/del.txt', b'delete me')
         self.assertTrue(self.manager.obj_exists('test/del.txt'))
         self.manager.delete_obj('test/del.txt')
         self.assertFalse(self.manager.obj_exists('test/del.txt'))
 
+    def test_delete_objs(self):
+        self.manager.upload_obj('test/dels/a.txt', b'a')
+        self.manager.upload_obj('test/dels/b.txt', b'b')
+        failures = self.manager.delete_objs(['test/dels/a.txt', 'test/dels/b.txt',
+                                             'test/dels/missing.txt'])
+        self.assertEqual(failures, {})
+        self.assertFalse(self.manager.obj_exists('test/dels/a.txt'))
+        self.assertFalse(self.manager.obj_exists('test/dels/b.txt'))
+
     def test_copy_obj(self):
         self.manager.upload_obj('test/src.txt', b'copy me')
         self.manager.copy_obj('test/src.txt', 'test/dst.txt')
@@ -0,0 +1,263 @@
+"""
+Unit tests for the streaming file-like objects used by the storage managers.
+
+Object storage clients are mocked so these tests always run regardless of STORAGE_ENV.
+"""
+
+import datetime
+import io
+import json
+import tarfile
+import zipfile
+from unittest import mock
+
+from django.test import TestCase
+
+from core.storage import streams
+from core.storage.streams import ArchiveEntry, IterStream, ObjectWriter, iter_archive
+from core.storage.s3manager import S3Manager
+from core.storage.storagemanager import StorageObject
+from core.storage.swiftmanager import SwiftManager
+
+
+class _RecordingWriter(ObjectWriter):
+
+    def __init__(self, part_size):
+        super().__init__(part_size)
+        self.parts = []
+        self.completed = None
+        self.aborted = False
+
+    def _upload_part(self, part, size):
+        data = part.read()
+        assert len(data) == size
+        self.parts.append(data)
+
+    def _complete(self, part, size):
+        self.completed = part.read()
+
+    def _abort(self):
+        self.aborted = True
+
+
+class StreamsTests(TestCase):
+
+    def test_iter_stream_reads_across_chunks(self):
+        close_func = mock.Mock()
+        stream = io.BufferedReader(IterStream(iter([b'abc', b'', b'defg', b'h']),
+                                              close_func))
+        self.assertEqual(stream.read(2), b'ab')
+        self.assertEqual(stream.read(), b'cdefgh')
+        self.assertEqual(stream.read(), b'')
+        stream.close()
+        close_func.assert_called_once()
+
+    def test_object_writer_splits_data_into_parts(self):
+        writer = _RecordingWriter(part_size=4)
+        with writer:
+            writer.write(b'abcdef')
+            writer.write(b'ghij')
+        self.assertEqual(writer.parts, [b'abcd', b'efgh'])
+        self.assertEqual(writer.completed, b'ij')
+        self.assertFalse(writer.aborted)
+
+    def test_object_writer_keeps_full_last_part_for_complete(self):
+        writer = _RecordingWriter(part_size=4)
+        with writer:
+            writer.write(b'abcd')
+        self.assertEqual(writer.parts, [])
+        self.assertEqual(writer.completed, b'abcd')
+
+    def test_object_writer_requires_upload_methods(self):
+        class IncompleteWriter(ObjectWriter):
+            def _complete(self, part, size):
+                pass
+
+        with self.assertRaises(TypeError):
+            IncompleteWriter(part_size=4)
+
+    def test_object_writer_aborts_on_error(self):
+        writer = _RecordingWriter(part_size=4)
+        with self.assertRaises(ValueError):
+            with writer:
+                writer.write(b'abcdef')
+                raise ValueError('boom')
+        self.assertTrue(writer.aborted)
+        self.assertIsNone(writer.completed)
+        self.assertTrue(writer.closed)
+
+
+class IterArchiveTests(TestCase):
+
+    def setUp(self):
+        self.contents = {'a/b.txt': b'hello world', 'a/c/d.bin': bytes(range(256)) * 5,
+                         'a/empty.txt': b''}
+        self.storage_manager = mock.Mock()
+        self.storage_manager.open_read.side_effect = lambda path: io.BytesIO(
+            self.contents[path])
+        mtime = datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc)
+        self.entries = [ArchiveEntry(path[2:], path, len(data), mtime)
+                        for (path, data) in self.contents.items()]
+
+    def test_iter_archive_zip(self):
+        with mock.patch.object(streams, 'CHUNK_SIZE', 100):
+            chunks = list(iter_archive(self.storage_manager, self.entries, 'zip'))
+        self.assertTrue(len(chunks) > len(self.entries))
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+            self.assertIsNone(zf.testzip())
+            for (path, data) in self.contents.items():
+                zinfo = zf.getinfo(path[2:])
+                self.assertEqual(zinfo.compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(zinfo.date_time, (2024, 5, 1, 12, 30, 0))
+                self.assertEqual(zf.read(zinfo), data)
+
+    def test_iter_archive_tar(self):
+        with mock.patch.object(streams, 'CHUNK_SIZE', 100):
+            chunks = list(iter_archive(self.storage_manager, self.entries, 'tar'))
+        with tarfile.open(fileobj=io.BytesIO(b''.join(chunks))) as tf:
+            self.assertEqual(tf.getnames(), [path[2:] for path in self.contents])
+            for (path, data) in self.contents.items():
+                self.assertEqual(tf.extractfile(path[2:]).read(), data)
+            self.assertEqual(tf.getmember('b.txt').mtime,
+                             self.entries[0].mtime.timestamp())
+
+    def test_iter_archive_tar_fails_on_size_mismatch(self):
+        for size in (5, 20):
+            entries = [self.entries[0]._replace(size=size)]
+            with self.assertRaises(IOError):
+                list(iter_archive(self.storage_manager, entries, 'tar'))
+
+    def test_iter_archive_gets_unknown_sizes_from_storage(self):
+        self.storage_manager.obj_info.side_effect = lambda path: StorageObject(
+            path, len(self.contents[path]), 'etag', self.entries[0].mtime)
+        entries = [entry._replace(size=None) for entry in self.entries]
+        chunks = list(iter_archive(self.storage_manager, entries, 'tar'))
+        with tarfile.open(fileobj=io.BytesIO(b''.join(chunks))) as tf:
+            for (path, data) in self.contents.items():
+                self.assertEqual(tf.extractfile(path[2:]).read(), data)
+
+    def test_iter_archive_invalid_format(self):
+        with self.assertRaises(ValueError):
+            list(iter_archive(self.storage_manager, self.entries, 'rar'))
+
+
+class S3ObjectWriterTests(TestCase):
+
+    def setUp(self):
+        self.manager = S3Manager('users', {})
+        self.client = mock.Mock()
+        self.client.create_multipart_upload.return_value = {'UploadId': 'up1'}
+        self.client.upload_part.side_effect = (
+            lambda **kwargs: {'ETag': f'"etag{kwargs["PartNumber"]}"'})
+        self.manager._client = self.client
+
+    def test_open_write_small_object_uses_put_object(self):
+        with self.manager.open_write('home/foo/a.txt', content_type='text/plain') as f:
+            f.write(b'hello')
+        self.client.put_object.assert_called_once_with(
+            Body=b'hello', Bucket='users', Key='home/foo/a.txt',
+            ContentType='text/plain')
+        self.client.create_multipart_upload.assert_not_called()
+
+    def test_open_write_large_object_uses_multipart_upload(self):
+        with mock.patch('core.storage.s3manager._S3_PART_SIZE', 4):
+            with self.manager.open_write('home/foo/a.bin') as f:
+                f.write(b'0123456789')
+
+        bodies = [c.kwargs['Body'] for c in self.client.upload_part.call_args_list]
+        self.assertEqual(bodies, [b'0123', b'4567', b'89'])
+        self.client.complete_multipart_upload.assert_called_once_with(
+            Bucket='users', Key='home/foo/a.bin', UploadId='up1',
+            MultipartUpload={'Parts': [{'ETag': '"etag1"', 'PartNumber': 1},
+                                       {'ETag': '"etag2"', 'PartNumber': 2},
+                                       {'ETag': '"etag3"', 'PartNumber': 3}]})
+        self.client.put_object.assert_not_called()
+
+    def test_open_write_aborts_multipart_upload_on_error(self):
+        with mock.patch('core.storage.s3manager._S3_PART_SIZE', 4):
+            with self.assertRaises(ValueError):
+                with self.manager.open_write('home/foo/a.bin') as f:
+                    f.write(b'0123456789')
+                    raise ValueError('boom')
+
+        self.client.abort_multipart_upload.assert_called_once_with(
+            Bucket='users', Key='home/foo/a.bin', UploadId='up1')
+        self.client.complete_multipart_upload.assert_not_called()
+
+    def test_open_read_byte_range(self):
+        self.client.get_object.return_value = {'Body': io.BytesIO(b'234')}
+        self.manager.open_read('home/foo/a.bin', 2, 5)
+        self.client.get_object.assert_called_once_with(
+            Bucket='users', Key='home/foo/a.bin', Range='bytes=2-4')
+
+    def test_open_read_returns_streaming_body(self):
+        body = io.BytesIO(b'data')
+        self.client.get_object.return_value = {'Body': body}
+        self.assertIs(self.manager.open_read('home/foo/a.bin'), body)
+
+
+class SwiftObjectWriterTests(TestCase):
+
+    def setUp(self):
+        self.manager = SwiftManager('users', {})
+        self.conn = mock.Mock()
+        self.conn.get_auth.return_value = ('http://swift/v1/AUTH_test', 'token')
+        self.uploaded = {}
+
+        def put_object(container, obj, contents, chunk_size=None, **kwargs):
+            data = contents if isinstance(contents, str) else contents.read()
+            self.uploaded[(container, obj)] = data
+            return f'etag{len(self.uploaded)}'
+
+        self.conn.put_object.side_effect = put_object
+        connection_patcher = mock.patch(
+            'core.storage.swiftmanager._SharedAuthConnection', return_value=self.conn)
+        connection_patcher.start()
+        self.addCleanup(connection_patcher.stop)
+
+    def test_open_write_small_object(self):
+        with self.manager.open_write('home/foo/a.txt', content_type='text/plain') as f:
+            f.write(b'hello')
+        self.assertEqual(self.uploaded, {('users', 'home/foo/a.txt'): b'hello'})
+        self.conn.put_container.assert_not_called()
+
+    def test_open_write_large_object_uploads_segments_and_manifest(self):
+        with mock.patch('core.storage.swiftmanager._SWIFT_SEGMENT_SIZE', 4):
+            with self.manager.open_write('home/foo/a.bin') as f:
+                f.write(b'0123456789')
+
+        self.conn.put_container.assert_called_once_with('users_segments')
+        segments = sorted((obj, data) for (container, obj), data
+                          in self.uploaded.items() if container == 'users_segments')
+        self.assertEqual([data for _, data in segments], [b'0123', b'4567', b'89'])
+        manifest = json.loads(self.uploaded[('users', 'home/foo/a.bin')])
+        self.assertEqual([s['path'] for s in manifest],
+                         [f'/users_segments/{obj}' for obj, _ in segments])
+        self.assertEqual([s['size_bytes'] for s in manifest], [4, 4, 2])
+        self.assertEqual(self.conn.put_object.call_args.kwargs['query_string'],
+                         'multipart-manifest=put')
+
+    def test_open_write_deletes_segments_on_error(self):
+        with mock.patch('core.storage.swiftmanager._SWIFT_SEGMENT_SIZE', 4):
+            with self.assertRaises(ValueError):
+                with self.manager.open_write('home/foo/a.bin') as f:
+                    f.write(b'0123456789')
+                    raise ValueError('boom')
+
+        self.assertEqual(self.conn.delete_object.call_count, 2)
+        self.assertNotIn(('users', 'home/foo/a.bin'), self.uploaded)
+
+    def test_open_read_streams_object_body(self):
+        class Body:
+            chunks = iter([b'abc', b'def'])
+            close = mock.Mock()
+
+            def __next__(self):
+                return next(self.chunks)
+
+        body = Body()
+        self.conn.get_object.return_value = ({}, body)
+
+        with self.manager.open_read('home/foo/a.bin') as f:
+            self.assertEqual(f.read(), b'abcdef')
+        body.close.assert_called_once()
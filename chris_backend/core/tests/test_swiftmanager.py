@@ -66,6 +66,15 @@ class SwiftManagerCRUDTests(TestCase):
         result = self.manager.download_obj('test/string.txt')
         self.assertEqual(result, data.encode('utf-8'))
 
+    def test_open_write_and_open_read(self):
+        data = b'streamed ' * 100000
+        with self.manager.open_write('test/stream.bin') as f:
+            for i in range(0, len(data), 4096):
+                f.write(data[i:i + 4096])
+        with self.manager.open_read('test/stream.bin') as f:
+            self.assertEqual(f.read(9), b'streamed ')
+            self.assertEqual(f.read(), data[9:])
+
     def test_obj_exists(self):
         self.assertFalse(self.manager.obj_exists('test/nonexistent.txt'))
         self.manager.upload_obj('test/exists.txt', b'data')
@@ -89,6 +98,16 @@ class SwiftManagerCRUDTests(TestCase):
         result = self.manager.ls('')
         self.assertEqual(result, [])
 
+    def test_ls_info(self):
+        self.manager.upload_obj('test/lsinfo/a.txt', b'a')
+        self.manager.upload_obj('test/lsinfo/sub/cc.txt', b'cc')
+        result = sorted(self.manager.ls_info('test/lsinfo/'), key=lambda o: o.name)
+        self.assertEqual([o.name for o in result],
+                         ['test/lsinfo/a.txt', 'test/lsinfo/sub/cc.txt'])
+        self.assertEqual([o.size for o in result], [1, 2])
+        self.assertEqual(result[0].etag, '0cc175b9c0f1b6a831c399e269772661')
+        self.assertIsNotNone(result[0].last_modified.tzinfo)
+
     def test_delete_obj(self):
         self.manager.upload_obj('test/del.txt', b'delete me')
         self.assertTrue(self.manager.obj_exists('test/del.txt'))
@@ -0,0 +1,129 @@
+
+import logging
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from core.models import ChrisFolder, ChrisFile, StorageGarbage
+from core.tasks import delete_storage_garbage
+
+
+class DeleteStorageGarbageTaskTests(TestCase):
+
+    def setUp(self):
+        # avoid cluttered console output (for instance logging all the http requests)
+        logging.disable(logging.WARNING)
+
+        # start from an empty outbox (other test classes' teardowns may have filled it)
+        StorageGarbage.objects.all().delete()
+
+        self.username = 'foo'
+        self.owner = User.objects.create_user(username=self.username, password='bar')
+        self.folder = ChrisFolder.objects.create(path=f'home/{self.username}',
+                                                 owner=self.owner)
+
+    def tearDown(self):
+        # re-enable logging
+        logging.disable(logging.NOTSET)
+
+    def _create_file(self, name):
+        f = ChrisFile(parent_folder=self.folder, owner=self.owner)
+        f.fname.name = f'home/{self.username}/{name}'
+        f.save()
+        return f
+
+    def test_file_delete_records_storage_garbage(self):
+        f = self._create_file('file.txt')
+        with mock.patch('core.models.connect_storage') as connect_storage_mock:
+            f.delete()
+        connect_storage_mock.assert_not_called()
+        self.assertEqual(list(StorageGarbage.objects.values_list('path', flat=True)),
+                         [f'home/{self.username}/file.txt'])
+
+    def test_file_delete_deletes_object_on_commit(self):
+        f = self._create_file('file.txt')
+        storage_manager = mock.Mock()
+        storage_manager.delete_objs.return_value = {}
+
+        with mock.patch('core.models.connect_storage', return_value=storage_manager), \
+                self.captureOnCommitCallbacks(execute=True):
+            f.delete()
+
+        storage_manager.delete_objs.assert_called_once_with(
+            {f'home/{self.username}/file.txt'})
+        self.assertFalse(StorageGarbage.objects.exists())
+
+    def test_file_delete_keeps_garbage_when_delete_on_commit_fails(self):
+        f = self._create_file('file.txt')
+        storage_manager = mock.Mock()
+        storage_manager.delete_objs.return_value = {
+            f'home/{self.username}/file.txt': 'error'}
+
+        with mock.patch('core.models.connect_storage', return_value=storage_manager), \
+                self.captureOnCommitCallbacks(execute=True):
+            f.delete()
+
+        self.assertEqual(list(StorageGarbage.objects.values_list('path', flat=True)),
+                         [f'home/{self.username}/file.txt'])
+
+    def test_file_save_releases_storage_garbage_for_its_path(self):
+        path = f'home/{self.username}/file.txt'
+        StorageGarbage.objects.create(path=path)
+        storage_manager = mock.Mock()
+        storage_manager.delete_objs.return_value = {}
+        storage_manager.obj_info.return_value = None
+
+        f = ChrisFile(parent_folder=self.folder, owner=self.owner)
+        f.fname = ContentFile(b'new contents', name=path)
+        with mock.patch('core.models.connect_storage', return_value=storage_manager), \
+                mock.patch.object(ChrisFile.fname.field, 'storage') as storage_mock:
+            storage_mock.save.return_value = path
+            f.save()
+
+        # the deleted file's leftover object is deleted before the upload
+        storage_manager.delete_objs.assert_called_once_with({path})
+        self.assertFalse(StorageGarbage.objects.exists())
+
+    def test_delete_storage_garbage_deletes_objects_in_batches(self):
+        paths = [f'home/{self.username}/f{i}.txt' for i in range(5)]
+        for path in paths:
+            StorageGarbage.objects.create(path=path)
+        storage_manager = mock.Mock()
+        storage_manager.delete_objs.return_value = {}
+
+        with mock.patch('core.tasks.connect_storage', return_value=storage_manager), \
+                mock.patch.object(StorageGarbage, 'BATCH_SIZE', 2):
+            delete_storage_garbage()
+
+        self.assertEqual(storage_manager.delete_objs.call_count, 3)
+        deleted = set()
+        for call in storage_manager.delete_objs.call_args_list:
+            deleted.update(call.args[0])
+        self.assertEqual(deleted, set(paths))
+        self.assertFalse(StorageGarbage.objects.exists())
+
+    def test_delete_storage_garbage_skips_registered_paths(self):
+        self._create_file('file.txt')
+        StorageGarbage.objects.create(path=f'home/{self.username}/file.txt')
+        storage_manager = mock.Mock()
+
+        with mock.patch('core.tasks.connect_storage', return_value=storage_manager):
+            delete_storage_garbage()
+
+        storage_manager.delete_objs.assert_not_called()
+        self.assertFalse(StorageGarbage.objects.exists())
+
+    def test_delete_storage_garbage_keeps_failed_objects(self):
+        StorageGarbage.objects.create(path=f'home/{self.username}/a.txt')
+        StorageGarbage.objects.create(path=f'home/{self.username}/b.txt')
+        storage_manager = mock.Mock()
+        storage_manager.delete_objs.return_value = {
+            f'home/{self.username}/b.txt': 'error'}
+
+        with mock.patch('core.tasks.connect_storage', return_value=storage_manager):
+            delete_storage_garbage()
+
+        self.assertEqual(list(StorageGarbage.objects.values_list('path', flat=True)),
+                         [f'home/{self.username}/b.txt'])
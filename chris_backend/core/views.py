@@ -1,10 +1,21 @@
 
 import logging
+import mimetypes
+import os
+import re
 import uuid
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+from urllib.parse import quote
+
 import jwt
 
 from django.contrib.auth.models import User
+from django.http import (FileResponse, HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django.conf import settings
 from rest_framework import generics, permissions
 from rest_framework.reverse import reverse
@@ -16,10 +27,14 @@ from collectionjson import services
 from .models import ChrisInstance, FileDownloadToken, FileDownloadTokenFilter
 from .serializers import ChrisInstanceSerializer, FileDownloadTokenSerializer
 from .permissions import IsOwnerOrChris
+from .storage import connect_storage, FilesystemManager
+from .storage.streams import ArchiveEntry, iter_archive
 
 
 logger = logging.getLogger(__name__)
 
+_BYTE_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
 
 class ChrisInstanceDetail(generics.RetrieveAPIView):
     """
@@ -170,3 +185,151 @@ class TokenAuthSupportQueryStringScheme(OpenApiAuthenticationExtension):
             'in': 'header',
             'name': 'download_token'
         }
+
+
+def file_response(request, chris_file):
+    """
+    Return a streaming response with the contents of a ChRIS file (or any of its
+    subclasses).
+
+    Conditional requests (``If-None-Match``, ``If-Match``) are evaluated against the
+    file's stored ETag and single byte range requests (``Range``, ``If-Range``) are
+    answered with a 206 response. Only the requested bytes are read from storage.
+
+    Depending on the ``FILE_DOWNLOAD_MODE`` setting the transfer itself can be
+    handed over to the storage service or the reverse proxy, see
+    ``_offloaded_file_response``.
+    """
+    f = chris_file.fname
+    filename = Path(f.name).name
+    etag = quote_etag(chris_file.etag) if chris_file.etag else None
+
+    resp = get_conditional_response(request, etag=etag)
+    if resp is not None:  # 304 Not Modified or 412 Precondition Failed
+        if etag:
+            resp['ETag'] = etag
+        return resp
+
+    if settings.FILE_DOWNLOAD_MODE != 'proxy':
+        resp = _offloaded_file_response(f.name, filename)
+        if resp is not None:
+            if etag:
+                resp['ETag'] = etag
+            return resp
+
+    size = chris_file.fsize if chris_file.fsize is not None else f.size
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and _if_range_matches(request, etag):
+        try:
+            byte_range = _parse_byte_range(range_header, size)
+        except ValueError:
+            resp = HttpResponse(status=416)
+            resp['Content-Range'] = f'bytes */{size}'
+            return resp
+
+    storage_manager = connect_storage(settings)
+    if byte_range is None:
+        resp = FileResponse(storage_manager.open_read(f.name), filename=filename)
+        resp['Content-Length'] = size
+    else:
+        start, end = byte_range
+        resp = FileResponse(storage_manager.open_read(f.name, start, end),
+                            filename=filename, status=206)
+        resp['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+        resp['Content-Length'] = end - start
+    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
+    resp['Accept-Ranges'] = 'bytes'
+    if etag:
+        resp['ETag'] = etag
+    return resp
+
+
+def archive_response(entries: Iterable[ArchiveEntry], filename: str,
+                     archive_format: str = 'zip') -> StreamingHttpResponse:
+    """
+    Return a streaming response with a zip or tar archive of the given stored files.
+    The archive is built while it's being sent, see ``iter_archive``.
+    """
+    storage_manager = connect_storage(settings)
+    content_type = 'application/zip' if archive_format == 'zip' else 'application/x-tar'
+    resp = StreamingHttpResponse(iter_archive(storage_manager, entries, archive_format),
+                                 content_type=content_type)
+    resp['Content-Disposition'] = f'attachment; filename="{filename}.{archive_format}"'
+    return resp
+
+
+def _offloaded_file_response(file_path: str, filename: str) -> Optional[HttpResponse]:
+    """
+    Return a response that hands the download of a file over according to the
+    ``FILE_DOWNLOAD_MODE`` setting:
+
+    - ``redirect``: a redirect to a short-lived URL of the storage service (S3
+      presigned URL or Swift temp URL)
+    - ``accel``: an empty response with an ``X-Accel-Redirect`` header pointing to
+      the internal location ``FILE_DOWNLOAD_ACCEL_PREFIX`` of an nginx proxy
+    - ``sendfile``: an empty response with an ``X-Sendfile`` header
+
+    Returns None when the configured storage can't be offloaded in that mode, the
+    file is then streamed by ChRIS.
+    """
+    mode = settings.FILE_DOWNLOAD_MODE
+    storage_manager = connect_storage(settings)
+    if mode == 'redirect':
+        url = storage_manager.get_download_url(file_path,
+                                               settings.FILE_DOWNLOAD_URL_EXPIRY,
+                                               filename)
+        return None if url is None else HttpResponseRedirect(url)
+
+    if not isinstance(storage_manager, FilesystemManager):
+        return None
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    resp = HttpResponse(content_type=content_type)
+    if mode == 'accel':
+        prefix = settings.FILE_DOWNLOAD_ACCEL_PREFIX.rstrip('/')
+        resp['X-Accel-Redirect'] = quote(f'{prefix}/{file_path}')
+    else:
+        resp['X-Sendfile'] = os.path.join(settings.MEDIA_ROOT, file_path)
+    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return resp
+
+
+def _if_range_matches(request, etag: Optional[str]) -> bool:
+    """
+    :returns: True if the request has no ``If-Range`` precondition or if it matches
+              the file's ETag. Dates never match since no ``Last-Modified`` header is
+              sent, neither do weak ETags.
+    """
+    if_range = request.headers.get('If-Range')
+    if if_range is None:
+        return True
+    return etag is not None and if_range.strip() == etag
+
+
+def _parse_byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse the value of a ``Range`` header for a file of the given size.
+
+    :returns: the (start, end) positions of the requested bytes, end excluded, or
+              None if the header is malformed or requests multiple ranges, in which
+              case the whole file is returned
+    :raises ValueError: if the range can't be satisfied
+    """
+    match = _BYTE_RANGE_RE.match(range_header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':  # suffix range with the last bytes of the file
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError('unsatisfiable range')
+        return max(0, size - length), size
+    start = int(first)
+    if last != '' and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError('unsatisfiable range')
+    end = size if last == '' else min(int(last) + 1, size)
+    return start, end
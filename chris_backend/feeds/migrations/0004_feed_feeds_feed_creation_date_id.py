@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-18 21:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0008_folder_size_aggregates'),
+        ('feeds', '0003_feed_deletion_error_feed_deletion_requested_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feed',
+            index=models.Index(fields=['creation_date', 'id'], name='feeds_feed_creation_date_id'),
+        ),
+    ]
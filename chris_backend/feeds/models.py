@@ -30,6 +30,8 @@ class Feed(AsyncDeletableModel):
 
     class Meta:
         ordering = ('-creation_date',)
+        indexes = [models.Index(fields=['creation_date', 'id'],
+                                name='feeds_feed_creation_date_id')]
 
     def __str__(self):
         return self.name
@@ -184,7 +186,7 @@ class Feed(AsyncDeletableModel):
 @receiver(post_delete, sender=Feed)
 def auto_delete_folder_with_feed(sender, instance, **kwargs):
     try:
-        instance.folder.delete()
+        instance.folder.delete_tree()
     except Exception:
         pass
 
@@ -223,7 +225,7 @@ class FeedFilter(FilterSet):
         for feed in queryset:
             qs = UserFile.objects.filter(fname__startswith=feed.folder.path)
             for val in value_l:
-                qs = qs.filter(fname__icontains=val)
+                qs = qs.filter(fname__ilike_contains=val)
             qs_l.append(qs)
 
         files_qs = UserFile.objects.none().union(*qs_l)
@@ -250,10 +252,10 @@ class FeedGroupPermission(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        Overriden to grant the group write permission to all the folders, files and link
-        files within the feed's folder. In addition, the same permission is applied to
-        all objects pointed by the linked files under the feed's folder if they are owned
-        by the feed's owner.
+        Overriden to grant the group write permission to the feed's folder, which is
+        inherited by all the folders, files and link files within it. In addition, the
+        same permission is granted to all objects pointed by the linked files under the
+        feed's folder if they are owned by the feed's owner.
         """
         super(FeedGroupPermission, self).save(*args, **kwargs)
 
@@ -261,38 +263,23 @@ class FeedGroupPermission(models.Model):
         feed_folder.grant_group_permission(self.group, 'w')
 
         linked_paths = ChrisLinkFile.objects.filter(
-            fname__startswith=feed_folder.path + '/'
-        ).values_list('path', flat=True)
+            feed_folder.get_tree_lookup()).values_list('path', flat=True)
 
         if linked_paths:
-            linked_owned_folder_paths = ChrisFolder.objects.filter(
-                path__in=linked_paths,
-                owner=feed_folder.owner
-            ).values_list('path', flat=True)
-
-            if linked_owned_folder_paths:
-                lookup = models.Q()
-
-                for path in linked_owned_folder_paths:
-                    lookup |= models.Q(path=path)
-                    lookup |= models.Q(path__startswith=path + '/')
-
-                folders = ChrisFolder.objects.filter(lookup)
-                objs = []
-                for folder in folders:
-                    perm = FolderGroupPermission(folder=folder, group=self.group,
-                                                 permission='w')
-                    objs.append(perm)
-                FolderGroupPermission.objects.bulk_create(objs, update_conflicts=True,
-                                                          update_fields=['permission'],
-                                                          unique_fields=['folder_id',
-                                                                         'group_id'])
-
-            lookup = models.Q(fname__in=linked_paths, owner=feed_folder.owner)
-            for path in linked_owned_folder_paths:
-                lookup |= models.Q(fname__startswith=path + '/')
-
-            files = ChrisFile.objects.filter(lookup)
+            owner = feed_folder.owner
+
+            folders = ChrisFolder.objects.filter(path__in=linked_paths, owner=owner)
+            objs = []
+            for folder in folders:
+                perm = FolderGroupPermission(folder=folder, group=self.group,
+                                             permission='w')
+                objs.append(perm)
+            FolderGroupPermission.objects.bulk_create(objs, update_conflicts=True,
+                                                      update_fields=['permission'],
+                                                      unique_fields=['folder_id',
+                                                                     'group_id'])
+
+            files = ChrisFile.objects.filter(fname__in=linked_paths, owner=owner)
             objs = []
             for f in files:
                 perm = FileGroupPermission(file=f, group=self.group, permission='w')
@@ -301,7 +288,7 @@ class FeedGroupPermission(models.Model):
                                                     update_fields=['permission'],
                                                     unique_fields=['file_id', 'group_id'])
 
-            link_files = ChrisLinkFile.objects.filter(lookup)
+            link_files = ChrisLinkFile.objects.filter(fname__in=linked_paths, owner=owner)
             objs = []
             for lf in link_files:
                 perm = LinkFileGroupPermission(link_file=lf, group=self.group,
@@ -314,10 +301,9 @@ class FeedGroupPermission(models.Model):
 
     def delete(self, *args, **kwargs):
         """
-        Overriden to remove the group's write permission to all the folders, files and
-        link files within the feed's folder. In addition, the same permission is removed
-        for all objects pointed by the linked files under the feed's folder if they are
-        owned by the feed's owner.
+        Overriden to remove the group's write permission to the feed's folder. In
+        addition, the same permission is removed for all objects pointed by the linked
+        files under the feed's folder if they are owned by the feed's owner.
         """
         super(FeedGroupPermission, self).delete(*args, **kwargs)
 
@@ -325,47 +311,22 @@ class FeedGroupPermission(models.Model):
         feed_folder.remove_group_permission(self.group, 'w')
 
         linked_paths = ChrisLinkFile.objects.filter(
-            fname__startswith=feed_folder.path + '/'
-        ).values_list('path', flat=True)
+            feed_folder.get_tree_lookup()).values_list('path', flat=True)
 
         if linked_paths:
-            linked_owned_folder_paths = ChrisFolder.objects.filter(
-                path__in=linked_paths,
-                owner=feed_folder.owner
-            ).values_list('path', flat=True)
-
-            if linked_owned_folder_paths:
-                lookup = models.Q()
-
-                for path in linked_owned_folder_paths:
-                    lookup |= models.Q(path=path)
-                    lookup |= models.Q(path__startswith=path + '/')
+            owner = feed_folder.owner
 
-                folders = ChrisFolder.objects.filter(lookup)
+            FolderGroupPermission.objects.filter(folder__path__in=linked_paths,
+                                                 folder__owner=owner, group=self.group,
+                                                 permission='w').delete()
 
-                FolderGroupPermission.objects.filter(folder__in=folders,
-                                                     group=self.group,
-                                                     permission='w').delete()
+            FileGroupPermission.objects.filter(file__fname__in=linked_paths,
+                                               file__owner=owner, group=self.group,
+                                               permission='w').delete()
 
-            lookup = models.Q(file__fname__in=linked_paths,
-                              file__owner=feed_folder.owner,
-                              group=self.group, permission='w')
-
-            for path in linked_owned_folder_paths:
-                lookup |= models.Q(file__fname__startswith=path + '/',
-                                   group=self.group, permission='w')
-
-            FileGroupPermission.objects.filter(lookup).delete()
-
-            lookup = models.Q(link_file__fname__in=linked_paths,
-                              link_file__owner=feed_folder.owner,
-                              group=self.group, permission='w')
-
-            for path in linked_owned_folder_paths:
-                lookup |= models.Q(link_file__fname__startswith=path + '/',
-                                   group=self.group, permission='w')
-
-            LinkFileGroupPermission.objects.filter(lookup).delete()
+            LinkFileGroupPermission.objects.filter(link_file__fname__in=linked_paths,
+                                                   link_file__owner=owner, group=self.group,
+                                                   permission='w').delete()
 
 
 class FeedGroupPermissionFilter(FilterSet):
@@ -388,10 +349,10 @@ class FeedUserPermission(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        Overriden to grant the user write permission to all the folders, files and link
-        files within the feed's folder. In addition, the same permission is applied to
-        all objects pointed by the linked files under the feed's folder if they are owned
-        by the feed's owner.
+        Overriden to grant the user write permission to the feed's folder, which is
+        inherited by all the folders, files and link files within it. In addition, the
+        same permission is granted to all objects pointed by the linked files under the
+        feed's folder if they are owned by the feed's owner.
         """
         super(FeedUserPermission, self).save(*args, **kwargs)
 
@@ -399,62 +360,47 @@ class FeedUserPermission(models.Model):
         feed_folder.grant_user_permission(self.user, 'w')
 
         linked_paths = ChrisLinkFile.objects.filter(
-            fname__startswith=feed_folder.path + '/'
-        ).values_list('path', flat=True)
+            feed_folder.get_tree_lookup()).values_list('path', flat=True)
 
         if linked_paths:
-            linked_owned_folder_paths = ChrisFolder.objects.filter(
-                path__in=linked_paths,
-                owner=feed_folder.owner
-            ).values_list('path', flat=True)
-
-            if linked_owned_folder_paths:
-                lookup = models.Q()
-
-                for path in linked_owned_folder_paths:
-                    lookup |= models.Q(path=path)
-                    lookup |= models.Q(path__startswith=path + '/')
-
-                folders = ChrisFolder.objects.filter(lookup)
-                objs = []
-                for folder in folders:
-                    perm = FolderUserPermission(folder=folder, user=self.user,
-                                                permission='w')
-                    objs.append(perm)
-                FolderUserPermission.objects.bulk_create(objs, update_conflicts=True,
-                                                          update_fields=['permission'],
-                                                          unique_fields=['folder_id',
-                                                                         'user_id'])
-
-            lookup = models.Q(fname__in=linked_paths, owner=feed_folder.owner)
-            for path in linked_owned_folder_paths:
-                lookup |= models.Q(fname__startswith=path + '/')
-
-            files = ChrisFile.objects.filter(lookup)
+            owner = feed_folder.owner
+
+            folders = ChrisFolder.objects.filter(path__in=linked_paths, owner=owner)
+            objs = []
+            for folder in folders:
+                perm = FolderUserPermission(folder=folder, user=self.user,
+                                            permission='w')
+                objs.append(perm)
+            FolderUserPermission.objects.bulk_create(objs, update_conflicts=True,
+                                                     update_fields=['permission'],
+                                                     unique_fields=['folder_id',
+                                                                    'user_id'])
+
+            files = ChrisFile.objects.filter(fname__in=linked_paths, owner=owner)
             objs = []
             for f in files:
                 perm = FileUserPermission(file=f, user=self.user, permission='w')
                 objs.append(perm)
             FileUserPermission.objects.bulk_create(objs, update_conflicts=True,
-                                                    update_fields=['permission'],
-                                                    unique_fields=['file_id', 'user_id'])
+                                                   update_fields=['permission'],
+                                                   unique_fields=['file_id', 'user_id'])
 
-            link_files = ChrisLinkFile.objects.filter(lookup)
+            link_files = ChrisLinkFile.objects.filter(fname__in=linked_paths, owner=owner)
             objs = []
             for lf in link_files:
-                perm = LinkFileUserPermission(link_file=lf, user=self.user, permission='w')
+                perm = LinkFileUserPermission(link_file=lf, user=self.user,
+                                              permission='w')
                 objs.append(perm)
             LinkFileUserPermission.objects.bulk_create(objs, update_conflicts=True,
-                                                        update_fields=['permission'],
-                                                        unique_fields=['link_file_id',
-                                                                       'user_id'])
+                                                       update_fields=['permission'],
+                                                       unique_fields=['link_file_id',
+                                                                      'user_id'])
 
     def delete(self, *args, **kwargs):
         """
-        Overriden to remove the user's write permission to all the folders, files and
-        link files within the feed's folder. In addition, the same permission is removed
-        for all objects pointed by the linked files under the feed's folder if they are
-        owned by the feed's owner.
+        Overriden to remove the user's write permission to the feed's folder. In
+        addition, the same permission is removed for all objects pointed by the linked
+        files under the feed's folder if they are owned by the feed's owner.
         """
         super(FeedUserPermission, self).delete(*args, **kwargs)
 
@@ -462,46 +408,22 @@ class FeedUserPermission(models.Model):
         feed_folder.remove_user_permission(self.user, 'w')
 
         linked_paths = ChrisLinkFile.objects.filter(
-            fname__startswith=feed_folder.path + '/'
-        ).values_list('path', flat=True)
+            feed_folder.get_tree_lookup()).values_list('path', flat=True)
 
         if linked_paths:
-            linked_owned_folder_paths = ChrisFolder.objects.filter(
-                path__in=linked_paths,
-                owner=feed_folder.owner
-            ).values_list('path', flat=True)
-
-            if linked_owned_folder_paths:
-                lookup = models.Q()
-
-                for path in linked_owned_folder_paths:
-                    lookup |= models.Q(path=path)
-                    lookup |= models.Q(path__startswith=path + '/')
-
-                folders = ChrisFolder.objects.filter(lookup)
-                FolderUserPermission.objects.filter(folder__in=folders,
-                                                    user=self.user,
-                                                    permission='w').delete()
-
-            lookup = models.Q(file__fname__in=linked_paths,
-                              file__owner=feed_folder.owner,
-                              user=self.user, permission='w')
-
-            for path in linked_owned_folder_paths:
-                lookup |= models.Q(file__fname__startswith=path + '/',
-                                   user=self.user, permission='w')
-
-            FileUserPermission.objects.filter(lookup).delete()
+            owner = feed_folder.owner
 
-            lookup = models.Q(link_file__fname__in=linked_paths,
-                              link_file__owner=feed_folder.owner,
-                              user=self.user, permission='w')
+            FolderUserPermission.objects.filter(folder__path__in=linked_paths,
+                                                folder__owner=owner, user=self.user,
+                                                permission='w').delete()
 
-            for path in linked_owned_folder_paths:
-                lookup |= models.Q(link_file__fname__startswith=path + '/',
-                                   user=self.user, permission='w')
+            FileUserPermission.objects.filter(file__fname__in=linked_paths,
+                                              file__owner=owner, user=self.user,
+                                              permission='w').delete()
 
-            LinkFileUserPermission.objects.filter(lookup).delete()
+            LinkFileUserPermission.objects.filter(link_file__fname__in=linked_paths,
+                                                  link_file__owner=owner, user=self.user,
+                                                  permission='w').delete()
 
 
 class FeedUserPermissionFilter(FilterSet):
@@ -138,10 +138,11 @@ class FeedGroupPermissionTests(ModelTests):
 
     def test_save(self):
         """
-        Test whether overriden save method grants the group write permission to all the
-        folders, files and link files within the feed's folder. In addition, tests
-        whether the same permission is applied to all objects pointed by the linked
-        files under the feed's folder if they are owned by the feed's owner.
+        Test whether overriden save method grants the group write permission to the
+        feed's folder, which is inherited by all the folders, files and link files within
+        it. In addition, tests whether the same permission is applied to all objects
+        pointed by the linked files under the feed's folder if they are owned by the
+        feed's owner.
         """
         user = User.objects.get(username=self.username)
         grp = Group.objects.get(name='all_users')
@@ -177,17 +178,15 @@ class FeedGroupPermissionTests(ModelTests):
         perm = FeedGroupPermission(feed=feed, group=grp)
         perm.save()
 
-        grps = folder.shared_groups.values_list('name', flat=True)
-        self.assertIn('all_users', grps)
-
-        grps = f.shared_groups.values_list('name', flat=True)
-        self.assertIn('all_users', grps)
-
-        grps = lf.shared_groups.values_list('name', flat=True)
-        self.assertIn('all_users', grps)
+        # the permission is inherited by the contents of the feed's folder
+        self.assertTrue(folder.has_group_permission(grp, 'w'))
+        self.assertTrue(f.has_group_permission(grp, 'w'))
+        self.assertTrue(lf.has_group_permission(grp, 'w'))
 
-        grps = pf.shared_groups.values_list('name', flat=True)
+        # and granted to the objects pointed by the link files
+        grps = pointed_folder.shared_groups.values_list('name', flat=True)
         self.assertIn('all_users', grps)
+        self.assertTrue(pf.has_group_permission(grp, 'w'))
 
         ChrisFolder.objects.get(path=f'home/{self.username}').delete()
 
@@ -252,10 +251,11 @@ class FeedUserPermissionTests(ModelTests):
 
     def test_save(self):
         """
-        Test whether overriden save method grants the user write permission to all the
-        folders, files and link files within the feed's folder. In addition, tests
-        whether the same permission is applied to all objects pointed by the linked
-        files under the feed's folder if they are owned by the feed's owner.
+        Test whether overriden save method grants the user write permission to the
+        feed's folder, which is inherited by all the folders, files and link files within
+        it. In addition, tests whether the same permission is applied to all objects
+        pointed by the linked files under the feed's folder if they are owned by the
+        feed's owner.
         """
         user = User.objects.get(username=self.username)
         other_user = User.objects.get(username=self.other_username)
@@ -291,17 +291,15 @@ class FeedUserPermissionTests(ModelTests):
         perm = FeedUserPermission(feed=feed, user=other_user)
         perm.save()
 
-        usernames = folder.shared_users.values_list('username', flat=True)
-        self.assertIn(self.other_username, usernames)
-
-        usernames = f.shared_users.values_list('username', flat=True)
-        self.assertIn(self.other_username, usernames)
-
-        usernames = lf.shared_users.values_list('username', flat=True)
-        self.assertIn(self.other_username, usernames)
+        # the permission is inherited by the contents of the feed's folder
+        self.assertTrue(folder.has_user_permission(other_user, 'w'))
+        self.assertTrue(f.has_user_permission(other_user, 'w'))
+        self.assertTrue(lf.has_user_permission(other_user, 'w'))
 
-        usernames = pf.shared_users.values_list('username', flat=True)
+        # and granted to the objects pointed by the link files
+        usernames = pointed_folder.shared_users.values_list('username', flat=True)
         self.assertIn(self.other_username, usernames)
+        self.assertTrue(pf.has_user_permission(other_user, 'w'))
 
         ChrisFolder.objects.get(path=f'home/{self.username}').delete()
 
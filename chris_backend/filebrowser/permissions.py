@@ -1,6 +1,8 @@
 
 from rest_framework import permissions
 
+from core.models import PermissionResolver
+
 
 class IsOwnerOrChrisOrCanWriteOrCanReadOnlyOrPublicReadOnly(permissions.BasePermission):
     """
@@ -18,9 +20,11 @@ class IsOwnerOrChrisOrCanWriteOrCanReadOnlyOrPublicReadOnly(permissions.BasePerm
         if request.method in permissions.SAFE_METHODS:
             if obj.public:
                 return True
-            return user.is_authenticated and obj.has_user_permission(user)
+            return (user.is_authenticated and
+                    PermissionResolver.for_request(request).has_permission(obj))
 
-        return user.is_authenticated and obj.has_user_permission(user, 'w')
+        return (user.is_authenticated and
+                PermissionResolver.for_request(request).has_permission(obj, 'w'))
 
 
 class IsOwnerOrChrisOrHasAnyPermissionReadOnly(permissions.BasePermission):
@@ -37,7 +41,7 @@ class IsOwnerOrChrisOrHasAnyPermissionReadOnly(permissions.BasePermission):
             return True
 
         return (request.method in permissions.SAFE_METHODS and
-                obj.has_user_permission(user))
+                PermissionResolver.for_request(request).has_permission(obj))
 
 
 class IsFolderOwnerOrChrisOrHasAnyFolderPermissionReadOnly(permissions.BasePermission):
@@ -54,7 +58,7 @@ class IsFolderOwnerOrChrisOrHasAnyFolderPermissionReadOnly(permissions.BasePermi
             return True
 
         return (request.method in permissions.SAFE_METHODS and
-                obj.folder.has_user_permission(user))
+                PermissionResolver.for_request(request).has_permission(obj.folder))
 
 
 class IsFileOwnerOrChrisOrHasAnyFilePermissionReadOnly(permissions.BasePermission):
@@ -71,7 +75,7 @@ class IsFileOwnerOrChrisOrHasAnyFilePermissionReadOnly(permissions.BasePermissio
             return True
 
         return (request.method in permissions.SAFE_METHODS and
-                obj.file.has_user_permission(user))
+                PermissionResolver.for_request(request).has_permission(obj.file))
 
 
 class IsLinkFileOwnerOrChrisOrHasAnyLinkFilePermissionReadOnly(permissions.BasePermission):
@@ -88,4 +92,4 @@ class IsLinkFileOwnerOrChrisOrHasAnyLinkFilePermissionReadOnly(permissions.BaseP
             return True
 
         return (request.method in permissions.SAFE_METHODS and
-                obj.link_file.has_user_permission(user))
+                PermissionResolver.for_request(request).has_permission(obj.link_file))
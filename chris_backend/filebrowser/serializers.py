@@ -24,23 +24,29 @@ class FileBrowserFolderSerializer(serializers.HyperlinkedModelSerializer):
     files = serializers.HyperlinkedIdentityField(view_name='chrisfolder-file-list')
     link_files = serializers.HyperlinkedIdentityField(
         view_name='chrisfolder-linkfile-list')
+    archive = serializers.HyperlinkedIdentityField(view_name='chrisfolder-archive')
+    manifest = serializers.HyperlinkedIdentityField(view_name='chrisfolder-manifest')
     group_permissions = serializers.HyperlinkedIdentityField(
         view_name='foldergrouppermission-list')
     user_permissions = serializers.HyperlinkedIdentityField(
         view_name='folderuserpermission-list')
     owner = serializers.HyperlinkedRelatedField(view_name='user-detail', read_only=True)
+    size = serializers.IntegerField(read_only=True)
+    file_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = ChrisFolder
         fields = ('url', 'id', 'creation_date', 'path', 'public', 'owner_username',
-                  'deletion_status', 'deletion_requested_at', 'deletion_error',
-                  'parent', 'children', 'files', 'link_files', 'group_permissions',
-                  'user_permissions', 'owner')
+                  'size', 'file_count', 'deletion_status', 'deletion_requested_at',
+                  'deletion_error', 'parent', 'children', 'files', 'link_files',
+                  'archive', 'manifest', 'group_permissions', 'user_permissions',
+                  'owner')
 
     def create(self, validated_data):
         """
         Overriden to set the parent folder. It also creates non-existent ancestors and
-        sets their permissions to be the same as the first existing ancestor.
+        sets their public status to be the same as the first existing ancestor, whose
+        permissions they inherit.
         """
         path = validated_data['path']
         parent_path = os.path.dirname(path)
@@ -66,12 +72,6 @@ class FileBrowserFolderSerializer(serializers.HyperlinkedModelSerializer):
             top_created_folder.grant_public_access()
             folder.public = True  # update object before returning it
 
-        for perm in ancestor.get_groups_permissions_queryset():
-            top_created_folder.grant_group_permission(perm.group, perm.permission)
-
-        for perm in ancestor.get_users_permissions_queryset():
-            top_created_folder.grant_user_permission(perm.user, perm.permission)
-
         if owner != ancestor.owner:
             top_created_folder.grant_user_permission(ancestor.owner, 'w')
         return folder
@@ -638,13 +638,11 @@ class FileBrowserLinkFileSerializer(ChrisFileSerializer):
         Custom method to get the hyperlink to the linked folder if the ChRIS link
         points to a folder.
         """
-        try:
-            linked_folder = ChrisFolder.objects.get(path=obj.path)
-        except ChrisFolder.DoesNotExist:
+        target = self.get_link_target(obj)
+        if target is None or target[0] != 'chrisfolder-detail':
             return None
         request = self.context['request']
-        return reverse('chrisfolder-detail', request=request,
-                       kwargs={'pk': linked_folder.pk})
+        return reverse(target[0], request=request, kwargs={'pk': target[1]})
 
     @extend_schema_field(OpenApiTypes.URI)
     def get_linked_file_link(self, obj):
@@ -652,24 +650,43 @@ class FileBrowserLinkFileSerializer(ChrisFileSerializer):
         Custom method to get the hyperlink to the linked file if the ChRIS link
         points to a file.
         """
-        try:
-            ChrisFolder.objects.get(path=obj.path)
-        except ChrisFolder.DoesNotExist:
-            parent_folder_path = os.path.dirname(obj.path)
+        target = self.get_link_target(obj)
+        if target is None or target[0] != 'chrisfile-detail':
+            return None
+        request = self.context['request']
+        return reverse(target[0], request=request, kwargs={'pk': target[1]})
 
-            try:
-                parent_folder = ChrisFolder.objects.get(path=parent_folder_path)
-            except ChrisFolder.DoesNotExist: # no parent folder then no file
-                return None
+    def get_link_target(self, obj):
+        """
+        Custom method to get the (view name, pk) tuple of the folder or file the ChRIS
+        link points to or None if it points to nothing. The targets resolved in bulk
+        by the list views are passed in the 'link_targets' context item.
+        """
+        link_targets = self.context.setdefault('link_targets', {})
+        if obj.path not in link_targets:
+            link_targets.update(self.resolve_link_targets([obj]))
+        return link_targets[obj.path]
 
-            try:
-                linked_file = parent_folder.chris_files.get(fname=obj.path)
-            except ChrisFile.DoesNotExist:  # file not found
-                return None
+    @staticmethod
+    def resolve_link_targets(link_files):
+        """
+        Resolve the folders and files pointed to by the given ChRIS links with two
+        queries. Return a dictionary mapping each pointed path to the (view name, pk)
+        tuple of its target or None if it points to nothing.
+        """
+        paths = {lf.path for lf in link_files}
+        link_targets = dict.fromkeys(paths)
+
+        for (path, pk) in ChrisFolder.objects.filter(path__in=paths).values_list(
+                'path', 'pk'):
+            link_targets[path] = ('chrisfolder-detail', pk)
 
-            request = self.context['request']
-            return reverse('chrisfile-detail', request=request,
-                           kwargs={'pk': linked_file.pk})
+        paths = [path for path in paths if link_targets[path] is None]
+        if paths:
+            for (path, pk) in ChrisFile.objects.filter(fname__in=paths).values_list(
+                    'fname', 'pk'):
+                link_targets[path] = ('chrisfile-detail', pk)
+        return link_targets
 
     def validate_new_link_file_path(self, new_link_file_path):
         """
@@ -1,8 +1,23 @@
 
 
+import itertools
+import json
+import os
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Cast
+
+from core.models import (ChrisFolder, FolderUserPermission, FolderGroupPermission,
+                         ChrisFile, FileUserPermission, FileGroupPermission,
+                         ChrisLinkFile, LinkFileUserPermission, LinkFileGroupPermission,
+                         user_can_access_obj)
+from core.storage.streams import ArchiveEntry
 
-from core.models import ChrisFolder, user_can_access_obj
+
+# number of rows fetched at a time when iterating over a folder's tree
+TREE_ITERATOR_CHUNK_SIZE = 2000
 
 
 def get_folder_queryset(pk_dict, user=None):
@@ -23,6 +38,22 @@ def get_folder_queryset(pk_dict, user=None):
     return qs
 
 
+def get_visibility_lookup(user, user_perm_model, group_perm_model, obj_field):
+    """
+    Convenience function to get the lookup matching the objects a user owns or that
+    are public or shared with the user or any of their groups. The shares are matched
+    with correlated EXISTS subqueries on the permission tables rather than joins so
+    that no rows are multiplied and no DISTINCT is needed.
+    """
+    lookup = models.Q(owner=user) | models.Q(public=True) | models.Exists(
+        user_perm_model.objects.filter(user=user, **{obj_field: models.OuterRef('pk')}))
+
+    group_ids = list(user.groups.values_list('id', flat=True))
+    if group_ids:
+        lookup |= models.Exists(group_perm_model.objects.filter(
+            group_id__in=group_ids, **{obj_field: models.OuterRef('pk')}))
+    return lookup
+
 
 def get_folder_children_queryset(folder, user=None):
     """
@@ -31,12 +62,12 @@ def get_folder_children_queryset(folder, user=None):
     if user is None:
         return folder.children.filter(public=True)
 
-    if user.username == 'chris':
+    if user.username == 'chris' or folder.has_user_permission(user, contents=True):
         return folder.children.all()
 
-    lookup = models.Q(owner=user) | models.Q(public=True) | models.Q(
-        shared_users=user) | models.Q(shared_groups__in=user.groups.all())
-    return folder.children.filter(lookup).distinct()
+    lookup = get_visibility_lookup(user, FolderUserPermission, FolderGroupPermission,
+                                   'folder')
+    return folder.children.filter(lookup)
 
 
 def get_folder_files_queryset(folder, user=None):
@@ -46,12 +77,11 @@ def get_folder_files_queryset(folder, user=None):
     if user is None:
         return folder.chris_files.filter(public=True)
 
-    if user.username == 'chris':
+    if user.username == 'chris' or folder.has_user_permission(user, contents=True):
         return folder.chris_files.all()
 
-    lookup = models.Q(owner=user) | models.Q(public=True) | models.Q(
-        shared_users=user) | models.Q(shared_groups__in=user.groups.all())
-    return folder.chris_files.filter(lookup).distinct()
+    lookup = get_visibility_lookup(user, FileUserPermission, FileGroupPermission, 'file')
+    return folder.chris_files.filter(lookup)
 
 
 def get_folder_link_files_queryset(folder, user=None):
@@ -61,9 +91,124 @@ def get_folder_link_files_queryset(folder, user=None):
     if user is None:
         return folder.chris_link_files.filter(public=True)
 
-    if user.username == 'chris':
+    if user.username == 'chris' or folder.has_user_permission(user, contents=True):
         return folder.chris_link_files.all()
 
-    lookup = models.Q(owner=user) | models.Q(public=True) | models.Q(
-        shared_users=user) | models.Q(shared_groups__in=user.groups.all())
-    return folder.chris_link_files.filter(lookup).distinct()
+    lookup = get_visibility_lookup(user, LinkFileUserPermission,
+                                   LinkFileGroupPermission, 'link_file')
+    return folder.chris_link_files.filter(lookup)
+
+
+def get_path_search_queryset(query, user=None):
+    """
+    Convenience function to get the queryset of the files whose path contains the
+    query string (case insensitive) that a user can access, ranked by the trigram
+    similarity of their path to the query string. The substring match is served by
+    the trigram index on the files' paths. The similarity (a float4) is cast to a
+    numeric so that the rank stored in the pagination cursors compares back exactly.
+    """
+    qs = ChrisFile.objects.filter(fname__ilike_contains=query)
+
+    if user is None:
+        qs = qs.filter(public=True)
+    elif user.username != 'chris':
+        lookup = get_visibility_lookup(user, FileUserPermission, FileGroupPermission,
+                                       'file')
+        folder_ids = get_contents_permission_folder_ids(user)
+        if folder_ids:
+            lookup |= models.Q(parent_folder_id__in=folder_ids) | models.Q(
+                parent_folder__ancestors__overlap=folder_ids)
+        qs = qs.filter(lookup)
+    rank = Cast(TrigramSimilarity('fname', query),
+                models.DecimalField(max_digits=7, decimal_places=6))
+    return qs.annotate(rank=rank).order_by('-rank', 'id')
+
+
+def get_contents_permission_folder_ids(user):
+    """
+    Convenience function to get the ids of the folders shared with a user or any of
+    their groups whose permissions are inherited by the folders' contents (that is all
+    of them but the root folder and the top-level folders).
+    """
+    lookup = models.Exists(FolderUserPermission.objects.filter(
+        user=user, folder=models.OuterRef('pk')))
+
+    group_ids = list(user.groups.values_list('id', flat=True))
+    if group_ids:
+        lookup |= models.Exists(FolderGroupPermission.objects.filter(
+            group_id__in=group_ids, folder=models.OuterRef('pk')))
+    return list(ChrisFolder.objects.filter(lookup, ancestors__len__gte=2).values_list(
+        'id', flat=True))
+
+
+def iter_folder_tree(folder, user, resolver, include_folders=True):
+    """
+    Convenience function to iterate over the folders (starting with the folder
+    itself), files and link files within a folder's tree that a user can access, in
+    that order and sorted by path. Rows are fetched in chunks from server-side cursors
+    and the permissions are resolved by the passed ``PermissionResolver`` for a whole
+    chunk at a time, so the number of queries per chunk and the memory used don't
+    grow with the size of the tree.
+    """
+    querysets = [
+        ChrisFile.objects.only('fname', 'fsize', 'etag', 'creation_date', 'public',
+                               'owner', 'parent_folder__ancestors'),
+        ChrisLinkFile.objects.only('path', 'fname', 'fsize', 'etag', 'creation_date',
+                                   'public', 'owner', 'parent_folder__ancestors'),
+    ]
+    querysets = [qs.filter(folder.get_tree_lookup()).select_related(
+        'parent_folder').order_by('fname') for qs in querysets]
+    if include_folders:
+        querysets.insert(0, folder.get_tree_queryset().order_by('path'))
+
+    for qs in querysets:
+        objs = qs.iterator(chunk_size=TREE_ITERATOR_CHUNK_SIZE)
+        while chunk := list(itertools.islice(objs, TREE_ITERATOR_CHUNK_SIZE)):
+            resolver.prefetch(chunk)
+            for obj in chunk:
+                if user_can_access_obj(obj, user, resolver):
+                    yield obj
+
+
+def iter_archive_entries(user, resolver, folders=(), files=()):
+    """
+    Convenience function to lazily generate the archive entries for the given
+    folders' files and link files (recursively) and the given files or link files.
+    Files within the folders the user can't access are left out. Entries are named
+    after their path relative to the folders' parent. The folders' trees are only
+    read (in chunks, see ``iter_folder_tree``) while the archive is being streamed,
+    so the caller must check access to the given folders and files beforehand.
+    """
+    for folder in folders:
+        base_path = os.path.dirname(folder.path)
+        for f in iter_folder_tree(folder, user, resolver, include_folders=False):
+            name = f.fname.name
+            if base_path:
+                name = os.path.relpath(name, base_path)
+            yield ArchiveEntry(name, f.fname.name, f.fsize, f.creation_date)
+
+    for f in files:
+        yield ArchiveEntry(os.path.basename(f.fname.name), f.fname.name, f.fsize,
+                           f.creation_date)
+
+
+def iter_folder_manifest(folder, user, resolver):
+    """
+    Convenience function to generate the manifest of a folder's tree as
+    newline-delimited JSON, one line per folder, file and link file the user can
+    access (see ``iter_folder_tree``).
+    """
+    for obj in iter_folder_tree(folder, user, resolver):
+        if isinstance(obj, ChrisFolder):
+            item = {'type': 'folder', 'id': obj.id, 'path': obj.path,
+                    'size': obj.size, 'file_count': obj.file_count,
+                    'creation_date': obj.creation_date}
+        elif isinstance(obj, ChrisLinkFile):
+            item = {'type': 'link_file', 'id': obj.id, 'path': obj.fname.name,
+                    'size': obj.fsize, 'etag': obj.etag,
+                    'creation_date': obj.creation_date, 'linked_path': obj.path}
+        else:
+            item = {'type': 'file', 'id': obj.id, 'path': obj.fname.name,
+                    'size': obj.fsize, 'etag': obj.etag,
+                    'creation_date': obj.creation_date}
+        yield json.dumps(item, cls=DjangoJSONEncoder) + '\n'
@@ -16,7 +16,7 @@ def delete_folder(self, folder_id):
         if not folder.is_pending_deletion():
             return # idempotent safety
 
-        folder.delete()
+        folder.delete_tree()
     except ChrisFolder.DoesNotExist:
         pass
     except Exception as e:
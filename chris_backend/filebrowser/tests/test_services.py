@@ -241,6 +241,24 @@ class ServiceTests(TestCase):
         self.assertIn(f'{path}/feeds', paths)
         folder.remove_group_permission(other_user_group, 'r')
 
+    def test_get_folder_children_queryset_from_user_shared_children_other_user(self):
+        """
+        Test whether the services.get_folder_children_queryset function
+        allows a user to see only the child folders of other user's existing folders
+        shared with them, once even if they are shared in several ways.
+        """
+        other_user = User.objects.get(username=self.other_username)
+        other_user_group = other_user.groups.first()
+        path = f'home/{self.username}'
+        folder = ChrisFolder.objects.get(path=path)
+        uploads = ChrisFolder.objects.get(path=f'{path}/uploads')
+        uploads.grant_user_permission(other_user, 'r')
+        uploads.grant_group_permission(other_user_group, 'r')
+        qs = services.get_folder_children_queryset(folder, other_user)
+        self.assertEqual([f.path for f in qs.all()], [f'{path}/uploads'])
+        uploads.remove_user_permission(other_user, 'r')
+        uploads.remove_group_permission(other_user_group, 'r')
+
     def test_get_folder_children_queryset_top_level_folders(self):
         """
         Test whether the services.get_folder_children_queryset function returns the
@@ -3,10 +3,14 @@ import logging
 import io
 import os
 import json
+import tarfile
 import time
+import zipfile
 from unittest import mock
 
 from django.test import TestCase,TransactionTestCase, tag
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.conf import settings
 from django.contrib.auth.models import User, Group
 from django.urls import reverse
@@ -20,6 +24,7 @@ from core.models import (ChrisFolder, ChrisFile, ChrisLinkFile, FolderGroupPermi
                          FolderUserPermission, FileGroupPermission, FileUserPermission,
                          LinkFileGroupPermission, LinkFileUserPermission)
 from core.storage import connect_storage
+from core.tasks import delete_storage_garbage
 from users.models import UserProxy
 from userfiles.models import UserFile
 from plugins.models import PluginMeta, Plugin, ComputeResource
@@ -931,9 +936,12 @@ class FileBrowserFolderGroupPermissionListViewTests(FileBrowserViewTests):
         folder = ChrisFolder.objects.get(path=self.path)
 
         self.assertIn(self.grp_name, [g.name for g in folder.shared_groups.all()])
-        self.assertIn(self.grp_name, [g.name for g in inner_folder.shared_groups.all()])
-        self.assertIn(self.grp_name, [g.name for g in f.shared_groups.all()])
-        self.assertIn(self.grp_name, [g.name for g in lf.shared_groups.all()])
+
+        # the permission is inherited by the folder's contents
+        grp = Group.objects.get(name=self.grp_name)
+        self.assertTrue(inner_folder.has_group_permission(grp, 'r'))
+        self.assertTrue(f.has_group_permission(grp, 'r'))
+        self.assertTrue(lf.has_group_permission(grp, 'r'))
 
         folder.remove_shared_link()
 
@@ -1125,9 +1133,9 @@ class FileBrowserFolderGroupPermissionDetailViewTests(FileBrowserViewTests):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["permission"], 'w')
 
-        self.assertEqual(FileGroupPermission.objects.get(file=f).permission, 'w')
-        self.assertEqual(LinkFileGroupPermission.objects.get(link_file=lf).permission,
-                         'w')
+        grp = Group.objects.get(name=self.grp_name)
+        self.assertTrue(f.has_group_permission(grp, 'w'))
+        self.assertTrue(lf.has_group_permission(grp, 'w'))
 
     def test_filebrowserfoldergrouppermission_update_failure_unauthenticated(self):
         response = self.client.put(self.read_update_delete_url, data=self.put,
@@ -1224,9 +1232,12 @@ class FileBrowserFolderUserPermissionListViewTests(FileBrowserViewTests):
         folder = ChrisFolder.objects.get(path=self.path)
 
         self.assertIn(self.other_username, [u.username for u in folder.shared_users.all()])
-        self.assertIn(self.other_username, [u.username for u in inner_folder.shared_users.all()])
-        self.assertIn(self.other_username, [u.username for u in f.shared_users.all()])
-        self.assertIn(self.other_username, [u.username for u in lf.shared_users.all()])
+
+        # the permission is inherited by the folder's contents
+        other_user = User.objects.get(username=self.other_username)
+        self.assertTrue(inner_folder.has_user_permission(other_user, 'r'))
+        self.assertTrue(f.has_user_permission(other_user, 'r'))
+        self.assertTrue(lf.has_user_permission(other_user, 'r'))
 
         folder.remove_shared_link()
 
@@ -1404,9 +1415,9 @@ class FileBrowserFolderUserPermissionDetailViewTests(FileBrowserViewTests):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["permission"], 'w')
 
-        self.assertEqual(FileUserPermission.objects.get(file=f).permission, 'w')
-        self.assertEqual(LinkFileUserPermission.objects.get(link_file=lf).permission,
-                         'w')
+        other_user = User.objects.get(username=self.other_username)
+        self.assertTrue(f.has_user_permission(other_user, 'w'))
+        self.assertTrue(lf.has_user_permission(other_user, 'w'))
 
     def test_filebrowserfolderuserpermission_update_failure_unauthenticated(self):
         response = self.client.put(self.read_update_delete_url, data=self.put,
@@ -1850,6 +1861,85 @@ class FileBrowserFileResourceViewTests(FileBrowserViewTests):
         content = [c for c in response.streaming_content][0].decode('utf-8')
         self.assertEqual(content, "test file")
 
+    def test_fileBrowserfile_resource_range_success(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.download_url, HTTP_RANGE='bytes=5-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'file')
+        self.assertEqual(response['Content-Range'], 'bytes 5-8/9')
+        self.assertEqual(response['Content-Length'], '4')
+
+        response = self.client.get(self.download_url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'file')
+
+        response = self.client.get(self.download_url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'test')
+        self.assertEqual(response['Content-Range'], 'bytes 0-3/9')
+
+    def test_fileBrowserfile_resource_range_failure_unsatisfiable(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.download_url, HTTP_RANGE='bytes=9-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */9')
+
+    def test_fileBrowserfile_resource_conditional_get(self):
+        self.file.etag = 'abc123'
+        self.file.save()
+        self.client.login(username=self.username, password=self.password)
+
+        response = self.client.get(self.download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"abc123"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(self.download_url, HTTP_IF_NONE_MATCH='"abc123"')
+        self.assertEqual(response.status_code, 304)
+
+        # a stale If-Range validator gets the whole file
+        response = self.client.get(self.download_url, HTTP_RANGE='bytes=0-3',
+                                   HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'test file')
+
+        response = self.client.get(self.download_url, HTTP_RANGE='bytes=0-3',
+                                   HTTP_IF_RANGE='"abc123"')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'test')
+
+    def test_fileBrowserfile_resource_download_offloaded_to_proxy(self):
+        self.client.login(username=self.username, password=self.password)
+
+        with self.settings(FILE_DOWNLOAD_MODE='accel',
+                           FILE_DOWNLOAD_ACCEL_PREFIX='/protected/'):
+            response = self.client.get(self.download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{self.upload_path}')
+        self.assertEqual(response.content, b'')
+
+        with self.settings(FILE_DOWNLOAD_MODE='sendfile'):
+            response = self.client.get(self.download_url)
+        self.assertEqual(response['X-Sendfile'],
+                         os.path.join(settings.MEDIA_ROOT, self.upload_path))
+
+    def test_fileBrowserfile_resource_download_redirect(self):
+        self.client.login(username=self.username, password=self.password)
+
+        with self.settings(FILE_DOWNLOAD_MODE='redirect'):
+            with mock.patch('core.views.connect_storage') as connect_storage_mock:
+                connect_storage_mock.return_value.get_download_url.return_value = (
+                    'https://storage/presigned')
+                response = self.client.get(self.download_url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://storage/presigned')
+
+        # the filesystem storage has no download URLs, the file is streamed
+        with self.settings(FILE_DOWNLOAD_MODE='redirect'):
+            response = self.client.get(self.download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'test file')
+
     def test_fileBrowserfile_resource_failure_access_denied(self):
         self.client.login(username=self.other_username, password=self.other_password)
         response = self.client.get(self.download_url)
@@ -1921,6 +2011,169 @@ class FileBrowserFileResourceViewTests(FileBrowserViewTests):
 
 
 
+class FileBrowserArchiveViewTests(FileBrowserViewTests):
+    """
+    Test the 'chrisfolder-archive' and 'chrisfolder-archive-selection' views.
+    """
+
+    def setUp(self):
+        super(FileBrowserArchiveViewTests, self).setUp()
+
+        self.storage_manager = connect_storage(settings)
+        user = User.objects.get(username=self.username)
+
+        self.folder_path = f'home/{self.username}/uploads/archive'
+        self.contents = {f'{self.folder_path}/a.txt': 'file a',
+                         f'{self.folder_path}/sub/b.txt': 'file b'}
+        self.files = []
+        for (path, data) in self.contents.items():
+            self.storage_manager.upload_obj(path, data, content_type='text/plain')
+            (parent_folder, _) = ChrisFolder.objects.get_or_create(
+                path=os.path.dirname(path), owner=user)
+            f = UserFile(owner=user, parent_folder=parent_folder)
+            f.fname.name = path
+            f.save()
+            self.files.append(f)
+
+        self.folder = ChrisFolder.objects.get(path=self.folder_path)
+        self.archive_url = reverse('chrisfolder-archive', kwargs={'pk': self.folder.id})
+        self.selection_url = reverse('chrisfolder-archive-selection')
+
+    def tearDown(self):
+        for f in self.files:
+            f.delete()
+        self.folder.delete()
+        delete_storage_garbage()
+        super(FileBrowserArchiveViewTests, self).tearDown()
+
+    def test_folder_archive_success_zip(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.archive_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('archive.zip', response['Content-Disposition'])
+        content = b''.join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(content)) as zf:
+            self.assertEqual(zf.namelist(), ['archive/a.txt', 'archive/sub/b.txt'])
+            self.assertEqual(zf.read('archive/a.txt'), b'file a')
+            self.assertEqual(zf.read('archive/sub/b.txt'), b'file b')
+
+    def test_folder_archive_success_tar(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.archive_url + '?archive_format=tar')
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        with tarfile.open(fileobj=io.BytesIO(content)) as tf:
+            self.assertEqual(tf.extractfile('archive/sub/b.txt').read(), b'file b')
+
+    def test_folder_archive_failure_invalid_archive_format(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.archive_url + '?archive_format=rar')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_folder_archive_failure_access_denied_other_user(self):
+        self.client.login(username=self.other_username, password=self.other_password)
+        response = self.client.get(self.archive_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_folder_archive_leaves_out_inaccessible_files(self):
+        other_user = User.objects.get(username=self.other_username)
+        self.files[1].grant_user_permission(other_user, 'r')
+        self.client.login(username=self.other_username, password=self.other_password)
+        response = self.client.get(self.selection_url,
+                                   {'path': [self.folder_path, self.files[1].fname.name]})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.folder.grant_public_access()
+        self.files[0].remove_public_access()
+        response = self.client.get(self.selection_url,
+                                   {'path': [self.folder_path, self.files[1].fname.name]})
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(content)) as zf:
+            self.assertEqual(zf.namelist(), ['archive/sub/b.txt', 'b.txt'])
+
+    def test_archive_selection_success(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.selection_url,
+                                   {'path': [f.fname.name for f in self.files]})
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(content)) as zf:
+            self.assertEqual(sorted(zf.namelist()), ['a.txt', 'b.txt'])
+
+    def test_archive_selection_failure_path_not_found(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.selection_url,
+                                   {'path': [f'{self.folder_path}/missing.txt']})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FileBrowserFolderManifestViewTests(FileBrowserViewTests):
+    """
+    Test the 'chrisfolder-manifest' view.
+    """
+
+    def setUp(self):
+        super(FileBrowserFolderManifestViewTests, self).setUp()
+
+        user = User.objects.get(username=self.username)
+        self.folder_path = f'home/{self.username}/uploads/manifest'
+        (sub_folder, _) = ChrisFolder.objects.get_or_create(
+            path=f'{self.folder_path}/sub', owner=user)
+        self.folder = sub_folder.parent
+
+        self.file = UserFile(owner=user, parent_folder=sub_folder, fsize=6)
+        self.file.fname.name = f'{self.folder_path}/sub/a.txt'
+        self.file.save()
+
+        self.link_file = ChrisLinkFile(path='SERVICES/PACS', owner=user,
+                                       parent_folder=self.folder)
+        self.link_file.save(name='SERVICES_PACS')
+
+        self.manifest_url = reverse('chrisfolder-manifest',
+                                    kwargs={'pk': self.folder.id})
+
+    def tearDown(self):
+        self.file.delete()
+        self.link_file.delete()
+        self.folder.delete()
+        delete_storage_garbage()
+        super(FileBrowserFolderManifestViewTests, self).tearDown()
+
+    def _get_manifest(self):
+        response = self.client.get(self.manifest_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        content = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_folder_manifest_success(self):
+        self.client.login(username=self.username, password=self.password)
+        items = self._get_manifest()
+        self.assertEqual([(item['type'], item['path']) for item in items],
+                         [('folder', self.folder_path),
+                          ('folder', f'{self.folder_path}/sub'),
+                          ('file', f'{self.folder_path}/sub/a.txt'),
+                          ('link_file', f'{self.folder_path}/SERVICES_PACS.chrislink')])
+        self.assertEqual(items[2]['size'], 6)
+        self.assertEqual(items[3]['linked_path'], 'SERVICES/PACS')
+        self.assertIn('creation_date', items[0])
+
+    def test_folder_manifest_leaves_out_inaccessible_objects(self):
+        self.folder.grant_public_access()
+        self.file.remove_public_access()
+        self.folder.children.first().remove_public_access()
+        self.client.login(username=self.other_username, password=self.other_password)
+        items = self._get_manifest()
+        self.assertEqual([item['type'] for item in items], ['folder', 'link_file'])
+
+    def test_folder_manifest_failure_access_denied_other_user(self):
+        self.client.login(username=self.other_username, password=self.other_password)
+        response = self.client.get(self.manifest_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
 class FileBrowserFileGroupPermissionListViewTests(FileBrowserViewTests):
     """
     Test the 'filegrouppermission-list' view.
@@ -2494,6 +2747,32 @@ class FileBrowserFolderLinkFileListViewTests(FileBrowserViewTests):
         self.assertContains(response, 'file_resource')
         self.assertContains(response, self.link_path)
 
+    def test_filebrowserfolderlinkfile_list_resolves_link_targets_in_bulk(self):
+        user = User.objects.get(username=self.username)
+        self.client.login(username=self.username, password=self.password)
+        linked_folder = ChrisFolder.objects.get(path='SERVICES/PACS')
+
+        link_files = []
+        for i in range(4):
+            link_file = ChrisLinkFile(path=f'SERVICES/PACS/missing{i}', owner=user,
+                                      parent_folder=self.link_file.parent_folder)
+            link_file.save(name=f'missing{i}')
+            link_files.append(link_file)
+
+            if i == 0:  # one link file to a folder and one to a missing path
+                with CaptureQueriesContext(connection) as few_links_queries:
+                    response = self.client.get(self.read_url)
+                self.assertContains(response, reverse('chrisfolder-detail',
+                                                      kwargs={'pk': linked_folder.id}))
+
+        with CaptureQueriesContext(connection) as many_links_queries:
+            response = self.client.get(self.read_url)
+        self.assertContains(response, 'missing3.chrislink')
+        self.assertEqual(len(many_links_queries), len(few_links_queries))
+
+        for link_file in link_files:
+            link_file.delete()
+
     def test_filebrowserfolderlinkfile_list_success_public_feed_unauthenticated(self):
         user = User.objects.get(username=self.username)
 
@@ -2769,6 +3048,7 @@ class FileBrowserLinkFileDetailViewTests(FileBrowserViewTests):
         self.client.login(username=self.username, password=self.password)
         response = self.client.delete(read_update_delete_url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        delete_storage_garbage()
         self.assertFalse(self.storage_manager.obj_exists(lf_path))
 
     def test_filebrowserlinkfile_delete_failure_unauthenticated(self):
@@ -2902,3 +3182,85 @@ class FileBrowserLinkFileResourceViewTests(FileBrowserViewTests):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
         link_file.delete()
+
+
+class FileBrowserFilePathSearchViewTests(FileBrowserViewTests):
+    """
+    Test the 'chrisfile-path-search' view.
+    """
+
+    def setUp(self):
+        super(FileBrowserFilePathSearchViewTests, self).setUp()
+
+        user = User.objects.get(username=self.username)
+        (self.folder, _) = ChrisFolder.objects.get_or_create(
+            path=f'home/{self.username}/uploads/pathsearch', owner=user)
+
+        storage_manager = connect_storage(settings)
+        self.files = []
+        for fname in ('brain_scan.dcm', 'Brain_Mask.nii', 'notes.txt'):
+            path = f'{self.folder.path}/{fname}'
+            storage_manager.upload_obj(path, 'test file', content_type='text/plain')
+            user_file = UserFile(owner=user, parent_folder=self.folder)
+            user_file.fname.name = path
+            user_file.save()
+            self.files.append(user_file)
+
+        self.search_url = reverse('chrisfile-path-search') + '?q=brain'
+
+    def tearDown(self):
+        for user_file in self.files:
+            user_file.delete()
+        self.folder.delete()
+        delete_storage_garbage()
+        super(FileBrowserFilePathSearchViewTests, self).tearDown()
+
+    def test_file_path_search_success(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.search_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual({f['fname'] for f in response.data['results']},
+                         {f.fname.name for f in self.files[:2]})
+        self.assertNotIn('count', response.data)
+
+    def test_file_path_search_pages_through_tied_ranks_without_duplicates(self):
+        user = User.objects.get(username=self.username)
+        storage_manager = connect_storage(settings)
+        for fname in ('brain_a.txt', 'brain_b.txt', 'brain_c.txt', 'brain_d.txt'):
+            path = f'{self.folder.path}/{fname}'
+            storage_manager.upload_obj(path, 'test file', content_type='text/plain')
+            user_file = UserFile(owner=user, parent_folder=self.folder)
+            user_file.fname.name = path
+            user_file.save()
+            self.files.append(user_file)
+
+        self.client.login(username=self.username, password=self.password)
+        fnames = []
+        url = self.search_url + '&limit=2'
+        while url and len(fnames) <= len(self.files):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            fnames.extend(f['fname'] for f in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(fnames), 6)
+        self.assertEqual(len(set(fnames)), 6)
+
+    def test_file_path_search_success_shared_folder(self):
+        other_user = User.objects.get(username=self.other_username)
+        self.folder.grant_user_permission(other_user, 'r')
+        self.client.login(username=self.other_username, password=self.other_password)
+        response = self.client.get(self.search_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_file_path_search_leaves_out_inaccessible_files(self):
+        self.client.login(username=self.other_username, password=self.other_password)
+        response = self.client.get(self.search_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_file_path_search_failure_query_too_short(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(reverse('chrisfile-path-search') + '?q=br')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
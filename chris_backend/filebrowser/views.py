@@ -1,8 +1,8 @@
 
 import logging
-from pathlib import Path
+import os
 
-from django.http import Http404, FileResponse
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, serializers, status
 from rest_framework.response import Response
@@ -10,15 +10,18 @@ from rest_framework.reverse import reverse
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiTypes
 
-from core.models import (ChrisFolder, FolderGroupPermission,
+from core.models import (PermissionResolver, ChrisFolder, FolderGroupPermission,
                          FolderGroupPermissionFilter, FolderUserPermission,
                          FolderUserPermissionFilter, ChrisFile, FileGroupPermission,
                          FileGroupPermissionFilter, FileUserPermission,
                          FileUserPermissionFilter, ChrisLinkFile,
                          LinkFileGroupPermission, LinkFileGroupPermissionFilter,
-                         LinkFileUserPermission, LinkFileUserPermissionFilter)
+                         LinkFileUserPermission, LinkFileUserPermissionFilter,
+                         user_can_access_obj)
 from core.renderers import BinaryFileRenderer
-from core.views import TokenAuthSupportQueryString
+from core.views import TokenAuthSupportQueryString, archive_response, file_response
+from core.pagination import KeysetPagination
+from core.storage.streams import ARCHIVE_FORMATS
 from collectionjson import services
 
 from .serializers import (FileBrowserFolderSerializer,
@@ -34,7 +37,10 @@ from .tasks import delete_folder
 from .services import (get_folder_queryset,
                        get_folder_children_queryset,
                        get_folder_files_queryset,
-                       get_folder_link_files_queryset)
+                       get_folder_link_files_queryset,
+                       iter_archive_entries,
+                       get_path_search_queryset,
+                       iter_folder_manifest)
 from .permissions import (IsOwnerOrChrisOrCanWriteOrCanReadOnlyOrPublicReadOnly,
                           IsOwnerOrChrisOrHasAnyPermissionReadOnly,
                           IsFolderOwnerOrChrisOrHasAnyFolderPermissionReadOnly,
@@ -62,7 +68,8 @@ class FileBrowserFolderList(generics.ListCreateAPIView):
 
     def list(self, request, *args, **kwargs):
         """
-        Overriden to append a query list and a collection+json template to the response.
+        Overriden to append a query list, document-level link relations and a
+        collection+json template to the response.
         """
         response = super(FileBrowserFolderList, self).list(request, *args, **kwargs)
         # append query list
@@ -71,6 +78,10 @@ class FileBrowserFolderList(generics.ListCreateAPIView):
         queries = [{'href': query_url, 'rel': 'search', 'data': data}]
         response.data['queries'] = queries
 
+        # append document-level link relations
+        links = {'archive': reverse('chrisfolder-archive-selection', request=request)}
+        response = services.append_collection_links(response, links)
+
         # append write template
         template_data = {'path': ''}
         return services.append_collection_template(response, template_data)
@@ -165,6 +176,115 @@ class FileBrowserFolderDetail(generics.RetrieveUpdateDestroyAPIView):
         return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
 
+class FileBrowserFolderArchive(generics.GenericAPIView):
+    """
+    A view to download all the files within a folder (recursively) as a single zip or
+    tar archive.
+    """
+    http_method_names = ['get']
+    queryset = ChrisFolder.objects.all()
+    renderer_classes = (BinaryFileRenderer,)
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,
+                          IsOwnerOrChrisOrCanWriteOrCanReadOnlyOrPublicReadOnly)
+    authentication_classes = (TokenAuthSupportQueryString, BasicAuthentication,
+                              SessionAuthentication)
+
+    @extend_schema(responses=OpenApiResponse(OpenApiTypes.BINARY))
+    def get(self, request, *args, **kwargs):
+        """
+        Overriden to stream an archive of the folder's files that the user can access.
+        """
+        folder = self.get_object()
+        archive_format = get_archive_format(request)
+        entries = iter_archive_entries(request.user,
+                                       PermissionResolver.for_request(request),
+                                       folders=[folder])
+        filename = os.path.basename(folder.path) or 'root'
+        return archive_response(entries, filename, archive_format)
+
+
+class FileBrowserFolderManifest(generics.GenericAPIView):
+    """
+    A view to get the manifest of all the folders, files and link files within a
+    folder (recursively) in a single response.
+    """
+    http_method_names = ['get']
+    queryset = ChrisFolder.objects.all()
+    renderer_classes = (BinaryFileRenderer,)
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,
+                          IsOwnerOrChrisOrCanWriteOrCanReadOnlyOrPublicReadOnly)
+    authentication_classes = (TokenAuthSupportQueryString, BasicAuthentication,
+                              SessionAuthentication)
+
+    @extend_schema(responses=OpenApiResponse(OpenApiTypes.BINARY))
+    def get(self, request, *args, **kwargs):
+        """
+        Overriden to stream the manifest as newline-delimited JSON, one line with the
+        path, type, size and creation date of each object the user can access.
+        """
+        folder = self.get_object()
+        lines = iter_folder_manifest(folder, request.user,
+                                     PermissionResolver.for_request(request))
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
+class FileBrowserArchive(generics.GenericAPIView):
+    """
+    A view to download a selection of folders, files and link files given by their
+    paths in the 'path' query parameter (which can be repeated) as a single zip or tar
+    archive.
+    """
+    http_method_names = ['get']
+    renderer_classes = (BinaryFileRenderer,)
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    authentication_classes = (TokenAuthSupportQueryString, BasicAuthentication,
+                              SessionAuthentication)
+
+    @extend_schema(responses=OpenApiResponse(OpenApiTypes.BINARY))
+    def get(self, request, *args, **kwargs):
+        """
+        Overriden to stream an archive of the selected paths. All the paths must exist
+        and be accessible by the user.
+        """
+        paths = {p.strip().strip('/') for p in request.query_params.getlist('path')}
+        if not paths:
+            raise serializers.ValidationError(
+                {'path': ["At least one path query parameter is required."]})
+        archive_format = get_archive_format(request)
+
+        folders = list(ChrisFolder.objects.filter(path__in=paths))
+        files = list(ChrisFile.objects.filter(fname__in=paths).select_related(
+            'parent_folder'))
+        files.extend(ChrisLinkFile.objects.filter(fname__in=paths).select_related(
+            'parent_folder'))
+
+        resolver = PermissionResolver.for_request(request)
+        resolver.prefetch(folders + files)
+        user = request.user
+        found_paths = {folder.path for folder in folders
+                       if user_can_access_obj(folder, user, resolver)}
+        found_paths.update(f.fname.name for f in files
+                           if user_can_access_obj(f, user, resolver))
+        if found_paths != paths:
+            raise Http404(f"Paths not found: {sorted(paths - found_paths)}")
+
+        entries = iter_archive_entries(user, resolver, folders=folders, files=files)
+        return archive_response(entries, 'archive', archive_format)
+
+
+def get_archive_format(request):
+    """
+    Convenience function to get the archive format requested in the 'archive_format'
+    query parameter of a request.
+    """
+    archive_format = request.query_params.get('archive_format', 'zip')
+    if archive_format not in ARCHIVE_FORMATS:
+        raise serializers.ValidationError(
+            {'archive_format': [f"Invalid archive format '{archive_format}'. Allowed "
+                                f"values are: {list(ARCHIVE_FORMATS)}."]})
+    return archive_format
+
+
 class FileBrowserFolderChildList(generics.ListAPIView):
     """
     A view for the collection of folders that are the children of this folder.
@@ -437,6 +557,30 @@ class FileBrowserFolderFileList(generics.ListAPIView):
         return services.append_collection_links(response, links)
 
 
+class FileBrowserFilePathSearch(generics.ListAPIView):
+    """
+    A view for the collection of files whose path contains the string in the 'q'
+    query parameter (case insensitive), most similar paths first.
+    """
+    http_method_names = ['get']
+    serializer_class = FileBrowserFileSerializer
+    pagination_class = KeysetPagination
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+
+    def get_queryset(self):
+        """
+        Overriden to return the files matching the query that the user can access.
+        """
+        if getattr(self, "swagger_fake_view", False):
+            return ChrisFile.objects.none()
+        query = self.request.query_params.get('q', '').strip()
+        if len(query) < 3:
+            raise serializers.ValidationError(
+                {'q': ["A query string of at least 3 characters is required."]})
+        user = self.request.user
+        return get_path_search_queryset(query, user if user.is_authenticated else None)
+
+
 class FileBrowserFileDetail(generics.RetrieveUpdateDestroyAPIView):
     """
     A ChRIS file view.
@@ -474,10 +618,7 @@ class FileBrowserFileResource(generics.GenericAPIView):
         Overriden to be able to make a GET request to an actual file resource.
         """
         chris_file = self.get_object()
-        f = chris_file.fname
-        resp = FileResponse(f)
-        resp['Content-Disposition'] = f'attachment; filename="{Path(f.name).name}"'
-        return resp
+        return file_response(request, chris_file)
 
 
 class FileBrowserFileGroupPermissionList(generics.ListCreateAPIView):
@@ -715,12 +856,24 @@ class FileBrowserFolderLinkFileList(generics.ListAPIView):
         else:
             link_files_qs = get_folder_link_files_queryset(folder)
 
+        link_files_qs = link_files_qs.select_related('owner')
         response = services.get_list_response(self, link_files_qs)
 
         links = {'folder': reverse('chrisfolder-detail', request=request,
                                    kwargs={"pk": folder.id})}
         return services.append_collection_links(response, links)
 
+    def get_serializer(self, *args, **kwargs):
+        """
+        Overriden to resolve the targets of all the link files in the page at once
+        before serializing them.
+        """
+        if kwargs.get('many') and args:
+            context = self.get_serializer_context()
+            context['link_targets'] = self.serializer_class.resolve_link_targets(args[0])
+            kwargs['context'] = context
+        return super(FileBrowserFolderLinkFileList, self).get_serializer(*args, **kwargs)
+
 
 class FileBrowserLinkFileDetail(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -778,10 +931,7 @@ class FileBrowserLinkFileResource(generics.GenericAPIView):
         Overriden to be able to make a GET request to an actual file resource.
         """
         chris_link_file = self.get_object()
-        f = chris_link_file.fname
-        resp = FileResponse(f)
-        resp['Content-Disposition'] = f'attachment; filename="{Path(f.name).name}"'
-        return resp
+        return file_response(request, chris_link_file)
 
 
 class FileBrowserLinkFileGroupPermissionList(generics.ListCreateAPIView):
@@ -4,14 +4,13 @@ import logging
 from django.db import models
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
-from django.conf import settings
 
 import django_filters
 from django_filters.rest_framework import FilterSet
 
-from core.models import AsyncDeletableModel, ChrisFolder, ChrisFile
+from core.models import (AsyncDeletableModel, ChrisFolder, ChrisFile, FolderSizeDelta,
+                         StorageGarbage)
 from core.utils import filter_files_by_n_slashes, json_zip2str
-from core.storage import connect_storage
 from .services import PfdcmClient
 from .enums import PACS_QUERY_STATUS_CHOICES, PACS_RETRIEVE_STATUS_CHOICES
 
@@ -33,7 +32,7 @@ class PACS(models.Model):
 @receiver(post_delete, sender=PACS)
 def auto_delete_pacs_folder_with_pacs(sender, instance, **kwargs):
     try:
-        instance.folder.delete()
+        instance.folder.delete_tree()
     except Exception:
         pass
 
@@ -190,7 +189,7 @@ class PACSSeries(AsyncDeletableModel):
 @receiver(post_delete, sender=PACSSeries)
 def auto_delete_series_folder_with_series(sender, instance, **kwargs):
     try:
-        instance.folder.delete()
+        instance.folder.delete_tree()
     except Exception:
         pass
 
@@ -243,13 +242,8 @@ class PACSFile(ChrisFile):
 
 @receiver(post_delete, sender=PACSFile)
 def auto_delete_file_from_storage(sender, instance, **kwargs):
-    storage_path = instance.fname.name
-    storage_manager = connect_storage(settings)
-    try:
-        if storage_manager.obj_exists(storage_path):
-            storage_manager.delete_obj(storage_path)
-    except Exception as e:
-        logger.error('Storage error, detail: %s' % str(e))
+    StorageGarbage.record(instance.fname.name)
+    FolderSizeDelta.record_file(instance, -1)
 
 
 class PACSFileFilter(FilterSet):
@@ -260,7 +254,7 @@ class PACSFileFilter(FilterSet):
     fname = django_filters.CharFilter(field_name='fname', lookup_expr='startswith')
     fname_exact = django_filters.CharFilter(field_name='fname', lookup_expr='exact')
     fname_icontains = django_filters.CharFilter(field_name='fname',
-                                                lookup_expr='icontains')
+                                                lookup_expr='ilike_contains')
     fname_icontains_topdir_unique = django_filters.CharFilter(
         method='filter_by_icontains_topdir_unique')
     fname_nslashes = django_filters.CharFilter(method='filter_by_n_slashes')
@@ -292,7 +286,7 @@ class PACSFileFilter(FilterSet):
         value_l = value.split()
         qs = queryset
         for val in value_l:
-            qs = qs.filter(fname__icontains=val)
+            qs = qs.filter(fname__ilike_contains=val)
         ids = []
         hash_set = set()
         for f in qs.all():
@@ -8,7 +8,7 @@ from django.contrib.auth.models import Group
 from django.conf import settings
 from rest_framework import serializers
 
-from core.models import ChrisFolder
+from core.models import ChrisFolder, FolderSizeDelta
 from core.storage import connect_storage
 from core.serializers import ChrisFileSerializer
 from .models import PACS, PACSQuery, PACSRetrieve, PACSSeries, PACSFile
@@ -180,7 +180,7 @@ class PACSSeriesSerializer(serializers.HyperlinkedModelSerializer):
         except PACSSeries.DoesNotExist:
             path = validated_data.pop('path')
 
-            (series_folder, _) = ChrisFolder.objects.get_or_create(path=path, owner=owner)
+            series_folder = ChrisFolder.ensure_folders([path], owner)[path]
 
             validated_data['pacs'] = pacs
             validated_data['folder'] = series_folder
@@ -191,30 +191,32 @@ class PACSSeriesSerializer(serializers.HyperlinkedModelSerializer):
             changed_file_paths = storage_manager.sanitize_obj_names(path)
 
             files_in_storage = validated_data.pop('files_in_storage')
+            obj_paths = {obj_path: changed_file_paths.get(obj_path, obj_path)
+                         for obj_path in files_in_storage}
+            folders = ChrisFolder.ensure_folders(
+                {os.path.dirname(p) for p in obj_paths.values() if p}, owner)
             files = []
-            for obj_path in files_in_storage:
-                if obj_path in changed_file_paths:
-                    obj_path = changed_file_paths[obj_path]
+            for obj_path, obj in files_in_storage.items():
+                obj_path = obj_paths[obj_path]
 
                 if obj_path:
-                    folder_path = os.path.dirname(obj_path)
-                    parent_folder = series_folder
-
-                    if folder_path != path:
-                        (parent_folder, _) = ChrisFolder.objects.get_or_create(
-                            path=folder_path, owner=owner)
-
+                    parent_folder = folders[os.path.dirname(obj_path)]
                     pacs_file = PACSFile(owner=owner, parent_folder=parent_folder)
                     pacs_file.fname.name = obj_path
+                    pacs_file.fsize = obj.size  # renaming preserves the contents
+                    pacs_file.etag = obj.etag
                     files.append(pacs_file)
 
             PACSFile.objects.bulk_create(files)
-
-            # grant the group permission from the highest folder ancestor without it
-            current = series_folder
-            while not current.parent.has_group_permission(pacs_grp):
-                current = current.parent
-            current.grant_group_permission(pacs_grp, 'r')
+            FolderSizeDelta.record_files(
+                PACSFile.objects.filter(pk__in=[f.pk for f in files]))
+
+            # folder permissions are inherited so the group only needs a permission on
+            # the series' top folder under SERVICES/PACS (normally the PACS folder)
+            if not series_folder.has_group_permission(pacs_grp):
+                top_folder_id = series_folder.get_permission_folder_ids()[1]
+                ChrisFolder.objects.get(pk=top_folder_id).grant_group_permission(
+                    pacs_grp, 'r')
         else:
             error_msg = (f'A DICOM series with SeriesInstanceUID={SeriesInstanceUID} '
                          f'already registered for pacs {pacs_name}')
@@ -272,12 +274,13 @@ class PACSSeriesSerializer(serializers.HyperlinkedModelSerializer):
         # verify files are already in storage
         ndicom = data.pop('ndicom')
         nfiles = 0
-        files_in_storage = []
+        files_in_storage = {}
         storage_manager = connect_storage(settings)
 
         for i in range(30):  # check for 30 seconds at 1-sec intervals
             try:
-                files_in_storage = storage_manager.ls(path)
+                # the listing also provides the files' metadata needed to register them
+                files_in_storage = {obj.name: obj for obj in storage_manager.ls_info(path)}
             except Exception as e:
                 logger.error(f'[Error while listing storage files in {path}, '
                              f'detail: {str(e)}')
@@ -2,14 +2,14 @@
 import logging
 import io
 
-from django.contrib.auth.models import User
+from django.contrib.auth.models import User, Group
 from django.test import TestCase, tag
 from django.conf import settings
 from unittest import mock
 from rest_framework import serializers
 
-from core.models import ChrisFolder
-from core.storage import connect_storage
+from core.models import ChrisFolder, FolderGroupPermission
+from core.storage import connect_storage, StorageObject
 from pacsfiles.models import PACS, PACSQuery
 from pacsfiles.serializers import (PACSQuerySerializer, PACSRetrieveSerializer,
                                    PACSSeriesSerializer)
@@ -170,8 +170,7 @@ class PACSSeriesSerializerTests(SerializerTests):
             storage_manager.upload_obj(path + '/, ,/SAG,T1,MPRAGE/test2.dcm', f.read(),
                                        content_type='text/plain')
 
-        data['files_in_storage'] = [path + '/, ,/SAG,T1,MPRAGE/tes,t1.dcm',
-                                    path + '/, ,/SAG,T1,MPRAGE/test2.dcm']
+        data['files_in_storage'] = {obj.name: obj for obj in storage_manager.ls_info(path)}
         pacs_series_serializer = PACSSeriesSerializer(data=data)
         pacs_series = pacs_series_serializer.create(data)
 
@@ -186,6 +185,13 @@ class PACSSeriesSerializerTests(SerializerTests):
         self.assertEqual(len(fnames), 2)
         self.assertIn(path + '/SAGT1MPRAGE/test1.dcm', fnames)
         self.assertIn(path + '/SAGT1MPRAGE/test2.dcm', fnames)
+        self.assertEqual({f.fsize for f in folder.chris_files.all()}, {9})
+
+        # the group's permission on the PACS folder is inherited by the series folder
+        pacs_grp = Group.objects.get(name='pacs_users')
+        self.assertTrue(pacs_series.folder.has_group_permission(pacs_grp, 'r'))
+        self.assertFalse(FolderGroupPermission.objects.filter(
+            group=pacs_grp, folder__path__startswith=path).exists())
 
         # delete files from storage
         storage_manager.delete_path(path)
@@ -286,7 +292,8 @@ class PACSSeriesSerializerTests(SerializerTests):
 
 
         storage_manager_mock = mock.Mock()
-        storage_manager_mock.ls = mock.Mock(return_value=['file1'])
+        storage_manager_mock.ls_info = mock.Mock(return_value=[
+            StorageObject('file1', 10, 'abc', None)])
 
         with mock.patch('pacsfiles.serializers.connect_storage') as connect_storage_mock:
             connect_storage_mock.return_value = storage_manager_mock
@@ -310,11 +317,12 @@ class PACSSeriesSerializerTests(SerializerTests):
 
 
         storage_manager_mock = mock.Mock()
-        storage_manager_mock.ls = mock.Mock(return_value=[
-            'SERVICES/PACS/MyPACS/123456-crazy/brain_crazy_study/SAG_T1_MPRAGE/file1.dcm'])
+        storage_manager_mock.ls_info = mock.Mock(return_value=[StorageObject(
+            'SERVICES/PACS/MyPACS/123456-crazy/brain_crazy_study/SAG_T1_MPRAGE/file1.dcm',
+            10, 'abc', None)])
 
         with mock.patch('pacsfiles.serializers.connect_storage') as connect_storage_mock:
             connect_storage_mock.return_value = storage_manager_mock
             pacs_series_serializer = PACSSeriesSerializer()
             pacs_series_serializer.validate(data)
-            storage_manager_mock.ls.assert_called_with(path)
+            storage_manager_mock.ls_info.assert_called_with(path)
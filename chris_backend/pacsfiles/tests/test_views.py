@@ -938,9 +938,9 @@ class PACSFileResourceViewTests(PACSViewTests):
         fileresource_view_inst = mock.Mock()
         fileresource_view_inst.get_object = mock.Mock(return_value=pacs_file)
         request_mock = mock.Mock()
-        with mock.patch('pacsfiles.views.FileResponse') as response_mock:
+        with mock.patch('pacsfiles.views.file_response') as response_mock:
             views.PACSFileResource.get(fileresource_view_inst, request_mock)
-            response_mock.assert_called_with(pacs_file.fname)
+            response_mock.assert_called_with(request_mock, pacs_file)
 
     @tag('integration')
     def test_integration_pacsfileresource_download_success(self):
@@ -1,7 +1,4 @@
 
-from pathlib import Path
-
-from django.http import FileResponse
 from django.contrib.auth.models import User, Group
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status
@@ -13,7 +10,7 @@ from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiResp
 from collectionjson import services
 from core.renderers import BinaryFileRenderer
 from core.models import ChrisFolder
-from core.views import TokenAuthSupportQueryString
+from core.views import TokenAuthSupportQueryString, file_response
 
 from .models import (PACS, PACSFilter, PACSQuery, PACSQueryFilter, PACSRetrieve,
                      PACSRetrieveFilter, PACSSeries, PACSSeriesFilter, PACSFile,
@@ -497,7 +494,4 @@ class PACSFileResource(generics.GenericAPIView):
         Overriden to be able to make a GET request to an actual file resource.
         """
         pacs_file = self.get_object()
-        f = pacs_file.fname
-        resp = FileResponse(f)
-        resp['Content-Disposition'] = f'attachment; filename="{Path(f.name).name}"'
-        return resp
+        return file_response(request, pacs_file)
@@ -5,14 +5,12 @@ from collections import deque
 from django.db import models
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
-from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 
 import django_filters
 from django_filters.rest_framework import FilterSet
 
-from core.models import ChrisFile
-from core.storage import connect_storage
+from core.models import ChrisFile, FolderSizeDelta, StorageGarbage
 from plugins.models import Plugin, PluginParameter
 from plugins.fields import CPUField, MemoryField
 from plugins.fields import MemoryInt, CPUInt
@@ -273,14 +271,8 @@ class PipelineSourceFile(ChrisFile):
 
 @receiver(post_delete, sender=PipelineSourceFile)
 def auto_delete_file_from_storage(sender, instance, **kwargs):
-    storage_path = instance.fname.name
-    storage_manager = connect_storage(settings)
-
-    try:
-        if storage_manager.obj_exists(storage_path):
-            storage_manager.delete_obj(storage_path)
-    except Exception as e:
-        logger.error('Storage error, detail: %s' % str(e))
+    StorageGarbage.record(instance.fname.name)
+    FolderSizeDelta.record_file(instance, -1)
 
 
 class PipelineSourceFileFilter(FilterSet):
@@ -291,7 +283,7 @@ class PipelineSourceFileFilter(FilterSet):
     fname = django_filters.CharFilter(field_name='fname', lookup_expr='startswith')
     fname_exact = django_filters.CharFilter(field_name='fname', lookup_expr='exact')
     fname_icontains = django_filters.CharFilter(field_name='fname',
-                                                lookup_expr='icontains')
+                                                lookup_expr='ilike_contains')
     pipeline_id = django_filters.CharFilter(field_name='meta__pipeline_id',
                                             lookup_expr='exact')
     pipeline_name = django_filters.CharFilter(field_name='meta__pipeline__name',
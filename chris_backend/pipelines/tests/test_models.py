@@ -1,12 +1,11 @@
 
 import logging
-from unittest import mock
 
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.conf import settings
 
-from core.models import ChrisFolder
+from core.models import ChrisFolder, StorageGarbage
 from plugins.models import PluginMeta, Plugin
 from plugins.models import ComputeResource
 from plugins.models import PluginParameter, DefaultIntParameter
@@ -422,8 +421,7 @@ class PipelineSourceFileSignalTests(ModelTests):
         """
         Build a PipelineSourceFile + PipelineSourceFileMeta for the fixture
         pipeline, with its fname pointing inside the PIPELINES space and a
-        ChrisFolder parent. No bytes are uploaded to storage; tests that need
-        to assert delete behaviour mock the storage manager.
+        ChrisFolder parent. No bytes are uploaded to storage.
         """
         owner = User.objects.get(username=self.username)
         pipeline = Pipeline.objects.get(name=self.pipeline_name)
@@ -437,52 +435,15 @@ class PipelineSourceFileSignalTests(ModelTests):
             type='yaml', pipeline=pipeline, source_file=source_file, uploader=owner)
         return source_file, meta
 
-    def test_auto_delete_file_from_storage_when_object_exists(self):
+    def test_auto_delete_file_from_storage(self):
         """
-        Test the post_delete signal on PipelineSourceFile: when the storage
-        backend reports the object exists, delete_obj is called on it.
+        Test the post_delete signal on PipelineSourceFile: the file's storage path is
+        recorded in the storage garbage outbox instead of being deleted right away.
         """
         source_file, _ = self._make_source_file()
         storage_path = source_file.fname.name
-        storage_manager_mock = mock.Mock()
-        storage_manager_mock.obj_exists = mock.Mock(return_value=True)
-        storage_manager_mock.delete_obj = mock.Mock()
-        with mock.patch('pipelines.models.connect_storage') as connect_storage_mock:
-            connect_storage_mock.return_value = storage_manager_mock
-            source_file.delete()
-        storage_manager_mock.obj_exists.assert_called_with(storage_path)
-        storage_manager_mock.delete_obj.assert_called_with(storage_path)
-
-    def test_auto_delete_file_from_storage_when_object_missing(self):
-        """
-        Test the post_delete signal on PipelineSourceFile: when the storage
-        backend reports the object does not exist, delete_obj is not called.
-        """
-        source_file, _ = self._make_source_file()
-        storage_manager_mock = mock.Mock()
-        storage_manager_mock.obj_exists = mock.Mock(return_value=False)
-        storage_manager_mock.delete_obj = mock.Mock()
-        with mock.patch('pipelines.models.connect_storage') as connect_storage_mock:
-            connect_storage_mock.return_value = storage_manager_mock
-            source_file.delete()
-        storage_manager_mock.delete_obj.assert_not_called()
-
-    def test_auto_delete_file_from_storage_swallows_storage_errors(self):
-        """
-        Test that storage errors during the post_delete signal on
-        PipelineSourceFile are caught and logged rather than re-raised. Without
-        this, deleting a PipelineSourceFile would fail whenever the storage
-        backend is unreachable.
-        """
-        source_file, _ = self._make_source_file()
-        storage_manager_mock = mock.Mock()
-        storage_manager_mock.obj_exists = mock.Mock(side_effect=RuntimeError('boom'))
-        with mock.patch('pipelines.models.connect_storage') as connect_storage_mock:
-            connect_storage_mock.return_value = storage_manager_mock
-            # should not raise; the error must be logged instead
-            with self.assertLogs('pipelines.models', level='ERROR') as cm:
-                source_file.delete()
-        self.assertTrue(any('boom' in msg for msg in cm.output))
+        source_file.delete()
+        self.assertTrue(StorageGarbage.objects.filter(path=storage_path).exists())
 
     def test_auto_delete_source_file_with_meta_cascade(self):
         """
@@ -491,11 +452,7 @@ class PipelineSourceFileSignalTests(ModelTests):
         """
         source_file, meta = self._make_source_file()
         source_file_pk = source_file.pk
-        storage_manager_mock = mock.Mock()
-        storage_manager_mock.obj_exists = mock.Mock(return_value=False)
-        with mock.patch('pipelines.models.connect_storage') as connect_storage_mock:
-            connect_storage_mock.return_value = storage_manager_mock
-            meta.delete()
+        meta.delete()
         self.assertFalse(
             PipelineSourceFile.objects.filter(pk=source_file_pk).exists())
 
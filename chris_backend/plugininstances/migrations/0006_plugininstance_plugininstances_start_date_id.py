@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-18 21:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_folder_size_aggregates'),
+        ('feeds', '0004_feed_feeds_feed_creation_date_id'),
+        ('plugininstances', '0005_plugininstance_copy_retry_count_and_more'),
+        ('plugins', '0003_computeresource_compute_requires_copy_job_and_more'),
+        ('workflows', '0002_alter_workflow_title'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='plugininstance',
+            index=models.Index(fields=['start_date', 'id'], name='plugininstances_start_date_id'),
+        ),
+    ]
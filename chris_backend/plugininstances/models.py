@@ -80,6 +80,8 @@ class PluginInstance(AsyncDeletableModel):
 
     class Meta:
         ordering = ('-start_date',)
+        indexes = [models.Index(fields=['start_date', 'id'],
+                                name='plugininstances_start_date_id')]
 
     def __str__(self):
         return self.title
@@ -220,7 +222,7 @@ class PluginInstance(AsyncDeletableModel):
 @receiver(post_delete, sender=PluginInstance)
 def auto_delete_output_folder_with_plugin_instance(sender, instance, **kwargs):
     try:
-        instance.output_folder.parent.delete()  # delete parent of the output data folder
+        instance.output_folder.parent.delete_tree()  # delete parent of the output data folder
     except Exception:
         pass
 
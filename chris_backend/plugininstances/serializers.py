@@ -5,7 +5,7 @@ from rest_framework.reverse import reverse
 from drf_spectacular.utils import OpenApiTypes, extend_schema_field
 
 from collectionjson.fields import ItemLinkField
-from core.models import PathAccessError, validate_path_access
+from core.models import PathAccessError, validate_paths_access
 from plugins.enums import TYPES
 from plugins.models import Plugin
 
@@ -345,13 +345,10 @@ def validate_paths(user, string):
     Custom function to check whether a user is allowed to access the provided
     paths (a string of one or more paths separated by commas).
     """
-    path_list = [s.strip().strip('/') for s in string.split(',')]
-
-    for path in path_list:
-        try:
-            validate_path_access(user, path)
-        except PathAccessError as e:
-            raise serializers.ValidationError([str(e)])
+    try:
+        path_list = validate_paths_access(user, string.split(','))
+    except PathAccessError as e:
+        raise serializers.ValidationError([str(e)])
 
     return ','.join(path_list)
 
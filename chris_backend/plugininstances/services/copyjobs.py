@@ -204,17 +204,20 @@ class PluginInstanceCopyJob(PluginInstanceJob):
         output_path = self.c_plugin_inst.previous.get_output_path()
         prefix = output_path + '/'  # avoid sibling folders with paths that start with path
 
-        set_fnames = {f.fname.name for f in ChrisFile.objects.filter(
-            fname__startswith=prefix)}
+        d_fsizes = dict(ChrisFile.objects.filter(fname__startswith=prefix).values_list(
+            'fname', 'fsize'))
 
         for i in range(20):  # loop to deal with eventual consistency
             try:
-                l_ls = self.storage_manager.ls(output_path)
+                d_objs = {obj.name: obj for obj in self.storage_manager.ls_info(
+                    output_path)}
             except Exception as e:
                 logger.error(f'[CODE06,{job_id}]: Error while listing storage files '
                              f'in {output_path}, detail: {str(e)}')
             else:
-                if set_fnames.issubset(set(l_ls)):
+                # all registered files must be listed with their registered size
+                if all(fname in d_objs and fsize in (None, d_objs[fname].size)
+                       for fname, fsize in d_fsizes.items()):
                     return output_path
             time.sleep(3)
 
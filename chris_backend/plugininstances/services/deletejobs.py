@@ -226,12 +226,5 @@ class PluginInstanceDeleteJob(PluginInstanceJob):
         output dir.
         """
         output_folder = self.c_plugin_inst.output_folder
-        
-        for folder in output_folder.children.all():
-            folder.delete()
-        for file in output_folder.chris_files.all():
-            file.delete()
-        for link_file in output_folder.chris_link_files.all():
-            link_file.delete()
-
-        self.storage_manager.delete_path(output_folder.path)
+        output_folder.delete_tree(include_self=False,
+                                  storage_manager=self.storage_manager)
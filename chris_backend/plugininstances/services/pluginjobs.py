@@ -10,6 +10,7 @@ import re
 import io
 import time
 import json
+import shutil
 import zipfile
 from typing import List, Optional
 
@@ -19,12 +20,15 @@ from pfconclient.exceptions import (PfconRequestException,
 
 from django.utils import timezone
 from django.conf import settings
+from django.db import transaction
 from django.db.utils import IntegrityError
 from rest_framework.authtoken.models import Token
 
 from core.utils import json_zip2str
-from core.models import (ChrisFolder, ChrisFile, ChrisLinkFile, PathAccessError,
-                          validate_path_access)
+from core.storage.bulk import batched
+from core.storage.streams import CHUNK_SIZE
+from core.models import (ChrisFolder, ChrisFile, ChrisLinkFile, FolderSizeDelta,
+                          PathAccessError, PermissionResolver, validate_path_access)
 from plugininstances.models import PluginInstance, PluginInstanceLock
 from userfiles.models import UserFile
 from .abstractjobs import PluginInstanceJob
@@ -43,6 +47,8 @@ class PluginInstanceAppJob(PluginInstanceJob):
     def __init__(self, plugin_instance):
         super().__init__(plugin_instance)
         self.l_plugin_inst_param_instances = self.c_plugin_inst.get_parameter_instances()
+        # link files are followed recursively, resolve the owner's permissions once
+        self.permission_resolver = PermissionResolver(self.c_plugin_inst.owner)
 
     def run(self):
         """
@@ -280,17 +286,20 @@ class PluginInstanceAppJob(PluginInstanceJob):
         output_path = self.c_plugin_inst.previous.get_output_path()
         prefix = output_path + '/'  # avoid sibling folders with paths that start with path
 
-        set_fnames = {f.fname.name for f in ChrisFile.objects.filter(
-            fname__startswith=prefix)}
+        d_fsizes = dict(ChrisFile.objects.filter(fname__startswith=prefix).values_list(
+            'fname', 'fsize'))
 
         for i in range(20):  # loop to deal with eventual consistency
             try:
-                l_ls = self.storage_manager.ls(output_path)
+                d_objs = {obj.name: obj for obj in self.storage_manager.ls_info(
+                    output_path)}
             except Exception as e:
                 logger.error(f'[CODE06,{job_id}]: Error while listing storage files '
                              f'in {output_path}, detail: {str(e)}')
             else:
-                if set_fnames.issubset(set(l_ls)):
+                # all registered files must be listed with their registered size
+                if all(fname in d_objs and fsize in (None, d_objs[fname].size)
+                       for fname, fsize in d_fsizes.items()):
                     return output_path
             time.sleep(3)
 
@@ -428,7 +437,8 @@ class PluginInstanceAppJob(PluginInstanceJob):
         so they must be re-checked).
         """
         try:
-            validate_path_access(self.c_plugin_inst.owner, linked_path)
+            validate_path_access(self.c_plugin_inst.owner, linked_path,
+                                 self.permission_resolver)
         except PathAccessError:
             job_id = self.str_job_id
             logger.error(
@@ -437,6 +447,13 @@ class PluginInstanceAppJob(PluginInstanceJob):
             self.c_plugin_inst.error_code = 'CODE17'
             raise ValueError(f'Invalid input path: {linked_path}')
 
+    def _read_link_file(self, link_file_path):
+        """
+        Return the path pointed to by a ChRIS link file in storage.
+        """
+        with self.storage_manager.open_read(link_file_path) as f:
+            return f.read().decode().strip()
+
     def find_all_storage_object_paths(self, storage_path, obj_paths, visited_paths):
         """
         Find all object storage paths from the passed storage path (prefix) by
@@ -459,8 +476,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
             for obj_path in l_ls:
                 if obj_path.endswith('.chrislink'):
                     try:
-                        linked_path = self.storage_manager.download_obj(
-                            obj_path).decode().strip()
+                        linked_path = self._read_link_file(obj_path)
                     except Exception as e:
                         logger.error(f'[CODE08,{job_id}]: Error while downloading file '
                                      f'{obj_path} from storage, detail: {str(e)}')
@@ -503,16 +519,16 @@ class PluginInstanceAppJob(PluginInstanceJob):
                                                    visited_paths)
                 for obj_path in obj_paths:
                     if obj_path not in all_obj_paths:  # add a file to the zip only once
+                        zip_path = obj_path.replace(storage_path, '', 1).lstrip('/')
                         try:
-                            contents = self.storage_manager.download_obj(obj_path)
+                            with self.storage_manager.open_read(obj_path) as src, \
+                                    job_data_zip.open(zip_path, 'w') as dst:
+                                shutil.copyfileobj(src, dst, CHUNK_SIZE)
                         except Exception as e:
                             logger.error(f'[CODE08,{job_id}]: Error while downloading file '
                                          f'{obj_path} from storage, detail: {str(e)}')
                             self.c_plugin_inst.error_code = 'CODE08'
                             raise
-                        
-                        zip_path = obj_path.replace(storage_path, '', 1).lstrip('/')
-                        job_data_zip.writestr(zip_path, contents)
                         all_obj_paths.add(obj_path)
 
         memory_zip_file.seek(0)
@@ -531,10 +547,13 @@ class PluginInstanceAppJob(PluginInstanceJob):
                 output_path = self.c_plugin_inst.get_output_path() + '/'
 
                 for fname in filenames:
-                    content = job_zip.read(fname)
                     storage_fname = output_path + fname.lstrip('/')
                     try:
-                        self.storage_manager.upload_obj(storage_fname, content)
+                        with job_zip.open(fname) as src, \
+                                self.storage_manager.open_write(storage_fname) as dst:
+                            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                    except zipfile.BadZipFile:
+                        raise  # corrupted zip member, the upload has been aborted
                     except Exception as e:
                         logger.error(f'[CODE07,{job_id}]: Error while uploading file '
                                      f'{storage_fname} to storage, detail: {str(e)}')
@@ -646,7 +665,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
                     link_file.save(name=str_source_trace_dir)
                     logger.info(f'Creating link file -->'
                                 f'{link_file.fname.name}<-- for job {job_id}')
-                    self.c_plugin_inst.size += link_file.fname.size
+                    self.c_plugin_inst.size += link_file.fsize
             except Exception as e:
                 logger.error(f'[CODE09,{job_id}]: Error while creating link file '
                              f'to {path} from {parent_folder.path} in storage, '
@@ -660,7 +679,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
                 link_file.save(name=str_source_trace_dir)
                 logger.info(f'Creating link file -->'
                             f'{link_file.fname.name}<-- for job {job_id}')
-                self.c_plugin_inst.size += link_file.fname.size
+                self.c_plugin_inst.size += link_file.fsize
             except Exception as e:
                 logger.error(f'[CODE09,{job_id}]: Error while creating link file '
                              f'to {path} from {parent_folder.path} in storage, '
@@ -746,7 +765,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
 
                 if obj.endswith('.chrislink'):
                     try:
-                        path = self.storage_manager.download_obj(obj).decode().strip()
+                        path = self._read_link_file(obj)
                     except Exception as e:
                         logger.error(f'[CODE08,{job_id}]: Error while downloading file '
                                      f'{obj} from storage, detail: {str(e)}')
@@ -1004,8 +1023,7 @@ class PluginInstanceAppJob(PluginInstanceJob):
 
         owner = self.c_plugin_inst.owner
         outputdir = self.c_plugin_inst.get_output_path()
-        files = []
-        folders = {}
+        output_paths = set()
 
         # remove commas from the existing files/folders names and handle the special cases
         changed_file_paths = self.storage_manager.sanitize_obj_names(outputdir)
@@ -1036,25 +1054,59 @@ class PluginInstanceAppJob(PluginInstanceJob):
                         self.c_plugin_inst.error_code = 'CODE07'
                         raise
                     continue
+                output_paths.add(obj_path)
 
-                logger.info(f'Registering file -->{obj_path}<-- for job {job_id}')
-
-                folder_path = os.path.dirname(obj_path)
-                parent_folder = folders.get(folder_path)
+        total_size = 0
+        with transaction.atomic():
+            # create all the output folders up front
+            folders = ChrisFolder.ensure_folders(
+                {os.path.dirname(obj_path) for obj_path in output_paths}, owner)
+
+            # the files' size and ETag come from a streamed listing of the output dir
+            # and the files are registered in batches to keep memory bounded
+            for l_objs in batched(self._iter_output_objs(outputdir, output_paths), 1000):
+                files = []
+                for obj_path, obj in l_objs:
+                    logger.info(f'Registering file -->{obj_path}<-- for job {job_id}')
+
+                    parent_folder = folders[os.path.dirname(obj_path)]
+                    plg_inst_file = UserFile(owner=owner, parent_folder=parent_folder)
+                    plg_inst_file.fname.name = obj_path
+                    if obj is None:  # not listed yet (eventual consistency)
+                        obj = self.storage_manager.obj_info(obj_path)
+                    if obj is None:
+                        plg_inst_file.fsize = plg_inst_file.fname.size
+                    else:
+                        plg_inst_file.fsize = obj.size
+                        plg_inst_file.etag = obj.etag
+                    files.append(plg_inst_file)
 
-                if parent_folder is None:
-                    (parent_folder, _) = ChrisFolder.objects.get_or_create(
-                        path=folder_path, owner=owner)
-                    folders[folder_path] = parent_folder
+                UserFile.objects.bulk_create(files)
+                FolderSizeDelta.record_files(
+                    UserFile.objects.filter(pk__in=[f.pk for f in files]))
+                total_size += sum(f.fsize for f in files)
 
-                plg_inst_file = UserFile(owner=owner, parent_folder=parent_folder)
-                plg_inst_file.fname.name = obj_path
-                files.append(plg_inst_file)
+        self.plugin_inst_output_files = output_paths
+        self.c_plugin_inst.size += total_size
 
-        self.plugin_inst_output_files = {f.fname.name for f in files}
-        db_files = UserFile.objects.bulk_create(files)
+    def _iter_output_objs(self, outputdir, output_paths):
+        """
+        Internal method to lazily yield (path, metadata) tuples for the given output
+        files from a streamed listing of the output dir. Files that don't show up in
+        the listing are yielded at the end with None metadata.
+        """
+        job_id = self.str_job_id
+        listed = set()
+        try:
+            for obj in self.storage_manager.iter_ls_info(outputdir):
+                if obj.name in output_paths:
+                    listed.add(obj.name)
+                    yield obj.name, obj
+        except Exception as e:
+            logger.error(f'[CODE06,{job_id}]: Error while listing storage files '
+                         f'in {outputdir}, detail: {str(e)}')
+            self.c_plugin_inst.error_code = 'CODE06'
+            raise
 
-        total_size = 0
-        for plg_inst_file in db_files:
-            total_size += plg_inst_file.fname.size
-        self.c_plugin_inst.size += total_size
+        for obj_path in output_paths - listed:
+            yield obj_path, None
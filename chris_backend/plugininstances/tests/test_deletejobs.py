@@ -15,6 +15,7 @@ from pfconclient.exceptions import PfconRequestException
 
 from core.models import ChrisInstance, ChrisFolder
 from core.storage import connect_storage
+from core.storage.helpers import _reset_managers
 from plugins.models import PluginMeta, Plugin
 from plugins.models import PluginParameter
 from plugininstances.models import PluginInstance, PathParameter, ComputeResource
@@ -109,11 +110,17 @@ class PluginInstanceDeleteJobTests(TestCase):
         # create user
         User.objects.create_user(username=self.username, password=self.password)
 
+        # start from fresh process-wide storage managers
+        _reset_managers()
+
     def tearDown(self):
         # re-enable logging
         logging.disable(logging.NOTSET)
         logging.getLogger('plugininstances.services.deletejobs').setLevel(logging.NOTSET)
 
+        # drop the process-wide storage managers so no test state leaks through them
+        _reset_managers()
+
     def test_run_success(self):
         with mock.patch.object(deletejobs, 'json_zip2str',
                                return_value='raw') as json_zip2str_mock:
@@ -460,13 +467,14 @@ class PluginInstanceDeleteJobTests(TestCase):
         child_folder.save()
 
         delete_job = deletejobs.PluginInstanceDeleteJob(pl_inst)
-        delete_job.storage_manager.delete_path = mock.Mock()
-
-        delete_job._cleanup_plugin_instance_output_dir()
+        with mock.patch.object(delete_job.storage_manager, 'path_exists',
+                               return_value=True), \
+                mock.patch.object(delete_job.storage_manager,
+                                  'delete_path') as delete_path_mock:
+            delete_job._cleanup_plugin_instance_output_dir()
 
         self.assertFalse(ChrisFolder.objects.filter(pk=child_folder.pk).exists())
-        delete_job.storage_manager.delete_path.assert_called_once_with(
-            pl_inst.output_folder.path)
+        delete_path_mock.assert_called_once_with(pl_inst.output_folder.path)
 
     @tag('integration')
     def test_integration_cleanup_plugin_instance_output_dir(self):
@@ -9,11 +9,13 @@ from unittest import mock
 from django.test import TestCase, tag
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.utils import timezone
 
 from pfconclient import client as pfcon
 
-from core.models import ChrisInstance, ChrisFolder, ChrisLinkFile
+from core.models import ChrisInstance, ChrisFolder, ChrisLinkFile, FolderSizeDelta
 from core.storage import connect_storage
+from core.storage.storagemanager import StorageObject
 from plugins.models import PluginMeta, Plugin
 from plugins.models import PluginParameter
 from plugininstances.models import PluginInstance, PathParameter, ComputeResource
@@ -343,8 +345,8 @@ class PluginInstanceAppJobTests(TestCase):
 
         job.storage_manager = mock.Mock()
         job.storage_manager.ls = mock.Mock(return_value=[link_obj])
-        job.storage_manager.download_obj = mock.Mock(
-            return_value=b'home/other/uploads')
+        job.storage_manager.open_read = mock.Mock(
+            return_value=io.BytesIO(b'home/other/uploads'))
 
         obj_paths = set()
         visited_paths = set()
@@ -384,8 +386,8 @@ class PluginInstanceAppJobTests(TestCase):
 
         job.storage_manager = mock.Mock()
         job.storage_manager.ls = mock.Mock(side_effect=fake_ls)
-        job.storage_manager.download_obj = mock.Mock(
-            return_value=linked_path.encode())
+        job.storage_manager.open_read = mock.Mock(
+            return_value=io.BytesIO(linked_path.encode()))
 
         obj_paths = set()
         visited_paths = set()
@@ -464,6 +466,38 @@ class PluginInstanceAppJobTests(TestCase):
         self.assertTrue(any('CODE07' in msg and 'boom' in msg
                             for msg in cm.output))
 
+    def test_register_output_files_updates_folder_sizes(self):
+        """
+        Test whether _register_output_files records the size and file count of the
+        registered files in the aggregates of the output folders and their ancestors.
+        """
+        pl_inst = self._create_started_plugin_inst()
+        job = pluginjobs.PluginInstanceAppJob(pl_inst)
+        outputdir = pl_inst.get_output_path()
+        home_folder = ChrisFolder.objects.get(path=f'home/{self.username}')
+        FolderSizeDelta.compact()
+        home_folder.refresh_from_db()
+        home_size, home_file_count = home_folder.size, home_folder.file_count
+
+        objs = [StorageObject(outputdir + '/out.txt', 10, 'etag1', timezone.now()),
+                StorageObject(outputdir + '/sub/out.txt', 20, 'etag2', timezone.now())]
+        job.storage_manager = mock.Mock()
+        job.storage_manager.sanitize_obj_names = mock.Mock(return_value={})
+        job.storage_manager.iter_ls_info = mock.Mock(return_value=iter(objs))
+        job.plugin_inst_output_files = {obj.name for obj in objs}
+
+        job._register_output_files()
+        FolderSizeDelta.compact()
+
+        output_folder = ChrisFolder.objects.get(path=outputdir)
+        self.assertEqual((output_folder.size, output_folder.file_count), (30, 2))
+        sub_folder = ChrisFolder.objects.get(path=outputdir + '/sub')
+        self.assertEqual((sub_folder.size, sub_folder.file_count), (20, 1))
+        home_folder.refresh_from_db()
+        self.assertEqual(home_folder.size, home_size + 30)
+        self.assertEqual(home_folder.file_count, home_file_count + 2)
+        self.assertEqual(pl_inst.size, 30)
+
     @tag('integration')
     def test_integration_register_output_files_keeps_cube_generated_link_file(self):
         """
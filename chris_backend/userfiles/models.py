@@ -3,14 +3,12 @@ import logging
 
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
-from django.conf import settings
 
 import django_filters
 from django_filters.rest_framework import FilterSet
 
-from core.models import ChrisFolder, ChrisFile
+from core.models import ChrisFolder, ChrisFile, FolderSizeDelta, StorageGarbage
 from core.utils import filter_files_by_n_slashes
-from core.storage import connect_storage
 
 
 logger = logging.getLogger(__name__)
@@ -33,13 +31,8 @@ class UserFile(ChrisFile):
 
 @receiver(post_delete, sender=UserFile)
 def auto_delete_file_from_storage(sender, instance, **kwargs):
-    storage_path = instance.fname.name
-    storage_manager = connect_storage(settings)
-    try:
-        if storage_manager.obj_exists(storage_path):
-            storage_manager.delete_obj(storage_path)
-    except Exception as e:
-        logger.error('Storage error, detail: %s' % str(e))
+    StorageGarbage.record(instance.fname.name)
+    FolderSizeDelta.record_file(instance, -1)
 
 
 class UserFileFilter(FilterSet):
@@ -50,7 +43,7 @@ class UserFileFilter(FilterSet):
     fname = django_filters.CharFilter(field_name='fname', lookup_expr='startswith')
     fname_exact = django_filters.CharFilter(field_name='fname', lookup_expr='exact')
     fname_icontains = django_filters.CharFilter(field_name='fname',
-                                                lookup_expr='icontains')
+                                                lookup_expr='ilike_contains')
     fname_icontains_multiple = django_filters.CharFilter(
         method='filter_by_icontains_multiple')
     fname_nslashes = django_filters.CharFilter(method='filter_by_n_slashes')
@@ -82,5 +75,5 @@ class UserFileFilter(FilterSet):
         value_l = value.split()
         qs = queryset
         for val in value_l:
-            qs = qs.filter(fname__icontains=val)
+            qs = qs.filter(fname__ilike_contains=val)
         return qs
@@ -30,8 +30,8 @@ class UserFileSerializer(ChrisFileSerializer):
     def create(self, validated_data):
         """
         Overriden to set the file's saving path and parent folder. It also creates
-        non-existent ancestor folders and sets their permissions to be the same as the
-        first existing ancestor folder.
+        non-existent ancestor folders and sets their public status to be the same as
+        the first existing ancestor folder, whose permissions they inherit.
         """
         # user file will be stored at: SWIFT_CONTAINER_NAME/<upload_path>
         # where <upload_path> must start with home/<username>/
@@ -42,7 +42,8 @@ class UserFileSerializer(ChrisFileSerializer):
         parent_folder = ancestor_folder = ChrisFolder.get_first_existing_folder_ancestor(
             upload_path)
         if ancestor_folder.path != folder_path:
-            parent_folder = ChrisFolder.objects.create(path=folder_path, owner=owner)
+            folders = ChrisFolder.ensure_folders([folder_path], owner)
+            parent_folder = folders[folder_path]
 
         validated_data['parent_folder'] = parent_folder
         user_file = UserFile(**validated_data)
@@ -55,23 +56,12 @@ class UserFileSerializer(ChrisFileSerializer):
             parent_folder_path_parts = folder_path.split('/')
             ancestor_folder_path_parts = ancestor_folder.path.split('/')
             next_part = parent_folder_path_parts[len(ancestor_folder_path_parts)]
-            top_created_obj_path = ancestor_folder.path + '/' + next_part
-
-            if top_created_obj_path == folder_path:
-                top_created_obj = parent_folder
-            else:
-                top_created_obj = ChrisFolder.objects.get(path=top_created_obj_path)
+            top_created_obj = folders[ancestor_folder.path + '/' + next_part]
 
         if ancestor_folder.public:
             top_created_obj.grant_public_access()
             user_file.public = True  # update object before returning it
 
-        for perm in ancestor_folder.get_groups_permissions_queryset():
-            top_created_obj.grant_group_permission(perm.group, perm.permission)
-
-        for perm in ancestor_folder.get_users_permissions_queryset():
-            top_created_obj.grant_user_permission(perm.user, perm.permission)
-
         if owner != ancestor_folder.owner:
             top_created_obj.grant_user_permission(ancestor_folder.owner, 'w')
         return user_file
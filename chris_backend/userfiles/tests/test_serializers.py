@@ -64,7 +64,8 @@ class UserFileSerializerTests(TestCase):
         self.assertEqual(user_file.parent_folder.path, ancestor_folder_path + '/upload_folder')
         self.assertTrue(user_file.public)
         self.assertTrue(user_file.has_user_permission(chris_user, 'w'))
-        user_file.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            user_file.delete()
 
     def test_update(self):
         """
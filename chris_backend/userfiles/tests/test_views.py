@@ -14,7 +14,7 @@ from django.urls import reverse
 from rest_framework import status
 import jwt
 
-from core.models import ChrisFolder, FileDownloadToken
+from core.models import ChrisFolder, FileDownloadToken, StorageGarbage
 from core.storage.helpers import connect_storage, mock_storage
 from userfiles.models import UserFile
 from userfiles import views
@@ -153,16 +153,10 @@ class UserFileDetailViewTests(UserFileViewTests):
         self.client.login(username=self.username, password=self.password)
 
         storage_path = self.userfile.fname.name
-        storage_manager_mock = mock.Mock()
-        storage_manager_mock.delete_obj = mock.Mock()
-
-        with mock.patch('userfiles.models.connect_storage') as connect_storage_mock:
-            connect_storage_mock.return_value=storage_manager_mock
-            response = self.client.delete(self.read_update_delete_url)
-            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-            self.assertEqual(UserFile.objects.count(), 0)
-            connect_storage_mock.assert_called_with(settings)
-            storage_manager_mock.delete_obj.assert_called_with(storage_path)
+        response = self.client.delete(self.read_update_delete_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(UserFile.objects.count(), 0)
+        self.assertTrue(StorageGarbage.objects.filter(path=storage_path).exists())
 
     def test_userfile_delete_failure_unauthenticated(self):
         response = self.client.delete(self.read_update_delete_url)
@@ -192,9 +186,9 @@ class UserFileResourceViewTests(UserFileViewTests):
         fileresource_view_inst = mock.Mock()
         fileresource_view_inst.get_object = mock.Mock(return_value=userfile)
         request_mock = mock.Mock()
-        with mock.patch('userfiles.views.FileResponse') as response_mock:
+        with mock.patch('userfiles.views.file_response') as response_mock:
             views.UserFileResource.get(fileresource_view_inst, request_mock)
-            response_mock.assert_called_with(userfile.fname)
+            response_mock.assert_called_with(request_mock, userfile)
 
     @tag('integration')
     def test_integration_userfileresource_download_success(self):
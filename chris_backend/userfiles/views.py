@@ -1,8 +1,4 @@
 
-from pathlib import Path
-
-from django.http import FileResponse
-
 from rest_framework import generics, permissions
 from rest_framework.reverse import reverse
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
@@ -10,7 +6,7 @@ from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiResp
 
 from collectionjson import services
 from core.renderers import BinaryFileRenderer
-from core.views import TokenAuthSupportQueryString
+from core.views import TokenAuthSupportQueryString, file_response
 from .models import UserFile, UserFileFilter
 from .serializers import UserFileSerializer
 from .permissions import IsOwnerOrChris
@@ -129,7 +125,4 @@ class UserFileResource(generics.GenericAPIView):
         Overriden to be able to make a GET request to an actual file resource.
         """
         user_file = self.get_object()
-        f = user_file.fname
-        resp = FileResponse(f)
-        resp['Content-Disposition'] = f'attachment; filename="{Path(f.name).name}"'
-        return resp
+        return file_response(request, user_file)
@@ -1,6 +1,5 @@
 
 import logging
-import io
 
 from django.contrib.auth.models import User, Group
 from django_auth_ldap.backend import LDAPBackend
@@ -83,11 +82,16 @@ class UserProxy(User):
             storage_manager = connect_storage(settings)
             welcome_file_path = f'{uploads_path}/welcome.txt'
             try:
-                with io.StringIO('Welcome to ChRIS!') as f:
-                    storage_manager.upload_obj(welcome_file_path, f.read(),
-                                               content_type='text/plain')
+                contents = 'Welcome to ChRIS!'.encode('utf-8')
+                with storage_manager.open_write(welcome_file_path,
+                                                content_type='text/plain') as f:
+                    f.write(contents)
                 welcome_file = UserFile(parent_folder=uploads_folder, owner=user)
                 welcome_file.fname.name = welcome_file_path
+                welcome_file.fsize = len(contents)
+                obj = storage_manager.obj_info(welcome_file_path)
+                if obj is not None:
+                    welcome_file.etag = obj.etag
                 welcome_file.save()
             except Exception as e:
                 logger.error(